@@ -0,0 +1,112 @@
+from typing import Optional
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from cache import LRUCache
+from gamification import INTERNAL_USER_FIELDS
+
+
+bearer = HTTPBearer()
+
+
+def token_claims(user: dict) -> dict:
+    """Profile fields embedded in the token for stateless reads"""
+    return {
+        "email": user["email"],
+        "name": user["name"],
+        "daily_calories_target": user.get("daily_calories_target")
+    }
+
+
+class UserResolver:
+    """Users behind decoded access tokens, cached briefly in this process
+
+    Every write to a user document must call invalidate(). Invalidation only
+    reaches this process's cache: other workers keep serving their copy until
+    its TTL runs out, so the TTL bounds how stale a profile can be.
+
+    With `stateless`, claims() answers read-only endpoints from the profile
+    claims signed into the token, without any lookup; user() always loads the
+    user, so write endpoints never act on token data alone.
+    """
+
+    def __init__(self, users, cache: LRUCache, stateless: bool = False):
+        self.users = users
+        self.cache = cache
+        self.stateless = stateless
+        self.auth_requests = 0
+        self.db_lookups = 0
+        self.stateless_requests = 0
+
+    async def load(self, user_id: str) -> Optional[dict]:
+        user = self.cache.get(user_id)
+        if user is None:
+            self.db_lookups += 1
+            user = await self.users.find_one({"user_id": user_id}, INTERNAL_USER_FIELDS)
+            if user is not None:
+                self.cache.set(user_id, user)
+        return user
+
+    def invalidate(self, user_id: str):
+        """Drop a cached user after writing to their document"""
+        self.cache.pop(user_id)
+
+    async def user(self, payload: dict) -> dict:
+        """The full user document for a decoded token; 401 if the user no longer exists"""
+        self.auth_requests += 1
+        user = await self.load(payload["sub"])
+        if user is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        return user
+
+    async def claims(self, payload: dict) -> dict:
+        """Identity for read-only endpoints; from the token alone when stateless"""
+        if self.stateless and "claims" in payload:
+            self.stateless_requests += 1
+            return {"user_id": payload["sub"], **payload["claims"]}
+        return await self.user(payload)
+
+    def stats(self, uptime: float) -> dict:
+        return {
+            "auth_requests": self.auth_requests,
+            "db_lookups": self.db_lookups,
+            "stateless_requests": self.stateless_requests,
+            # Users-collection QPS with the cache, and what it would be without it
+            "db_qps": round(self.db_lookups / uptime, 3),
+            "uncached_qps": round((self.auth_requests + self.stateless_requests) / uptime, 3),
+            "cache": self.cache.stats(),
+            "stateless_mode": self.stateless,
+        }
+
+
+class TokenAuth:
+    """FastAPI dependencies turning a bearer token into the caller's identity
+
+    Use `user` on endpoints that write, `claims` on read-only ones (see
+    UserResolver.claims).
+    """
+
+    def __init__(self, resolver: UserResolver, secret_key: str, algorithm: str = "HS256"):
+        self.resolver = resolver
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    def decode(self, token: str) -> dict:
+        try:
+            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token has expired")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        if payload.get("sub") is None:
+            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        return payload
+
+    async def user(self, credentials: HTTPAuthorizationCredentials = Depends(bearer)) -> dict:
+        return await self.resolver.user(self.decode(credentials.credentials))
+
+    async def claims(self, credentials: HTTPAuthorizationCredentials = Depends(bearer)) -> dict:
+        """Identity for read-only endpoints; answered from the token alone when stateless"""
+        return await self.resolver.claims(self.decode(credentials.credentials))
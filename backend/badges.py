@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Badge catalogue and rules
+
+Every badge is one BadgeRule: a metric, read from the inputs of an event, and
+the range it has to reach. Metrics belong to a trigger (what changed), so an
+event only evaluates the rules whose inputs it touched:
+
+    meal_count    users.meal_count changed          context["user"]
+    streak        users.streak_count changed        context["user"]
+    daily_totals  a day's rollup changed            context["day"] (+ context["user"])
+    water         a day's water log changed         context["water"]
+
+When a rule is added, existing users can be re-evaluated in bulk:
+
+    python badges.py --reevaluate [--badge BADGE_ID ...]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from pymongo import UpdateOne
+
+
+class Metric(NamedTuple):
+    trigger: str
+    read: Callable[[dict], Optional[float]]
+
+
+class BadgeRule(NamedTuple):
+    badge_id: str
+    name: str
+    description: str
+    icon: str
+    metric: str
+    minimum: float
+    maximum: Optional[float] = None
+
+    @property
+    def trigger(self) -> str:
+        return METRICS[self.metric].trigger
+
+    def matches(self, context: dict) -> bool:
+        value = METRICS[self.metric].read(context)
+        if value is None:
+            return False
+        return value >= self.minimum and (self.maximum is None or value <= self.maximum)
+
+
+def _calorie_target_ratio(context: dict) -> Optional[float]:
+    target = context["user"].get("daily_calories_target")
+    return context["day"].get("calories", 0) / target if target else None
+
+
+METRICS: Dict[str, Metric] = {
+    "meal_count": Metric("meal_count", lambda context: context["user"].get("meal_count", 0)),
+    "streak": Metric("streak", lambda context: context["user"].get("streak_count", 0)),
+    "calorie_target_ratio": Metric("daily_totals", _calorie_target_ratio),
+    "daily_water_glasses": Metric("water", lambda context: context["water"].get("glasses_count", 0)),
+}
+
+CATALOGUE: List[BadgeRule] = [
+    BadgeRule("first_meal", "Primeira Refeição", "Registrou sua primeira refeição!", "🍽️", "meal_count", 1),
+    BadgeRule("week_streak", "Semana Completa", "7 dias consecutivos registrando refeições!", "🔥", "streak", 7),
+    BadgeRule("month_streak", "Mês Dedicado", "30 dias consecutivos! Incrível!", "⭐", "streak", 30),
+    BadgeRule("ten_meals", "10 Refeições", "Registrou 10 refeições!", "📊", "meal_count", 10),
+    BadgeRule("fifty_meals", "50 Refeições", "Registrou 50 refeições! Você é dedicado!", "🏆", "meal_count", 50),
+    BadgeRule("on_target", "Na Medida", "Fechou um dia dentro da sua meta de calorias!", "🎯",
+              "calorie_target_ratio", 0.9, 1.1),
+    BadgeRule("hydrated", "Hidratado", "Bebeu 8 copos de água em um dia!", "💧", "daily_water_glasses", 8),
+]
+
+
+def by_trigger(rules: Iterable[BadgeRule]) -> Dict[str, List[BadgeRule]]:
+    index = defaultdict(list)
+    for rule in rules:
+        index[rule.trigger].append(rule)
+    return dict(index)
+
+
+RULES_BY_TRIGGER = by_trigger(CATALOGUE)
+
+
+def evaluate(triggers: Iterable[str], context: dict, held: Iterable[str] = (),
+             rules_by_trigger: Dict[str, List[BadgeRule]] = RULES_BY_TRIGGER) -> List[str]:
+    """Badges newly earned by the rules of `triggers`; other rules are not looked at"""
+    held = set(held)
+    return [
+        rule.badge_id
+        for trigger in triggers
+        for rule in rules_by_trigger.get(trigger, ())
+        if rule.badge_id not in held and rule.matches(context)
+    ]
+
+
+def catalogue_for(held: Iterable[str]) -> List[dict]:
+    held = set(held)
+    return [
+        {"id": rule.badge_id, "name": rule.name, "description": rule.description, "icon": rule.icon,
+         "earned": rule.badge_id in held}
+        for rule in CATALOGUE
+    ]
+
+
+async def award(db, user_id: str, badge_ids: List[str]):
+    # $addToSet keeps this idempotent if two writers earn the same badge at once
+    if badge_ids:
+        await db.users.update_one({"user_id": user_id}, {"$addToSet": {"badges": {"$each": badge_ids}}})
+
+
+async def reevaluate(db, rules: List[BadgeRule], batch_size: int = 1000) -> dict:
+    """Award `rules` to every user who qualifies; scans only the collections those rules read
+
+    User fields needed by the rules are held in memory for the duration of the
+    run. Returns {badge_id: users awarded}.
+    """
+    selected = by_trigger(rules)
+    users = {}
+    async for user in db.users.find({}, {"_id": 0, "user_id": 1, "meal_count": 1, "streak_count": 1,
+                                         "daily_calories_target": 1, "badges": 1}):
+        users[user["user_id"]] = user
+
+    awards = defaultdict(set)
+
+    def consider(trigger: str, user: dict, context: dict):
+        for badge_id in evaluate([trigger], context, user.get("badges") or (), selected):
+            awards[user["user_id"]].add(badge_id)
+
+    for trigger in selected.keys() & {"meal_count", "streak"}:
+        for user in users.values():
+            consider(trigger, user, {"user": user})
+    if "daily_totals" in selected:
+        async for day in db.daily_rollups.find({}, {"_id": 0, "user_id": 1, "calories": 1, "carbs": 1,
+                                                    "protein": 1, "fat": 1, "meal_count": 1}):
+            if day["user_id"] in users:
+                user = users[day["user_id"]]
+                consider("daily_totals", user, {"user": user, "day": day})
+    if "water" in selected:
+        async for log in db.water_logs.find({}, {"_id": 0, "user_id": 1, "glasses_count": 1}):
+            if log["user_id"] in users:
+                consider("water", users[log["user_id"]], {"water": log})
+
+    ops = [
+        UpdateOne({"user_id": user_id}, {"$addToSet": {"badges": {"$each": sorted(badge_ids)}}})
+        for user_id, badge_ids in awards.items()
+    ]
+    for start in range(0, len(ops), batch_size):
+        await db.users.bulk_write(ops[start:start + batch_size], ordered=False)
+
+    counts = dict.fromkeys((rule.badge_id for rule in rules), 0)
+    for badge_ids in awards.values():
+        for badge_id in badge_ids:
+            counts[badge_id] += 1
+    return counts
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Badge maintenance")
+    parser.add_argument("--reevaluate", action="store_true", help="award badges to every user who qualifies")
+    parser.add_argument("--badge", action="append", help="only this badge (repeatable); default: all")
+    args = parser.parse_args()
+    if not args.reevaluate:
+        parser.print_help()
+        return
+
+    known = {rule.badge_id: rule for rule in CATALOGUE}
+    unknown = set(args.badge or ()) - set(known)
+    if unknown:
+        parser.error(f"unknown badge: {', '.join(sorted(unknown))}")
+    rules = [known[badge_id] for badge_id in args.badge] if args.badge else CATALOGUE
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "nutrijovem_db")]
+
+    started = time.perf_counter()
+    counts = await reevaluate(db, rules)
+    for badge_id, awarded in counts.items():
+        print(f"{badge_id:<14} {awarded} usuários")
+    print(f"Concluído em {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Offline Open Food Facts mirror: barcode lookups from two memory-mapped files
+
+    index.bin    header (magic, count), then `count` sorted uint64 barcodes,
+                 then the matching `count` uint64 offsets into records.bin
+    records.bin  header (magic), then packed records: four float32 nutrients
+                 per 100g and the lengths of name, brand and image URL,
+                 followed by their UTF-8 bytes
+
+Barcodes are stored as integers, so "0789..." and "789..." are the same
+product, as GTIN zero-padding intends. A lookup is a binary search over the
+mapped barcodes and one record read; only the pages touched are resident.
+
+    python barcode_mirror.py build openfoodfacts-products.jsonl.gz [--dir DIR]
+    python barcode_mirror.py update delta.jsonl.gz     # append a delta dump
+    python barcode_mirror.py lookup 7891000100103
+
+Updates append the changed products to records.bin and swap in a merged
+index; superseded records stay behind until the next full build.
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+import catalogue
+
+INDEX_MAGIC = b"OFFIDX01"
+RECORDS_MAGIC = b"OFFREC01"
+INDEX_HEADER = struct.Struct("<8sQ")
+RECORD_HEADER = struct.Struct("<4f3H")
+# Largest barcode that fits in a uint64 key
+MAX_BARCODE_DIGITS = 18
+MAX_TEXT_BYTES = 0xFFFF
+
+DEFAULT_DIR = os.getenv(
+    "OPEN_FOOD_FACTS_MIRROR_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "openfoodfacts")
+)
+
+
+def barcode_key(barcode: str) -> Optional[int]:
+    barcode = str(barcode).strip()
+    if not barcode.isdigit() or len(barcode) > MAX_BARCODE_DIGITS:
+        return None
+    return int(barcode)
+
+
+def _text(value) -> bytes:
+    # Cut at a character boundary below the length field's limit
+    return str(value or "").encode("utf-8")[:MAX_TEXT_BYTES].decode("utf-8", "ignore").encode("utf-8")
+
+
+def pack_record(doc: dict, image_url: str = "") -> bytes:
+    texts = [_text(doc["name"]), _text(doc.get("brand")), _text(image_url)]
+    header = RECORD_HEADER.pack(
+        doc["calories"], doc["carbs"], doc["protein"], doc["fat"], *(len(text) for text in texts)
+    )
+    return header + b"".join(texts)
+
+
+def unpack_record(buffer, offset: int) -> dict:
+    calories, carbs, protein, fat, *lengths = RECORD_HEADER.unpack_from(buffer, offset)
+    position = offset + RECORD_HEADER.size
+    texts = []
+    for length in lengths:
+        texts.append(bytes(buffer[position:position + length]).decode("utf-8"))
+        position += length
+    name, brand, image_url = texts
+    return {
+        "name": name,
+        "brand": brand,
+        # float32 storage; two decimals is all the labels carry
+        "calories": round(calories, 2),
+        "carbs": round(carbs, 2),
+        "protein": round(protein, 2),
+        "fat": round(fat, 2),
+        "portion": "100g",
+        "image_url": image_url,
+        "source": "Open Food Facts"
+    }
+
+
+def _read_index(path: str):
+    with open(path, "rb") as f:
+        magic, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a barcode index")
+        keys = np.fromfile(f, dtype=np.uint64, count=count)
+        offsets = np.fromfile(f, dtype=np.uint64, count=count)
+    return keys, offsets
+
+
+def _write_index(path: str, keys: np.ndarray, offsets: np.ndarray):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, len(keys)))
+        keys.astype(np.uint64).tofile(f)
+        offsets.astype(np.uint64).tofile(f)
+    os.replace(tmp_path, path)
+
+
+def build(rows: Iterable[dict], directory: str = DEFAULT_DIR, delta: bool = False, progress: bool = False) -> dict:
+    """Write the mirror from dump rows; with delta=True, merge them into the existing one"""
+    os.makedirs(directory, exist_ok=True)
+    index_path = os.path.join(directory, "index.bin")
+    records_path = os.path.join(directory, "records.bin")
+    delta = delta and os.path.exists(index_path)
+    stats = {"read": 0, "invalid": 0, "written": 0}
+    started = time.perf_counter()
+
+    # Full builds write beside the live files and swap them in at the end
+    target = records_path if delta else records_path + ".tmp"
+    keys, offsets = [], []
+    with open(target, "ab" if delta else "wb") as records:
+        if records.tell() == 0:
+            records.write(RECORDS_MAGIC)
+        for row in rows:
+            stats["read"] += 1
+            doc = catalogue.to_document(row, "products")
+            key = barcode_key(doc["barcode"]) if doc else None
+            if key is None:
+                stats["invalid"] += 1
+                continue
+            keys.append(key)
+            offsets.append(records.tell())
+            records.write(pack_record(doc, row.get("image_url") or row.get("image_front_url") or ""))
+            if progress and stats["read"] % 100000 == 0:
+                print(f"  {stats['read']} linhas ({stats['read'] / (time.perf_counter() - started):.0f} linhas/s)")
+
+    keys = np.array(keys, dtype=np.uint64)
+    offsets = np.array(offsets, dtype=np.uint64)
+    if delta:
+        old_keys, old_offsets = _read_index(index_path)
+        kept = ~np.isin(old_keys, keys)
+        # Old entries first, so the stable sort below lets the delta win
+        keys = np.concatenate([old_keys[kept], keys])
+        offsets = np.concatenate([old_offsets[kept], offsets])
+
+    order = np.argsort(keys, kind="stable")
+    keys, offsets = keys[order], offsets[order]
+    # Keep the last row of each barcode
+    last = np.ones(len(keys), dtype=bool)
+    last[:-1] = keys[1:] != keys[:-1]
+    keys, offsets = keys[last], offsets[last]
+
+    if not delta:
+        os.replace(target, records_path)
+    _write_index(index_path, keys, offsets)
+    stats["written"] = stats["read"] - stats["invalid"]
+    stats["products"] = int(len(keys))
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+class BarcodeMirror:
+    """Read side of the mirror; a missing mirror simply finds nothing"""
+
+    def __init__(self, directory: str = DEFAULT_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.bin")
+        self.records_path = os.path.join(directory, "records.bin")
+        self._index = self._records = None
+        self._keys = self._offsets = None
+        self._index_mtime = None
+        self.count = 0
+        self.lookups = 0
+        self.hits = 0
+        self.reload_if_changed()
+
+    @property
+    def available(self) -> bool:
+        return self._keys is not None
+
+    def reload_if_changed(self) -> bool:
+        """Reopen the files if the index was rebuilt since they were mapped"""
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._index_mtime:
+            return False
+        self.close()
+        self._index_mtime = mtime
+        if mtime is not None:
+            self._open()
+        return True
+
+    def _open(self):
+        with open(self.index_path, "rb") as f:
+            index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(self.records_path, "rb") as f:
+            records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = INDEX_HEADER.unpack_from(index)
+        if magic != INDEX_MAGIC or records[:len(RECORDS_MAGIC)] != RECORDS_MAGIC:
+            index.close()
+            records.close()
+            raise ValueError(f"{self.directory} does not hold a barcode mirror")
+        start = INDEX_HEADER.size
+        view = memoryview(index)
+        self._keys = view[start:start + 8 * count].cast("Q")
+        self._offsets = view[start + 8 * count:start + 16 * count].cast("Q")
+        self._index, self._records, self.count = index, records, count
+
+    def close(self):
+        # Views into the maps must go before the maps themselves
+        for view in (self._keys, self._offsets):
+            if view is not None:
+                view.release()
+        for mapped in (self._index, self._records):
+            if mapped is not None:
+                mapped.close()
+        self._index = self._records = self._keys = self._offsets = None
+        self.count = 0
+
+    def lookup(self, barcode: str) -> Optional[dict]:
+        if self._keys is None:
+            return None
+        key = barcode_key(barcode)
+        if key is None:
+            return None
+        self.lookups += 1
+        position = bisect.bisect_left(self._keys, key)
+        if position == self.count or self._keys[position] != key:
+            return None
+        self.hits += 1
+        return unpack_record(self._records, self._offsets[position])
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "products": self.count,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the offline Open Food Facts mirror")
+    parser.add_argument("command", choices=["build", "update", "lookup"])
+    parser.add_argument("source", help="dump file (CSV or JSON Lines, optionally .gz), or a barcode for lookup")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help=f"mirror directory (default: {DEFAULT_DIR})")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--delimiter", help="CSV delimiter (default: detected)")
+    args = parser.parse_args()
+
+    if args.command == "lookup":
+        mirror = BarcodeMirror(args.dir)
+        if not mirror.available:
+            sys.exit(f"Nenhum espelho em {args.dir}")
+        started = time.perf_counter()
+        product = mirror.lookup(args.source)
+        elapsed = (time.perf_counter() - started) * 1e6
+        print(product if product else "Produto não encontrado", f"({elapsed:.0f} µs)")
+        return
+
+    rows = catalogue.read_rows(args.source, args.format, args.delimiter)
+    stats = build(rows, args.dir, delta=args.command == "update", progress=True)
+    print(f"Lidas: {stats['read']}, inválidas: {stats['invalid']}, "
+          f"produtos no espelho: {stats['products']} em {stats['seconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: barcode lookups in the offline Open Food Facts mirror
+
+Builds a mirror of --products synthetic products in a temporary directory,
+then times random hits and misses and reports how much of it is resident.
+
+    python benchmarks/bench_barcode_mirror.py --products 1000000
+"""
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import barcode_mirror  # noqa: E402
+from barcode_mirror import BarcodeMirror  # noqa: E402
+
+
+def synthetic_rows(codes):
+    for code in codes:
+        yield {"code": code, "product_name": f"Produto {code}", "brands": "Marca",
+               "nutriments": {"energy-kcal_100g": int(code) % 900, "proteins_100g": 3.5}}
+
+
+def timed(func, args):
+    samples = []
+    for arg in args:
+        started = time.perf_counter()
+        func(arg)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    codes = [str(7890000000000 + rng.randrange(10 ** 9)) for _ in range(args.products)]
+    with tempfile.TemporaryDirectory() as directory:
+        stats = barcode_mirror.build(synthetic_rows(codes), directory)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"{stats['products']} produtos em {stats['seconds']}s, {size / 2 ** 20:.1f} MiB em disco")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        mirror = BarcodeMirror(directory)
+        hits = [rng.choice(codes) for _ in range(args.lookups)]
+        misses = [str(1000000000000 + rng.randrange(10 ** 9)) for _ in range(args.lookups)]
+        for label, sample in (("encontrados", hits), ("ausentes", misses)):
+            median, p95 = timed(mirror.lookup, sample)
+            print(f"{label:12} mediana {median:6.1f} µs   p95 {p95:6.1f} µs")
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"memória residente adicional: {(rss_after - rss_before) / 1024:.1f} MiB")
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: database work behind POST /api/meals for a user with many meals
+
+Seeds --meals meals for one synthetic user into a scratch database
+(BENCH_DB_NAME, default nutrijovem_bench; never DB_NAME, so a benchmark cannot
+write into the app's database), then times the write path of create_meal:
+
+  old  - insert + rollup + update_user_streak (find_one + update_one) +
+         check_and_award_badges (find_one + count_documents + update_one)
+  new  - insert + rollup + gamification.record_meals (one find_one_and_update)
+
+    python benchmarks/bench_create_meal.py --meals 10000 --runs 200
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+import badges  # noqa: E402
+import gamification  # noqa: E402
+import indexes  # noqa: E402
+import rollups  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+def make_meal(timestamp: datetime) -> dict:
+    return {
+        "meal_id": str(uuid.uuid4()),
+        "user_id": USER_ID,
+        "meal_type": "lunch",
+        "food_name": "Arroz e feijão",
+        "calories": 450,
+        "carbs": 60,
+        "protein": 20,
+        "fat": 12,
+        "date": timestamp.strftime("%Y-%m-%d"),
+        "timestamp": timestamp
+    }
+
+
+async def seed(db, meal_count: int):
+    await db.meals.delete_many({"user_id": USER_ID})
+    await db.users.delete_many({"user_id": USER_ID})
+    await indexes.ensure_indexes(db, ["users", "meals", "daily_rollups"])
+    now = datetime.utcnow()
+    for offset in range(0, meal_count, 5000):
+        batch = [make_meal(now - timedelta(minutes=i)) for i in range(offset, min(offset + 5000, meal_count))]
+        await db.meals.insert_many(batch, ordered=False)
+    await db.users.insert_one({
+        "user_id": USER_ID, "email": "bench@example.com", "streak_count": 0,
+        "meal_count": meal_count, "last_activity_date": None, "badges": []
+    })
+    await rollups.rebuild(db, USER_ID)
+
+
+async def old_side_effects(db):
+    """update_user_streak + check_and_award_badges as they were before meal_count"""
+    user = await db.users.find_one({"user_id": USER_ID})
+    today = datetime.utcnow().date()
+    last_activity = user.get("last_activity_date")
+    days_diff = (today - datetime.fromisoformat(last_activity).date()).days if last_activity else None
+    if days_diff == 1:
+        new_streak = user.get("streak_count", 0) + 1
+    elif days_diff == 0:
+        new_streak = user.get("streak_count", 0)
+    else:
+        new_streak = 1
+    await db.users.update_one(
+        {"user_id": USER_ID},
+        {"$set": {"streak_count": new_streak, "last_activity_date": today.isoformat()}}
+    )
+
+    user = await db.users.find_one({"user_id": USER_ID})
+    meal_count = await db.meals.count_documents({"user_id": USER_ID})
+    new_badges = badges.evaluate(["meal_count"], {"user": {"meal_count": meal_count}}, user.get("badges", []))
+    if new_badges:
+        await db.users.update_one({"user_id": USER_ID}, {"$push": {"badges": {"$each": new_badges}}})
+
+
+async def create_meal(db, side_effects):
+    meal = make_meal(datetime.utcnow())
+    await db.meals.insert_one(meal)
+    await rollups.add_meals(db, USER_ID, meal["date"], [meal])
+    await side_effects()
+
+
+async def timed(label, func, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<6} median {statistics.median(samples):7.2f} ms   p95 {sorted(samples)[int(runs * 0.95) - 1]:7.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare create_meal write paths")
+    parser.add_argument("--meals", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("BENCH_DB_NAME", "nutrijovem_bench")]
+
+    print(f"Inserindo {args.meals} refeições...")
+    await seed(db, args.meals)
+    await timed("old", lambda: create_meal(db, lambda: old_side_effects(db)), args.runs)
+    await timed("new", lambda: create_meal(db, lambda: gamification.record_meals(db, USER_ID)), args.runs)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
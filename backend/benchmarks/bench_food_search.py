@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark: food search latency over a large catalogue
+
+Builds a FoodIndex over --foods synthetic foods (the seed list combined with
+preparations and brands) and times typical queries against it, next to the
+old linear `search in name.lower()` scan.
+
+    python benchmarks/bench_food_search.py --foods 50000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from food_index import FoodIndex  # noqa: E402
+from seed_data import BRAZILIAN_FOODS  # noqa: E402
+
+PREPARATIONS = ["cozido", "assado", "grelhado", "frito", "refogado", "cru", "light", "integral", "caseiro",
+                "com sal", "sem sal", "temperado", "em conserva", "desidratado", "congelado"]
+BRANDS = ["Sadia", "Nestlé", "Seara", "Qualy", "Camil", "Tio João", "Piracanjuba", "Itambé", "Vigor", "Perdigão"]
+
+QUERIES = [
+    ("palavra exata", "arroz", None),
+    ("prefixo curto", "fe", None),
+    ("sem acento", "feijao preto", None),
+    ("substring", "anha", None),
+    ("com erro", "fejao carioka", None),
+    ("categoria + busca", "frango", "proteinas"),
+    ("só categoria", None, "frutas"),
+]
+
+
+def synthetic_foods(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    foods = []
+    while len(foods) < count:
+        base = rng.choice(BRAZILIAN_FOODS)
+        name = f"{base['name']} {rng.choice(PREPARATIONS)} {rng.choice(BRANDS)} {len(foods)}"
+        foods.append({**base, "name": name})
+    return foods
+
+
+def linear_search(foods, search, category):
+    filtered = foods
+    if category:
+        filtered = [food for food in filtered if food["category"] == category]
+    if search:
+        search_lower = search.lower()
+        filtered = [food for food in filtered if search_lower in food["name"].lower()]
+    return filtered
+
+
+def timed(func, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(samples), sorted(samples)[int(runs * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Food search latency")
+    parser.add_argument("--foods", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    foods = synthetic_foods(args.foods)
+    started = time.perf_counter()
+    index = FoodIndex(foods)
+    print(f"Índice com {len(index)} alimentos construído em {time.perf_counter() - started:.2f}s {index.stats()}")
+    print(f"{'consulta':<20} {'total':>6} {'índice p50':>12} {'p95':>9} {'linear p50':>12}")
+    for label, search, category in QUERIES:
+        total = index.search(search, category, limit=args.limit)["total"]
+        p50, p95 = timed(lambda: index.search(search, category, limit=args.limit), args.runs)
+        linear_p50, _ = timed(lambda: linear_search(foods, search, category), max(5, args.runs // 20))
+        print(f"{label:<20} {total:>6} {p50:>10.0f}µs {p95:>7.0f}µs {linear_p50:>10.0f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event-loop lag during a concurrent login burst
+
+Simulates --logins simultaneous password checks, either inline on the event
+loop (the old behaviour) or through passwords.PasswordHasher, while a ticker
+measures how late the loop wakes up. High lag means every other request on
+the worker is stalled.
+
+    python benchmarks/bench_login_lag.py --logins 50 --rounds 12 --workers 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from passwords import PasswordHasher, pwd_context  # noqa: E402
+
+
+async def measure_lag(stop: asyncio.Event, interval: float = 0.01) -> list:
+    lags = []
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+    return lags
+
+
+async def run(label: str, check, logins: int):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(0.05)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(check() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    lags = await ticker
+    print(
+        f"{label:<8} {logins} logins em {elapsed:6.2f}s   "
+        f"lag médio {statistics.mean(lags):7.1f} ms   lag máx {max(lags):7.1f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure event-loop lag under concurrent logins")
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("senha123456", rounds=args.rounds)
+
+    async def inline_check():
+        return pwd_context.verify("senha123456", hashed)
+
+    hasher = PasswordHasher(workers=args.workers, rounds=args.rounds)
+    await hasher.verify("aquecimento", hashed)  # start the worker processes outside the measurement
+
+    async def pool_check():
+        return await hasher.verify("senha123456", hashed)
+
+    await run("inline", inline_check, args.logins)
+    await run("pool", pool_check, args.logins)
+    print(hasher.stats())
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
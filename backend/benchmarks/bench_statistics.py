@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: monthly statistics via the old Python grouping vs MongoDB aggregation
+
+Seeds --meals meals for one synthetic user into a scratch database
+(BENCH_DB_NAME, default nutrijovem_bench; never DB_NAME, so a benchmark cannot
+write into the app's database), then times three ways of computing weekly
+totals for the last --days days:
+
+  python   - fetch meal documents and group them with defaultdict (the old path)
+  meals    - $match/$group pipeline over db.meals, numeric fields only
+  rollups  - rollups.weekly_totals() over db.daily_rollups (what the API uses)
+
+    python benchmarks/bench_statistics.py --meals 100000 --days 30
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+import indexes  # noqa: E402
+import rollups  # noqa: E402
+
+USER_ID = "bench-user"
+
+
+async def seed(db, meal_count: int, span_days: int):
+    await db.meals.delete_many({"user_id": USER_ID})
+    await indexes.ensure_indexes(db, ["meals", "daily_rollups"])
+    now = datetime.utcnow()
+    batch = []
+    for i in range(meal_count):
+        timestamp = now - timedelta(seconds=random.randrange(span_days * 86400))
+        batch.append({
+            "meal_id": f"bench-{i}",
+            "user_id": USER_ID,
+            "meal_type": "lunch",
+            "food_name": "Arroz e feijão",
+            "calories": random.uniform(50, 900),
+            "carbs": random.uniform(0, 100),
+            "protein": random.uniform(0, 60),
+            "fat": random.uniform(0, 40),
+            "date": timestamp.strftime("%Y-%m-%d"),
+            "timestamp": timestamp
+        })
+        if len(batch) == 5000:
+            await db.meals.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.meals.insert_many(batch, ordered=False)
+    await rollups.rebuild(db, USER_ID)
+
+
+async def python_path(db, start, end, limit):
+    meals = await db.meals.find({
+        "user_id": USER_ID,
+        "timestamp": {"$gte": start, "$lte": end}
+    }).to_list(limit)
+    weekly = defaultdict(lambda: {"calories": 0, "meals": 0})
+    for meal in meals:
+        week = meal["timestamp"].isocalendar()[1]
+        weekly[week]["calories"] += meal.get("calories", 0)
+        weekly[week]["meals"] += 1
+    return sum(w["meals"] for w in weekly.values())
+
+
+async def meals_pipeline(db, start, end):
+    weeks = await db.meals.aggregate([
+        {"$match": {"user_id": USER_ID, "timestamp": {"$gte": start, "$lte": end}}},
+        {"$project": {"_id": 0, "timestamp": 1, "calories": 1}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$timestamp", "unit": "week", "startOfWeek": "monday"}},
+            "calories": {"$sum": "$calories"},
+            "meals": {"$sum": 1}
+        }}
+    ]).to_list(None)
+    return sum(w["meals"] for w in weeks)
+
+
+async def rollups_pipeline(db, start, end):
+    weeks = await rollups.weekly_totals(db, USER_ID, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+    return sum(w["meals"] for w in weeks)
+
+
+async def timed(label, func, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        meals = await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:<22} median {statistics.median(samples):8.1f} ms   p95 {sorted(samples)[int(runs * 0.95) - 1]:8.1f} ms   meals counted: {meals}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare statistics aggregation strategies")
+    parser.add_argument("--meals", type=int, default=100000)
+    parser.add_argument("--span-days", type=int, default=365, help="seeded meals are spread over this many days")
+    parser.add_argument("--days", type=int, default=30, help="statistics window")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("BENCH_DB_NAME", "nutrijovem_bench")]
+
+    if not args.skip_seed:
+        print(f"Inserindo {args.meals} refeições...")
+        await seed(db, args.meals, args.span_days)
+
+    end = datetime.utcnow()
+    start = end - timedelta(days=args.days)
+    await timed("python (to_list 1000)", lambda: python_path(db, start, end, 1000), args.runs)
+    await timed("python (sem limite)", lambda: python_path(db, start, end, None), args.runs)
+    await timed("pipeline em meals", lambda: meals_pipeline(db, start, end), args.runs)
+    await timed("pipeline em rollups", lambda: rollups_pipeline(db, start, end), args.runs)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Python memory per request for concurrent image uploads
+
+Sends --concurrency simultaneous uploads of a ~--megabytes image straight to
+the ASGI app (the body arrives in 64 KB chunks, as from a server) and reports
+the tracemalloc peak, divided per request, for:
+
+  base64     - image_base64 form field decoded with base64 (the old endpoints)
+  multipart  - binary UploadFile read through uploads.read_image_upload
+
+    python benchmarks/bench_upload_memory.py --concurrency 20 --megabytes 5
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from uploads import read_image_upload  # noqa: E402
+
+BOUNDARY = "benchmarkboundary"
+CHUNK = 64 * 1024
+
+app = FastAPI()
+
+
+@app.post("/base64")
+async def upload_base64(image_base64: str = Form(...)):
+    try:
+        image_bytes = base64.b64decode(image_base64)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    return {"sha256": hashlib.sha256(image_bytes).hexdigest()}
+
+
+@app.post("/multipart")
+async def upload_multipart(image: UploadFile = File(...)):
+    image_bytes = await read_image_upload(image, 20 * 1024 * 1024, 50_000_000)
+    return {"sha256": hashlib.sha256(image_bytes).hexdigest()}
+
+
+def make_image(megabytes: float) -> bytes:
+    # Noise does not compress, so the PNG is about 3 bytes per pixel
+    edge = int((megabytes * 1024 * 1024 / 3) ** 0.5)
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (edge, edge), os.urandom(edge * edge * 3)).save(buffer, format="PNG", compress_level=0)
+    return buffer.getvalue()
+
+
+def multipart_body(name: str, value: bytes, filename: str = None) -> bytes:
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    content_type = "Content-Type: image/png\r\n" if filename else ""
+    return (f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n{content_type}\r\n").encode() + value + \
+        f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def call(path: str, body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+                    (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    view = memoryview(body)
+    position = 0
+    status = []
+
+    async def receive():
+        nonlocal position
+        chunk = bytes(view[position:position + CHUNK])
+        position += CHUNK
+        await asyncio.sleep(0)
+        return {"type": "http.request", "body": chunk, "more_body": position < len(body)}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def measure(path: str, body: bytes, concurrency: int) -> float:
+    await call(path, body)  # warm up imports and caches outside the measurement
+    tracemalloc.start()
+    statuses = await asyncio.gather(*(call(path, body) for _ in range(concurrency)))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert set(statuses) == {200}, statuses
+    return peak / concurrency
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--megabytes", type=float, default=5)
+    args = parser.parse_args()
+
+    image = make_image(args.megabytes)
+    bodies = {
+        "base64": ("/base64", multipart_body("image_base64", base64.b64encode(image))),
+        "multipart": ("/multipart", multipart_body("image", image, filename="photo.png")),
+    }
+    print(f"imagem de {len(image) / 2 ** 20:.1f} MiB, {args.concurrency} envios simultâneos")
+    for label, (path, body) in bodies.items():
+        peak = asyncio.run(measure(path, body, args.concurrency))
+        print(f"{label:10} corpo {len(body) / 2 ** 20:5.1f} MiB   pico por requisição {peak / 2 ** 20:5.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from pymongo.errors import PyMongoError
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded in-process LRU cache with optional per-entry TTL"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, count: bool = True):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return value
+            del self._data[key]
+        if count:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class TieredCache:
+    """In-process LRU in front of a MongoDB collection with TTL expiry
+
+    Documents are stored as {_id: key, value, expires_at}; the collection needs a
+    TTL index on expires_at (expireAfterSeconds=0), declared in indexes.py.
+    """
+
+    def __init__(self, collection, maxsize: int = 1024, ttl: float = 86400):
+        self.collection = collection
+        self.ttl = ttl
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.store_hits = 0
+        self.store_misses = 0
+        self.store_errors = 0
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        try:
+            doc = await self.collection.find_one({"_id": key})
+        except PyMongoError:
+            self.store_errors += 1
+            return default
+
+        # The TTL monitor only runs once a minute, so expired documents can still be read
+        if not doc or doc["expires_at"] <= datetime.utcnow():
+            self.store_misses += 1
+            return default
+
+        self.store_hits += 1
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        self.memory.set(key, doc["value"], ttl=remaining)
+        return doc["value"]
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl=ttl)
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$set": {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)}},
+                upsert=True
+            )
+        except PyMongoError:
+            self.store_errors += 1
+
+    async def delete(self, key: str):
+        self.memory.pop(key)
+        try:
+            await self.collection.delete_one({"_id": key})
+        except PyMongoError:
+            self.store_errors += 1
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        hits = memory["hits"] + self.store_hits
+        lookups = memory["hits"] + memory["misses"]
+        return {
+            "memory": memory,
+            "store_hits": self.store_hits,
+            "store_misses": self.store_misses,
+            "store_errors": self.store_errors,
+            "hits": hits,
+            "misses": self.store_misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
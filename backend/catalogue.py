@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Food and product catalogues (db.foods, db.products) and their bulk importer
+
+Nutrition tables (TACO, IBGE POF, Open Food Facts dumps) are streamed from
+CSV or JSON Lines, optionally gzip-compressed, in fixed-size chunks, so memory
+stays bounded whatever the file size. Each chunk is deduplicated and written
+with one unordered bulk upsert keyed on the normalized food name or the
+product barcode, so re-importing a table updates it in place. Distinct foods
+whose names only differ in accents are reported as collisions, not merged.
+
+    python catalogue.py foods taco.csv [--delimiter ";"] [--chunk-size 5000]
+    python catalogue.py products openfoodfacts-products.jsonl.gz
+    python catalogue.py --seed     # load the lists shipped in seed_data.py
+
+Every import bumps db.catalogue_meta, which running servers poll to reload.
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, Optional
+
+from pymongo import UpdateOne
+from pymongo.collation import Collation, CollationStrength
+from pymongo.errors import BulkWriteError
+
+import indexes
+import seed_data
+from food_index import normalize
+
+NUTRIENT_FIELDS = ("calories", "carbs", "protein", "fat")
+
+# Column names seen in the supported sources, per catalogue field; dotted
+# names reach into nested JSON objects (Open Food Facts "nutriments")
+COLUMN_ALIASES: Dict[str, tuple] = {
+    "name": ("name", "nome", "descricao", "descrição", "descricao_alimento", "description",
+             "product_name_pt", "product_name"),
+    "barcode": ("barcode", "code", "ean", "codigo_barras"),
+    "brand": ("brand", "brands", "marca"),
+    "category": ("category", "categoria", "grupo"),
+    "portion": ("portion", "porcao", "porção", "serving_size"),
+    "calories": ("calories", "kcal", "energia_kcal", "energia (kcal)", "energy-kcal_100g",
+                 "nutriments.energy-kcal_100g"),
+    "carbs": ("carbs", "carboidrato", "carboidrato (g)", "carbohydrates_100g", "nutriments.carbohydrates_100g"),
+    "protein": ("protein", "proteina", "proteína", "proteina (g)", "proteína (g)", "proteins_100g",
+                "nutriments.proteins_100g"),
+    "fat": ("fat", "lipideos", "lipídeos", "lipideos (g)", "lipídeos (g)", "fat_100g", "nutriments.fat_100g"),
+}
+
+# Per catalogue: the field documents are keyed (and deduplicated) on
+CATALOGUES = {"foods": "key", "products": "barcode"}
+
+# Food keys fold accents, so "Maçã" and "Maca" share one. A row only replaces
+# the food stored under its key when the names match ignoring case (but not
+# accents); otherwise it is a collision and is skipped.
+NAME_COLLATION = Collation("pt", strength=CollationStrength.SECONDARY)
+DUPLICATE_KEY = 11000
+
+
+def open_text(path: str) -> io.TextIOBase:
+    """Text stream over a plain or gzip-compressed file (detected from its magic bytes)"""
+    with open(path, "rb") as raw:
+        compressed = raw.read(2) == b"\x1f\x8b"
+    binary = gzip.open(path, "rb") if compressed else open(path, "rb")
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+
+def read_rows(path: str, file_format: Optional[str] = None, delimiter: Optional[str] = None) -> Iterator[dict]:
+    """Yield one dict per CSV row or JSON line, without loading the file"""
+    if file_format is None:
+        stem = path[:-3] if path.endswith(".gz") else path
+        file_format = "jsonl" if stem.endswith((".jsonl", ".json", ".ndjson")) else "csv"
+    with open_text(path) as stream:
+        if file_format == "jsonl":
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            if delimiter is None:
+                # TACO exports use ";", Open Food Facts tabs, most others ","
+                sample = stream.readline()
+                delimiter = max((",", ";", "\t"), key=sample.count)
+                stream = _prepend(sample, stream)
+            yield from csv.DictReader(stream, delimiter=delimiter)
+
+
+def _prepend(first_line: str, stream) -> Iterator[str]:
+    yield first_line
+    yield from stream
+
+
+def _lookup(row: dict, column: str):
+    if column in row:
+        return row[column]
+    value = row
+    for part in column.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _number(value) -> float:
+    """Numeric cell; TACO marks traces as "Tr" and missing values as "NA" or "*" """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip().replace(",", "."))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def to_document(row: dict, catalogue: str) -> Optional[dict]:
+    """Catalogue document for a source row, or None if it lacks a name (or barcode, for products)"""
+    lowered = {str(key).strip().lower(): value for key, value in row.items()}
+    fields = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            value = _lookup(lowered, alias)
+            if value not in (None, ""):
+                fields[field] = value
+                break
+
+    name = str(fields.get("name", "")).strip()
+    if not name:
+        return None
+    doc = {"name": name, "portion": str(fields.get("portion") or "100g")}
+    doc.update({nutrient: _number(fields.get(nutrient)) for nutrient in NUTRIENT_FIELDS})
+
+    if catalogue == "products":
+        barcode = str(fields.get("barcode", "")).strip()
+        if not barcode.isdigit():
+            return None
+        doc["barcode"] = barcode
+        doc["brand"] = str(fields.get("brand") or "").split(",")[0].strip()
+    else:
+        doc["key"] = normalize(name)
+        doc["category"] = str(fields.get("category") or "outros").strip().lower()
+    return doc
+
+
+def _same_food(a: dict, b: dict) -> bool:
+    return a["name"].casefold() == b["name"].casefold()
+
+
+async def _upsert(collection, catalogue: str, key_field: str, docs: Dict[str, dict], now: datetime) -> tuple:
+    """(inserted, updated, collisions) for one bulk upsert of deduplicated documents"""
+    if catalogue == "foods":
+        ops = [UpdateOne({key_field: key, "name": doc["name"]}, {"$set": {**doc, "imported_at": now}},
+                         upsert=True, collation=NAME_COLLATION)
+               for key, doc in docs.items()]
+    else:
+        ops = [UpdateOne({key_field: key}, {"$set": {**doc, "imported_at": now}}, upsert=True)
+               for key, doc in docs.items()]
+    try:
+        result = await collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # A food whose key is taken by another name: the upsert hits the unique key index
+        errors = e.details["writeErrors"]
+        if any(error["code"] != DUPLICATE_KEY for error in errors) or catalogue != "foods":
+            raise
+        return e.details["nUpserted"], e.details["nMatched"], len(errors)
+    return result.upserted_count, result.matched_count, 0
+
+
+async def import_rows(db, catalogue: str, rows: Iterable[dict], chunk_size: int = 5000,
+                      progress: bool = False) -> dict:
+    """Upsert rows into db.<catalogue> in chunks; returns counts and rows/sec"""
+    key_field = CATALOGUES[catalogue]
+    collection = db[catalogue]
+    stats = {"read": 0, "invalid": 0, "duplicates": 0, "collisions": 0, "inserted": 0, "updated": 0}
+    started = time.perf_counter()
+    rows = iter(rows)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        stats["read"] += len(chunk)
+        now = datetime.utcnow()
+        # Later rows win within a chunk, as they would across chunks
+        docs = {}
+        for row in chunk:
+            doc = to_document(row, catalogue)
+            if doc is None:
+                stats["invalid"] += 1
+                continue
+            previous = docs.get(doc[key_field])
+            if previous is not None and catalogue == "foods" and not _same_food(previous, doc):
+                stats["collisions"] += 1
+                continue
+            stats["duplicates"] += previous is not None
+            docs[doc[key_field]] = doc
+        if docs:
+            inserted, updated, collisions = await _upsert(collection, catalogue, key_field, docs, now)
+            stats["inserted"] += inserted
+            stats["updated"] += updated
+            stats["collisions"] += collisions
+        if progress:
+            elapsed = time.perf_counter() - started
+            print(f"  {stats['read']} linhas ({stats['read'] / elapsed:.0f} linhas/s)")
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 2)
+    stats["rows_per_second"] = round(stats["read"] / elapsed) if elapsed else 0
+    await db.catalogue_meta.update_one({"_id": catalogue}, {"$set": {"updated_at": datetime.utcnow()}}, upsert=True)
+    return stats
+
+
+async def seed(db, only_if_empty: bool = True):
+    """Load the catalogues shipped in seed_data.py (by default only into empty collections)"""
+    for catalogue, rows in (("foods", seed_data.BRAZILIAN_FOODS), ("products", seed_data.PRODUCTS)):
+        if only_if_empty and await db[catalogue].estimated_document_count():
+            continue
+        await import_rows(db, catalogue, rows)
+
+
+async def load_foods(db) -> list:
+    # Insertion order, so browsing lists foods as the source table does
+    return await db.foods.find({}, {"_id": 0, "key": 0, "imported_at": 0}).sort("_id", 1).to_list(None)
+
+
+async def version(db, catalogue: str) -> Optional[datetime]:
+    meta = await db.catalogue_meta.find_one({"_id": catalogue})
+    return meta["updated_at"] if meta else None
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Import food and product catalogues into MongoDB")
+    parser.add_argument("catalogue", nargs="?", choices=sorted(CATALOGUES))
+    parser.add_argument("path", nargs="?", help="CSV or JSON Lines file, optionally .gz")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+    parser.add_argument("--delimiter", help="CSV delimiter (default: detected)")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--seed", action="store_true", help="load seed_data.py into empty catalogues")
+    args = parser.parse_args()
+    if not args.seed and not (args.catalogue and args.path):
+        parser.error("give a catalogue and a file, or --seed")
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "nutrijovem_db")]
+    await indexes.ensure_indexes(db, list(CATALOGUES))
+
+    if args.seed:
+        await seed(db)
+        print("Catálogos iniciais carregados")
+        return
+
+    stats = await import_rows(
+        db, args.catalogue, read_rows(args.path, args.format, args.delimiter), args.chunk_size, progress=True
+    )
+    print(f"Lidas: {stats['read']}, inválidas: {stats['invalid']}, duplicadas: {stats['duplicates']}, "
+          f"em conflito: {stats['collisions']}, "
+          f"inseridas: {stats['inserted']}, atualizadas: {stats['updated']} "
+          f"em {stats['seconds']}s ({stats['rows_per_second']} linhas/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+
+from pymongo.errors import PyMongoError
+
+import gamification
+import rollups
+
+logger = logging.getLogger(__name__)
+
+
+class MealEventProcessor:
+    """Applies meal-logged events from the db.meal_events outbox in the background
+
+    Request handlers write an event next to the meal and return; the processor
+    is woken through an in-process queue and applies all pending events of a
+    user in one batch (streak, meal_count, badges). A periodic sweep picks up
+    events whose wake-up was lost to a restart or to another worker.
+
+    Delivery is at least once: events are marked processed only after they are
+    applied, and gamification.record_meals skips event ids it already applied.
+    """
+
+    def __init__(self, db, on_applied: Optional[Callable[[str], None]] = None, batch_size: int = 100,
+                 sweep_interval: float = 30.0, retention: timedelta = timedelta(days=7)):
+        self.db = db
+        self.on_applied = on_applied
+        self.batch_size = batch_size
+        self.sweep_interval = sweep_interval
+        self.retention = retention
+        self.queue = asyncio.Queue()
+        self._queued_users = set()
+        self._tasks = []
+        self.emitted = 0
+        self.processed = 0
+        self.batches = 0
+        self.failed = 0
+        self.avg_lag: Optional[float] = None
+        self.max_lag = 0.0
+        self.oldest_pending: Optional[float] = None
+
+    async def emit(self, user_id: str, day: str, meals: int = 1) -> str:
+        """Record that `meals` meals were logged for `day` and wake the consumer"""
+        event_id = str(uuid.uuid4())
+        await self.db.meal_events.insert_one({
+            "_id": event_id,
+            "type": "meal_logged",
+            "user_id": user_id,
+            "date": day,
+            "meals": meals,
+            "processed": False,
+            "created_at": datetime.utcnow()
+        })
+        self.emitted += 1
+        self.notify(user_id)
+        return event_id
+
+    def notify(self, user_id: str):
+        # One wake-up per user is enough; processing drains all of its events
+        if user_id not in self._queued_users:
+            self._queued_users.add(user_id)
+            self.queue.put_nowait(user_id)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._consume()), asyncio.create_task(self._sweep())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _consume(self):
+        while True:
+            user_id = await self.queue.get()
+            self._queued_users.discard(user_id)
+            try:
+                await self.process_user(user_id)
+            except Exception:
+                # Events stay unprocessed and the next sweep retries them
+                self.failed += 1
+                logger.exception("Could not apply meal events for user %s", user_id)
+
+    async def process_user(self, user_id: str) -> int:
+        """Apply up to batch_size pending events of one user; returns how many were applied"""
+        events = await self.db.meal_events.find(
+            {"user_id": user_id, "processed": False}
+        ).sort("created_at", 1).to_list(self.batch_size)
+        if not events:
+            return 0
+
+        by_day = defaultdict(list)
+        for event in events:
+            by_day[event["date"]].append({"event_id": event["_id"], "meals": event["meals"]})
+        days = sorted(by_day)
+        totals = {
+            rollup["date"]: rollup for rollup in await rollups.get_rollups(self.db, user_id, days[0], days[-1])
+        }
+        # Oldest day first, so the streak advances in order
+        for day in days:
+            await gamification.record_meals(
+                self.db, user_id, today=date.fromisoformat(day), events=by_day[day], day=totals.get(day)
+            )
+
+        now = datetime.utcnow()
+        await self.db.meal_events.update_many(
+            {"_id": {"$in": [event["_id"] for event in events]}},
+            {"$set": {"processed": True, "processed_at": now, "expires_at": now + self.retention}}
+        )
+        if self.on_applied:
+            self.on_applied(user_id)
+
+        self.batches += 1
+        self.processed += len(events)
+        for event in events:
+            lag = (now - event["created_at"]).total_seconds()
+            self.max_lag = max(self.max_lag, lag)
+            self.avg_lag = lag if self.avg_lag is None else 0.9 * self.avg_lag + 0.1 * lag
+        if len(events) == self.batch_size:
+            self.notify(user_id)
+        return len(events)
+
+    async def _sweep(self):
+        cutoff = None
+        while True:
+            try:
+                query = {"processed": False}
+                if cutoff is not None:
+                    # Recent events still have their in-process wake-up pending
+                    query["created_at"] = {"$lt": cutoff}
+                for user_id in await self.db.meal_events.distinct("user_id", query):
+                    self.notify(user_id)
+                oldest = await self.db.meal_events.find_one(
+                    {"processed": False}, {"created_at": 1}, sort=[("created_at", 1)]
+                )
+                self.oldest_pending = (
+                    (datetime.utcnow() - oldest["created_at"]).total_seconds() if oldest else None
+                )
+            except PyMongoError as e:
+                logger.warning("Meal event sweep failed: %s", e)
+            await asyncio.sleep(self.sweep_interval)
+            cutoff = datetime.utcnow() - timedelta(seconds=self.sweep_interval)
+
+    def stats(self) -> dict:
+        return {
+            "queued_users": self.queue.qsize(),
+            "emitted": self.emitted,
+            "processed": self.processed,
+            "batches": self.batches,
+            "failed": self.failed,
+            "avg_lag_ms": round(self.avg_lag * 1000, 1) if self.avg_lag is not None else None,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "oldest_pending_seconds": round(self.oldest_pending, 1) if self.oldest_pending is not None else None,
+        }
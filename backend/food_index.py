@@ -0,0 +1,179 @@
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_EMPTY = np.empty(0, dtype=np.int32)
+
+# Ranking tiers, best first
+EXACT, NAME_PREFIX, WORD_PREFIX, SUBSTRING = range(4)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, accent-folded, punctuation-free form used for matching ("Feijão (preto)" -> "feijao preto")"""
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", folded).strip()
+
+
+def trigrams(text: str, padded: bool = True) -> set:
+    """Character trigrams per word; padded ones also mark word starts and ends"""
+    grams = set()
+    for word in text.split():
+        if padded:
+            word = f" {word} "
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+class FoodIndex:
+    """Read-only search index over a food list, built once and queried from memory
+
+    - category -> ids hash map
+    - sorted vocabulary of normalized words, so word prefixes are a bisect range
+    - trigram inverted index (sorted int32 postings) for substring candidates
+      and for typo-tolerant matching by shared trigrams
+
+    Matches are ranked exact name, name prefix, word prefix, substring; ties go
+    to shorter names. When nothing matches directly, foods sharing at least
+    `min_similarity` of the query's trigrams are returned instead, so typos
+    ("fejao") still find something.
+    """
+
+    def __init__(self, foods: Iterable[dict], min_similarity: float = 0.5):
+        self.foods: List[dict] = list(foods)
+        self.min_similarity = min_similarity
+        self.names = [normalize(food["name"]) for food in self.foods]
+        count = len(self.foods)
+
+        categories = defaultdict(list)
+        words = defaultdict(list)
+        grams = defaultdict(list)
+        for food_id, (food, name) in enumerate(zip(self.foods, self.names)):
+            categories[food.get("category")].append(food_id)
+            for word in set(name.split()):
+                words[word].append(food_id)
+            for gram in trigrams(name):
+                grams[gram].append(food_id)
+
+        as_array = lambda ids: np.array(ids, dtype=np.int32)  # noqa: E731
+        self.categories: Dict[Optional[str], np.ndarray] = {key: as_array(ids) for key, ids in categories.items()}
+        self.vocabulary = sorted(words)
+        self.word_postings = [as_array(words[word]) for word in self.vocabulary]
+        self.gram_postings: Dict[str, np.ndarray] = {gram: as_array(ids) for gram, ids in grams.items()}
+
+        # Whole names sorted, so a name prefix is also a bisect range
+        by_name = sorted(range(count), key=lambda food_id: self.names[food_id])
+        self._sorted_names = as_array(by_name)
+        self._sorted_name_keys = [self.names[food_id] for food_id in by_name]
+        # Tie-break order within a tier: shorter names first, then alphabetical
+        order = sorted(range(count), key=lambda food_id: (len(self.names[food_id]), self.names[food_id]))
+        self._base_rank = np.empty(count, dtype=np.int64)
+        self._base_rank[order] = np.arange(count)
+
+    def __len__(self):
+        return len(self.foods)
+
+    def category_names(self) -> List[str]:
+        return sorted(key for key in self.categories if key)
+
+    def in_categories(self, categories: Iterable[str]) -> List[dict]:
+        """Every food in any of the categories, in catalogue order"""
+        postings = [self.categories[category] for category in categories if category in self.categories]
+        ids = np.unique(np.concatenate(postings)) if postings else _EMPTY
+        return [self.foods[food_id] for food_id in ids.tolist()]
+
+    def _prefix_range(self, keys: List[str], prefix: str) -> range:
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + "\uffff", start)
+        return range(start, end)
+
+    def _mask(self, ids) -> np.ndarray:
+        mask = np.zeros(len(self.foods), dtype=bool)
+        mask[ids] = True
+        return mask
+
+    def _word_prefix_mask(self, prefix: str) -> np.ndarray:
+        postings = [self.word_postings[i] for i in self._prefix_range(self.vocabulary, prefix)]
+        return self._mask(np.concatenate(postings) if postings else _EMPTY)
+
+    def _term_masks(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(foods whose name contains term, foods with a word starting with term)"""
+        word_prefix = self._word_prefix_mask(term)
+        if len(term) < 3:
+            return word_prefix, word_prefix
+        postings = sorted((self.gram_postings.get(gram, _EMPTY) for gram in trigrams(term, padded=False)), key=len)
+        candidates = postings[0]
+        for other in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = candidates[self._mask(other)[candidates]]
+        # Word-prefix matches are certain; only the rest needs a check, since
+        # shared trigrams do not guarantee a contiguous match
+        candidates = candidates[~word_prefix[candidates]]
+        if len(term) > 3:
+            candidates = [food_id for food_id in candidates.tolist() if term in self.names[food_id]]
+        contains = word_prefix.copy()
+        contains[candidates] = True
+        return contains, word_prefix
+
+    def _fuzzy(self, query: str, allowed: Optional[np.ndarray]) -> np.ndarray:
+        grams = trigrams(query)
+        postings = [self.gram_postings[gram] for gram in grams if gram in self.gram_postings]
+        if not postings:
+            return _EMPTY
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.foods))
+        if allowed is not None:
+            shared[~allowed] = 0
+        ids = np.flatnonzero(shared >= max(1, self.min_similarity * len(grams)))
+        # Most shared trigrams first
+        return ids[np.lexsort((self._base_rank[ids], -shared[ids]))]
+
+    def search(self, query: Optional[str] = None, category: Optional[str] = None,
+               offset: int = 0, limit: int = 50) -> dict:
+        """Ranked foods matching every word of `query` (all foods without one); returns {"foods", "total"}"""
+        normalized = normalize(query or "")
+        if not normalized:
+            # Browsing keeps the catalogue order
+            ids = self.categories.get(category, _EMPTY) if category else np.arange(len(self.foods))
+            return self._page(ids, offset, limit)
+
+        terms = normalized.split()
+        allowed = self._mask(self.categories.get(category, _EMPTY)) if category else None
+        matches, first_word_prefix = self._term_masks(terms[0])
+        for term in terms[1:]:
+            matches &= self._term_masks(term)[0]
+        if allowed is not None:
+            matches &= allowed
+        ids = np.flatnonzero(matches)
+
+        if not len(ids):
+            return self._page(self._fuzzy(normalized, allowed), offset, limit)
+
+        tiers = np.where(first_word_prefix[ids], WORD_PREFIX, SUBSTRING)
+        prefixed = self._prefix_range(self._sorted_name_keys, normalized)
+        if prefixed:
+            # Equal names sort first within the prefix range
+            exact_end = bisect.bisect_right(self._sorted_name_keys, normalized, prefixed.start, prefixed.stop)
+            tiers[self._mask(self._sorted_names[prefixed.start:prefixed.stop])[ids]] = NAME_PREFIX
+            tiers[self._mask(self._sorted_names[prefixed.start:exact_end])[ids]] = EXACT
+        ids = ids[np.lexsort((self._base_rank[ids], tiers))]
+        return self._page(ids, offset, limit)
+
+    def _page(self, ids: np.ndarray, offset: int, limit: int) -> dict:
+        return {
+            "foods": [self.foods[food_id] for food_id in ids[offset:offset + limit].tolist()],
+            "total": int(len(ids)),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "foods": len(self.foods),
+            "categories": len(self.categories),
+            "words": len(self.vocabulary),
+            "trigrams": len(self.gram_postings),
+        }
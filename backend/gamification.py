@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Streaks, meal counters and badges kept on the user document
+
+Logging meals costs one find_one_and_update: a pipeline update bumps
+users.meal_count and advances streak_count/last_activity_date atomically, and
+the badge rules of those triggers (see badges.py) are evaluated against the
+document it returns. A second write happens only when a badge is earned.
+
+meal_count is maintained on write; users created before it existed need a
+one-off backfill from db.meals:
+
+    python gamification.py --backfill
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+
+import badges
+import indexes
+
+# Event ids remembered per user for deduplication; redeliveries arrive long before this many newer events
+APPLIED_EVENTS_KEPT = 500
+
+# Bookkeeping that only record_meals needs; every other read of a user leaves it out
+INTERNAL_USER_FIELDS = {"applied_event_ids": 0}
+
+USER_PROJECTION = {
+    "_id": 0, "user_id": 1, "meal_count": 1, "streak_count": 1, "last_activity_date": 1,
+    "daily_calories_target": 1, "badges": 1
+}
+
+
+def streak_update(today: date, meals: int = 0, events: Optional[List[dict]] = None) -> list:
+    """Pipeline that adds meals to meal_count and advances the streak for `today`
+
+    With `events` ([{event_id, meals}]) the meals come from the events instead,
+    and events already listed in applied_event_ids are skipped, so replaying
+    a batch is a no-op.
+    """
+    day = today.isoformat()
+    yesterday = (today - timedelta(days=1)).isoformat()
+    # Older documents may hold a datetime instead of an ISO date string
+    last_day = {"$cond": [
+        {"$eq": [{"$type": "$last_activity_date"}, "date"]},
+        {"$dateToString": {"date": "$last_activity_date", "format": "%Y-%m-%d"}},
+        "$last_activity_date"
+    ]}
+    streak = {"$ifNull": ["$streak_count", 0]}
+
+    stages = []
+    if events is None:
+        added, fresh = meals, True
+    else:
+        applied = {"$ifNull": ["$applied_event_ids", []]}
+        stages.append({"$set": {"_pending": {"$filter": {
+            "input": {"$literal": events},
+            "cond": {"$not": [{"$in": ["$$this.event_id", applied]}]}
+        }}}})
+        added = {"$sum": "$_pending.meals"}
+        fresh = {"$gt": [{"$size": "$_pending"}, 0]}
+
+    advanced = {"$switch": {
+        "branches": [
+            # Late events for a day before the last activity leave the streak alone
+            {"case": {"$lt": [day, last_day]}, "then": streak},
+            {"case": {"$eq": [last_day, day]}, "then": {"$max": [streak, 1]}},
+            {"case": {"$eq": [last_day, yesterday]}, "then": {"$add": [streak, 1]}},
+        ],
+        "default": 1
+    }}
+    # Every expression in one $set stage sees the document as it was before the stage
+    update = {
+        "meal_count": {"$add": [{"$ifNull": ["$meal_count", 0]}, added]},
+        "streak_count": {"$cond": [fresh, advanced, streak]},
+        "last_activity_date": {"$cond": [{"$and": [fresh, {"$lt": [last_day, day]}]}, day, last_day]},
+    }
+    if events is not None:
+        update["applied_event_ids"] = {
+            "$slice": [{"$concatArrays": [applied, "$_pending.event_id"]}, -APPLIED_EVENTS_KEPT]
+        }
+    stages.append({"$set": update})
+    if events is not None:
+        stages.append({"$unset": "_pending"})
+    return stages
+
+
+async def record_meals(db, user_id: str, meals: int = 1, today: Optional[date] = None,
+                       events: Optional[List[dict]] = None, day: Optional[dict] = None) -> Optional[dict]:
+    """Count logged meals, update the streak and award badges; returns the updated user fields
+
+    Pass `events` to apply meal events idempotently (see streak_update), and
+    the day's rollup as `day` to also evaluate daily-totals badges.
+    """
+    user = await db.users.find_one_and_update(
+        {"user_id": user_id},
+        streak_update(today or datetime.utcnow().date(), meals, events),
+        projection=USER_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if not user:
+        return None
+
+    triggers = ["meal_count", "streak"] + (["daily_totals"] if day is not None else [])
+    new_badges = badges.evaluate(triggers, {"user": user, "day": day}, user.get("badges") or ())
+    if new_badges:
+        await badges.award(db, user_id, new_badges)
+        user["badges"] = (user.get("badges") or []) + new_badges
+    user["new_badges"] = new_badges
+    return user
+
+
+async def backfill_meal_counts(db):
+    """Set users.meal_count from db.meals for every user that has meals
+
+    Meals logged while this runs may be counted twice or not at all, so run it
+    before traffic depends on the counter (a second run fixes any drift).
+    """
+    await db.meals.aggregate([
+        {"$group": {"_id": "$user_id", "meal_count": {"$sum": 1}}},
+        {"$project": {"_id": 0, "user_id": "$_id", "meal_count": 1}},
+        {"$merge": {"into": "users", "on": "user_id", "whenMatched": "merge", "whenNotMatched": "discard"}}
+    ], allowDiskUse=True).to_list(None)
+    result = await db.users.update_many({"meal_count": {"$exists": False}}, {"$set": {"meal_count": 0}})
+    return result.modified_count
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Gamification maintenance")
+    parser.add_argument("--backfill", action="store_true", help="recompute users.meal_count from db.meals")
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+        return
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "nutrijovem_db")]
+
+    # $merge on user_id needs the unique index
+    await indexes.ensure_indexes(db, ["users"])
+    started = time.perf_counter()
+    without_meals = await backfill_meal_counts(db)
+    print(f"meal_count atualizado em {time.perf_counter() - started:.1f}s ({without_meals} usuários sem refeições)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
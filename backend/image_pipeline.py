@@ -0,0 +1,146 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from phash import dhash
+
+STAGES = ("decode", "resize", "encode")
+
+EXIF_ORIENTATION = 0x0112
+# Orientations that rotate by 90 degrees, swapping width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """Content type from the file signature (magic bytes), or None if not a supported image"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def image_dimensions(stream: BinaryIO) -> Tuple[int, int]:
+    """(width, height) from the image header, without decoding any pixels"""
+    try:
+        with Image.open(stream) as image:
+            return image.size
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(str(e))
+
+
+def preprocess_image(data: bytes, max_edge: int = 1024, image_format: str = "JPEG", quality: int = 85) -> dict:
+    """Decode, orient, downscale and re-encode an image without its metadata
+
+    Also returns the perceptual hash of the decoded image so callers don't have
+    to decode it twice.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(data))
+        # From the header: draft() below shrinks image.size to the reduced decode
+        original_size = image.size
+        if image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+            original_size = original_size[::-1]
+        # JPEG can decode straight at a reduced scale, which is much cheaper
+        image.draft("RGB", (max_edge, max_edge))
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(str(e))
+    # Apply the EXIF orientation before the metadata is dropped on re-encode
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    image_hash = dhash(image)
+    timings["resize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    output = buffer.getvalue()
+    timings["encode"] = time.perf_counter() - start
+
+    return {
+        "image": output,
+        "phash": image_hash,
+        "format": image_format,
+        "original_size": original_size,
+        "size": image.size,
+        "bytes_in": len(data),
+        "bytes_out": len(output),
+        "timings": timings,
+    }
+
+
+class ImagePipeline:
+    """Runs preprocess_image on a thread pool and keeps per-stage metrics"""
+
+    def __init__(self, max_edge: int = 1024, image_format: str = "JPEG", quality: int = 85,
+                 workers: Optional[int] = None):
+        self.max_edge = max_edge
+        self.image_format = image_format
+        self.quality = quality
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-pipeline")
+        self.processed = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+
+    async def process(self, data: bytes, max_edge: Optional[int] = None, image_format: Optional[str] = None,
+                      quality: Optional[int] = None) -> dict:
+        """Preprocess on the pool; the keyword arguments override the pipeline defaults"""
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.executor, preprocess_image, data,
+                max_edge or self.max_edge, image_format or self.image_format, quality or self.quality
+            )
+        except InvalidImageError:
+            self.failed += 1
+            raise
+
+        self.processed += 1
+        self.bytes_in += result["bytes_in"]
+        self.bytes_out += result["bytes_out"]
+        for stage, seconds in result["timings"].items():
+            self.stage_seconds[stage] += seconds
+        return result
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        processed = self.processed or 1
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "compression_ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+            "avg_stage_ms": {
+                stage: round(seconds * 1000 / processed, 2) for stage, seconds in self.stage_seconds.items()
+            },
+        }
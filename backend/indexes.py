@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Index declarations for every collection the backend queries
+
+The server creates missing indexes at startup (a no-op once they exist) and
+only logs indexes that conflict with a declaration. From the command line the
+same declarations can be applied or audited:
+
+    python indexes.py --create     # create missing indexes
+    python indexes.py --rebuild    # also replace conflicting ones, one at a time
+    python indexes.py --report     # missing, conflicting, retired, undeclared and unused ($indexStats) indexes
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "meals": [
+        IndexModel([("meal_id", ASCENDING)], name="meal_id_unique", unique=True),
+        # meal_id breaks timestamp ties, so keyset pages (pagination.py) are read in index order
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("meal_id", DESCENDING)],
+                   name="user_timestamp_meal"),
+        # Also serves plain (user_id, date) lookups through its prefix
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("timestamp", DESCENDING), ("meal_id", DESCENDING)],
+                   name="user_date_timestamp_meal"),
+    ],
+    "meal_events": [
+        # Only pending events are indexed; processed ones expire through the TTL index
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)], name="pending_user_created",
+                   partialFilterExpression={"processed": False}),
+        IndexModel([("created_at", ASCENDING)], name="pending_created", partialFilterExpression={"processed": False}),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "water_logs": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_date_unique", unique=True),
+    ],
+    "goals": [
+        IndexModel([("goal_id", ASCENDING)], name="goal_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "meal_plans": [
+        IndexModel([("plan_id", ASCENDING)], name="plan_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "foods": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    ],
+    "products": [
+        IndexModel([("barcode", ASCENDING)], name="barcode_unique", unique=True),
+    ],
+    "daily_rollups": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_date_unique", unique=True),
+    ],
+    "analysis_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "image_hashes": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        IndexModel([("version", ASCENDING)], name="version"),
+    ],
+    "analysis_jobs": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "barcode_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Superseded indexes, old name -> declared replacement. Each one is dropped once
+# its replacement exists, so deployments never maintain both.
+RETIRED_INDEXES: Dict[str, Dict[str, str]] = {
+    "meals": {
+        # Replaced when meal_id was appended for keyset pagination
+        "user_timestamp": "user_timestamp_meal",
+        "user_date_timestamp": "user_date_timestamp_meal",
+    },
+}
+INDEX_NOT_FOUND = 27
+
+
+# Options that change what an index does; two indexes differing in any of them are not interchangeable
+INDEX_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _plain(value):
+    # index_information() returns SON documents, declarations usually plain dicts
+    if hasattr(value, "items"):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+def _key(index: dict) -> tuple:
+    """Key pattern (plus partial filter, which MongoDB also tells indexes apart by) of a declared or existing index"""
+    key = index["key"]
+    fields = tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                   for field, direction in (key.items() if hasattr(key, "items") else key))
+    return fields, _plain(index.get("partialFilterExpression"))
+
+
+def _spec(index: dict) -> tuple:
+    options = tuple((option, _plain(index[option])) for option in INDEX_OPTIONS
+                    if option in index and index[option] is not False)
+    return _key(index), options
+
+
+def _conflicts(models: List[IndexModel], existing: dict) -> Dict[str, List[str]]:
+    """Declared index name -> existing indexes in its way
+
+    An index is in the way when it has the declared name but another key or
+    options, or the declared key under another name (e.g. an index created
+    before names were declared, auto-named like "email_1").
+    """
+    conflicts = {}
+    for model in models:
+        name = model.document["name"]
+        key, spec = _key(model.document), _spec(model.document)
+        in_the_way = [
+            other for other, info in existing.items()
+            if other != "_id_" and ((other == name and _spec(info) != spec) or (other != name and _key(info) == key))
+        ]
+        if in_the_way:
+            conflicts[name] = sorted(in_the_way)
+    return conflicts
+
+
+def _model(name: str, info: dict) -> IndexModel:
+    """IndexModel recreating an existing index from its index_information() entry"""
+    options = {option: value for option, value in info.items() if option not in ("key", "v", "ns")}
+    return IndexModel(info["key"], name=name, **options)
+
+
+async def _rebuild(collection, model: IndexModel, stale: List[str], existing: dict, label: str):
+    """Replace the indexes in the way of a declaration, restoring them if the new build fails
+
+    MongoDB refuses a second index over the same key, so the old one has to go
+    first; for that window the collection has neither.
+    """
+    dropped = []
+    try:
+        for other in stale:
+            logger.warning("Dropping index %s.%s, which conflicts with the declared %s",
+                           collection.name, other, label)
+            await collection.drop_index(other)
+            dropped.append(other)
+        logger.info("Building index %s", label)
+        await collection.create_indexes([model])
+    except OperationFailure:
+        if dropped:
+            logger.warning("Restoring %s on %s", ", ".join(dropped), collection.name)
+            await collection.create_indexes([_model(other, existing[other]) for other in dropped])
+        raise
+
+
+async def ensure_indexes(db, collections: Optional[Iterable[str]] = None, rebuild: bool = False) -> dict:
+    """Create every declared index that is missing
+
+    Returns {"created": [...], "rebuilt": [...], "conflicting": [...], "retired": [...], "failed": [...]}.
+
+    Existing indexes that conflict with a declaration (same name with another
+    key or options, or the same key under another name) are only reported,
+    unless `rebuild` is set (python indexes.py --rebuild): then they are
+    dropped and the declared index is built in their place, and put back if
+    that build fails. Build failures (e.g. a unique index over existing
+    duplicates) are logged and skipped so one bad collection cannot keep the
+    API from starting. RETIRED_INDEXES are dropped once their replacement is
+    in place.
+    """
+    created, rebuilt, conflicting, retired, failed = [], [], [], [], []
+    for collection_name in collections or INDEXES:
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        conflicts = _conflicts(INDEXES[collection_name], existing)
+        for model in INDEXES[collection_name]:
+            name = model.document["name"]
+            stale = conflicts.get(name, [])
+            if name in existing and not stale:
+                continue
+            label = f"{collection_name}.{name}"
+            if stale and not rebuild:
+                logger.warning("Index %s conflicts with %s; run python indexes.py --rebuild",
+                               label, ", ".join(stale))
+                conflicting.append(label)
+                continue
+            started = time.perf_counter()
+            try:
+                if stale:
+                    await _rebuild(collection, model, stale, existing, label)
+                else:
+                    logger.info("Building index %s", label)
+                    await collection.create_indexes([model])
+            except OperationFailure as e:
+                logger.error("Could not build index %s: %s", label, e)
+                failed.append(label)
+                continue
+            logger.info("Built index %s in %.1fs", label, time.perf_counter() - started)
+            (rebuilt if stale else created).append(label)
+            existing[name] = model.document
+        retired += await _retire(collection, collection_name, existing)
+    return {"created": created, "rebuilt": rebuilt, "conflicting": conflicting, "retired": retired, "failed": failed}
+
+
+async def _retire(collection, collection_name: str, existing: dict) -> List[str]:
+    """Drop the collection's retired indexes whose replacement exists; returns their labels"""
+    dropped = []
+    for old, replacement in RETIRED_INDEXES.get(collection_name, {}).items():
+        if old not in existing or replacement not in existing:
+            continue
+        label = f"{collection_name}.{old}"
+        try:
+            await collection.drop_index(old)
+        except OperationFailure as e:
+            # Another worker got there first
+            if e.code != INDEX_NOT_FOUND:
+                raise
+        logger.info("Dropped retired index %s (replaced by %s)", label, replacement)
+        dropped.append(label)
+    return dropped
+
+
+async def report(db) -> dict:
+    """Per collection: declared indexes that are missing or conflicting, retired and undeclared ones,
+    and ones never used since restart"""
+    result = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        declared = {model.document["name"] for model in models}
+        existing = await collection.index_information()
+        usage = {
+            stats["name"]: stats["accesses"]["ops"]
+            async for stats in collection.aggregate([{"$indexStats": {}}])
+        }
+        retired = set(RETIRED_INDEXES.get(collection_name, {})) & set(existing)
+        result[collection_name] = {
+            "missing": sorted(declared - set(existing)),
+            "conflicting": _conflicts(models, existing),
+            "retired": sorted(retired),
+            "undeclared": sorted(set(existing) - declared - retired - {"_id_"}),
+            "unused": sorted(name for name, ops in usage.items() if ops == 0 and name != "_id_"),
+            "ops": usage,
+        }
+    return result
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Create or audit MongoDB indexes")
+    parser.add_argument("--create", action="store_true", help="create missing indexes")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="also replace indexes that conflict with the declarations (restored if the build fails)")
+    parser.add_argument("--report", action="store_true", help="report missing, undeclared and unused indexes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "nutrijovem_db")]
+
+    if args.create or args.rebuild or not args.report:
+        outcome = await ensure_indexes(db, rebuild=args.rebuild)
+        print(f"Criados: {len(outcome['created'])}, reconstruídos: {len(outcome['rebuilt'])}, "
+              f"em conflito: {len(outcome['conflicting'])}, aposentados: {len(outcome['retired'])}, "
+              f"falharam: {len(outcome['failed'])}")
+    if args.report:
+        for collection_name, info in (await report(db)).items():
+            print(f"{collection_name}:")
+            print(f"  faltando:       {', '.join(info['missing']) or '-'}")
+            conflicting = [f"{name} ({', '.join(others)})" for name, others in info["conflicting"].items()]
+            print(f"  em conflito:    {', '.join(conflicting) or '-'}")
+            print(f"  aposentados:    {', '.join(info['retired']) or '-'}")
+            print(f"  não declarados: {', '.join(info['undeclared']) or '-'}")
+            print(f"  sem uso:        {', '.join(info['unused']) or '-'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
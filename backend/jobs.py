@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class FairQueue:
+    """Bounded queue that hands out items round-robin across owners
+
+    Each owner (user) has its own FIFO; get() takes the head of the owner that
+    has waited longest, so one heavy submitter cannot starve everyone else.
+    """
+
+    def __init__(self, maxsize: int = 200, per_owner_maxsize: int = 5):
+        self.maxsize = maxsize
+        self.per_owner_maxsize = per_owner_maxsize
+        self._owners = OrderedDict()
+        self._size = 0
+        self._not_empty = asyncio.Event()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def owner_qsize(self, owner: Hashable) -> int:
+        return len(self._owners.get(owner, ()))
+
+    def check_capacity(self, owner: Hashable):
+        """Raise QueueFullError if put_nowait() for this owner would be rejected"""
+        if self._size >= self.maxsize:
+            raise QueueFullError("queue is full")
+        if self.owner_qsize(owner) >= self.per_owner_maxsize:
+            raise QueueFullError("too many pending items for this owner")
+
+    def put_nowait(self, owner: Hashable, item: Any):
+        self.check_capacity(owner)
+        self._owners.setdefault(owner, deque()).append(item)
+        self._size += 1
+        self._not_empty.set()
+
+    async def get(self) -> Tuple[Hashable, Any]:
+        while not self._size:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        owner, items = next(iter(self._owners.items()))
+        item = items.popleft()
+        # Rotate the owner to the back of the line (or drop it once drained)
+        del self._owners[owner]
+        if items:
+            self._owners[owner] = items
+        self._size -= 1
+        return owner, item
+
+
+class WorkerPool:
+    """Fixed number of asyncio workers draining a FairQueue"""
+
+    def __init__(self, queue: FairQueue, handler: Callable[[Hashable, Any], Awaitable[None]],
+                 concurrency: int = 4):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.avg_duration: Optional[float] = None
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        while True:
+            owner, item = await self.queue.get()
+            self.active += 1
+            start = time.perf_counter()
+            try:
+                await self.handler(owner, item)
+                self.completed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Job handler failed")
+            finally:
+                self.active -= 1
+                duration = time.perf_counter() - start
+                # Exponential moving average, used to estimate Retry-After
+                self.avg_duration = duration if self.avg_duration is None else 0.9 * self.avg_duration + 0.1 * duration
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is expected to drain"""
+        per_job = self.avg_duration or 5.0
+        return max(1, round(per_job * (self.queue.qsize() + self.active) / self.concurrency))
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "maxsize": self.queue.maxsize,
+            "active": self.active,
+            "concurrency": self.concurrency,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_duration_ms": round(self.avg_duration * 1000, 1) if self.avg_duration is not None else None,
+        }
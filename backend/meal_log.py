@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+import rollups
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snack")
+
+
+def analysis_number(value) -> float:
+    """Nutrient value from an LLM answer, which may be missing or not a number"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def meals_from_analysis(analysis: dict, meal_type: Optional[str] = None) -> List[dict]:
+    """One meal per food the LLM identified; unknown meal types are logged as snacks"""
+    meal_type = meal_type or analysis.get("meal_type_suggestion")
+    if meal_type not in MEAL_TYPES:
+        meal_type = "snack"
+    return [
+        {
+            "meal_type": meal_type,
+            "food_name": str(food.get("name") or "Alimento"),
+            "calories": analysis_number(food.get("calories")),
+            "carbs": analysis_number(food.get("carbs")),
+            "protein": analysis_number(food.get("protein")),
+            "fat": analysis_number(food.get("fat")),
+            "portion_size": str(food.get("portion_size") or "")
+        }
+        for food in analysis.get("foods") or []
+        if isinstance(food, dict)
+    ]
+
+
+async def save_meals(db, events, user_id: str, meals: List[dict], image_id: Optional[str] = None) -> List[str]:
+    """Log meals sharing one photo: one insert, one rollup update and one event"""
+    if not meals:
+        return []
+    now = datetime.utcnow()
+    date = now.strftime("%Y-%m-%d")
+    meal_docs = [
+        {
+            "meal_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "meal_type": meal["meal_type"],
+            "food_name": meal["food_name"],
+            "calories": meal["calories"],
+            "carbs": meal.get("carbs"),
+            "protein": meal.get("protein"),
+            "fat": meal.get("fat"),
+            "portion_size": meal.get("portion_size"),
+            "image_id": image_id,
+            "date": date,
+            "timestamp": now
+        }
+        for meal in meals
+    ]
+
+    await db.meals.insert_many(meal_docs)
+    await rollups.add_meals(db, user_id, date, meal_docs)
+
+    # Streak, meal counter and badges are applied in the background
+    await events.emit(user_id, date, meals=len(meal_docs))
+
+    return [meal["meal_id"] for meal in meal_docs]
@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from gridfs.errors import FileExists
+
+from image_pipeline import InvalidImageError, preprocess_image, sniff_image_type
+
+
+async def store_image(bucket, image_bytes: bytes, user_id: str, image_id: Optional[str] = None,
+                      variant: Optional[str] = None) -> str:
+    """Store a meal photo (or one of its variants) in the GridFS bucket; returns its id"""
+    content_type = sniff_image_type(image_bytes)
+    if not content_type:
+        raise InvalidImageError("unsupported image type")
+    image_id = image_id or str(uuid.uuid4())
+    metadata = {
+        "user_id": user_id,
+        "content_type": content_type,
+        "sha256": hashlib.sha256(image_bytes).hexdigest()
+    }
+    if variant:
+        metadata["variant"] = variant
+    await bucket.upload_from_stream_with_id(
+        image_id,
+        f"{image_id}.{content_type.split('/')[1]}",
+        image_bytes,
+        metadata=metadata
+    )
+    return image_id
+
+
+class VariantRenderer:
+    """Renders downscaled copies of meal photos, stored next to the original as "<image_id>:<variant>"
+
+    Runs on its own thread pool, so variant work neither waits behind nor
+    delays the images headed for the LLM, and keeps its own counters.
+    """
+
+    def __init__(self, bucket, sizes: Dict[str, int], image_format: str = "WEBP", quality: int = 80,
+                 workers: int = 1):
+        self.bucket = bucket
+        self.sizes = sizes
+        self.image_format = image_format
+        self.quality = quality
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-variants")
+        self.rendered = 0
+        self.failed = 0
+
+    async def render(self, image_bytes: bytes, variant: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        try:
+            processed = await loop.run_in_executor(
+                self.executor, preprocess_image, image_bytes, self.sizes[variant], self.image_format, self.quality
+            )
+        except InvalidImageError:
+            self.failed += 1
+            raise
+        self.rendered += 1
+        return processed["image"]
+
+    async def create(self, image_id: str, image_bytes: bytes, user_id: str, variant: str) -> bytes:
+        """Render one variant of a meal photo and store it; returns the rendered bytes"""
+        rendered = await self.render(image_bytes, variant)
+        try:
+            await store_image(self.bucket, rendered, user_id, image_id=f"{image_id}:{variant}", variant=variant)
+        except FileExists:
+            # Generated concurrently by another request; both copies are identical
+            pass
+        return rendered
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {"rendered": self.rendered, "failed": self.failed}
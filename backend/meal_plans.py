@@ -0,0 +1,38 @@
+import random
+from typing import List
+
+from food_index import FoodIndex
+
+WEEK_DAYS = (
+    ("monday", "Segunda-feira"),
+    ("tuesday", "Terça-feira"),
+    ("wednesday", "Quarta-feira"),
+    ("thursday", "Quinta-feira"),
+    ("friday", "Sexta-feira"),
+    ("saturday", "Sábado"),
+    ("sunday", "Domingo"),
+)
+
+# Per meal: the categories its foods are drawn from, and how many it gets
+MEAL_SLOTS = {
+    "breakfast": (("carboidratos", "frutas", "laticinios"), 3),
+    "lunch": (("carboidratos", "proteinas"), 4),
+    "dinner": (("carboidratos", "proteinas"), 3),
+    "snack": (("frutas", "merendas", "bebidas"), 2),
+}
+
+
+def week_plan(foods: FoodIndex, rng: random.Random = random) -> List[dict]:
+    """Seven days of meals sampled from the whole food catalogue"""
+    pools = {meal: foods.in_categories(categories) for meal, (categories, _) in MEAL_SLOTS.items()}
+    return [
+        {
+            "day": day,
+            "day_label": label,
+            "meals": {
+                meal: rng.sample(pools[meal], min(count, len(pools[meal])))
+                for meal, (_, count) in MEAL_SLOTS.items()
+            }
+        }
+        for day, label in WEEK_DAYS
+    ]
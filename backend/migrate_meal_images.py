@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Move inline meal photos (meals.image_base64) into the meal_images GridFS bucket
+
+Safe to re-run: meals are migrated one by one and each photo is stored under the
+meal_id, so an interrupted run just picks up where it stopped.
+
+    python migrate_meal_images.py [--batch-size 100] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import base64
+import binascii
+import time
+
+from image_pipeline import sniff_image_type
+from server import db, store_meal_image
+
+
+async def migrate(batch_size: int, dry_run: bool):
+    query = {"image_base64": {"$nin": [None, ""]}}
+    total = await db.meals.count_documents(query)
+    print(f"{total} refeições com imagem inline")
+    if dry_run or not total:
+        return
+
+    migrated = skipped = 0
+    started = time.perf_counter()
+    cursor = db.meals.find(query, {"meal_id": 1, "user_id": 1, "image_base64": 1}, batch_size=batch_size)
+    async for meal in cursor:
+        try:
+            image_bytes = base64.b64decode(meal["image_base64"].split(",")[-1])
+        except (binascii.Error, ValueError):
+            image_bytes = None
+
+        image_id = meal["meal_id"]
+        update = {"$unset": {"image_base64": ""}}
+        if image_bytes and sniff_image_type(image_bytes):
+            exists = await db["meal_images.files"].find_one({"_id": image_id}, {"_id": 1})
+            if not exists:
+                # Chunks left behind by an interrupted upload would clash with the new ones
+                await db["meal_images.chunks"].delete_many({"files_id": image_id})
+                try:
+                    await store_meal_image(image_bytes, meal["user_id"], image_id=image_id)
+                except Exception as e:
+                    # Leave the inline image in place so the next run retries it
+                    print(f"  erro em {meal['meal_id']}: {e}")
+                    continue
+            update["$set"] = {"image_id": image_id}
+            migrated += 1
+        else:
+            skipped += 1
+        await db.meals.update_one({"_id": meal["_id"]}, update)
+
+        done = migrated + skipped
+        if done % batch_size == 0:
+            print(f"  {done}/{total} ({done / (time.perf_counter() - started):.0f}/s)")
+
+    print(f"Migradas: {migrated}, descartadas (imagem inválida): {skipped}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size, args.dry_run))
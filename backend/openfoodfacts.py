@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import aiohttp
+
+from cache import TieredCache
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """Open Food Facts could not be asked (timeout, connection error, 5xx); never cached"""
+
+
+def parse_product(product: dict) -> dict:
+    nutriments = product.get("nutriments", {})
+    return {
+        "name": product.get("product_name", "Produto desconhecido"),
+        "brand": product.get("brands", ""),
+        "calories": nutriments.get("energy-kcal_100g", 0),
+        "carbs": nutriments.get("carbohydrates_100g", 0),
+        "protein": nutriments.get("proteins_100g", 0),
+        "fat": nutriments.get("fat_100g", 0),
+        "portion": "100g",
+        "image_url": product.get("image_url", ""),
+        "source": "Open Food Facts"
+    }
+
+
+class OpenFoodFactsClient:
+    """Barcode lookups against the Open Food Facts API behind a two-tier cache
+
+    One pooled aiohttp session is shared by all lookups. Products are cached
+    for `ttl` seconds, unknown barcodes for `miss_ttl`; upstream errors are not
+    cached. Concurrent lookups of the same barcode share one upstream request.
+    """
+
+    def __init__(self, cache: TieredCache, base_url: str = "https://world.openfoodfacts.org",
+                 timeout: float = 5.0, connections: int = 20, miss_ttl: float = 3600):
+        self.cache = cache
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 2.0))
+        self.connections = connections
+        self.miss_ttl = miss_ttl
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.upstream_requests = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections, ttl_dns_cache=300),
+                timeout=self.timeout,
+                headers={"User-Agent": "NutriJovem/1.0 (barcode lookup)"}
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def lookup(self, barcode: str) -> Optional[dict]:
+        """Product for the barcode, or None if Open Food Facts does not know it"""
+        product, _ = await self._lookup(barcode)
+        return product
+
+    async def lookup_many(self, barcodes: Iterable[str], concurrency: int = 8) -> Dict[str, dict]:
+        """Look up several barcodes with at most `concurrency` lookups in flight
+
+        Returns {barcode: {"product", "source", "latency_ms"}}, where source is
+        "cache" or "open_food_facts", and product is None for unknown barcodes;
+        failed lookups carry "error" instead of a source.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(barcode):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    product, source = await self._lookup(barcode)
+                    result = {"product": product, "source": source}
+                except Exception as e:
+                    # One bad barcode must not fail the others
+                    if not isinstance(e, UpstreamError):
+                        logger.exception("Open Food Facts lookup failed for %s", barcode)
+                    result = {"product": None, "source": None, "error": str(e) or type(e).__name__}
+                result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                return barcode, result
+
+        unique = list(dict.fromkeys(barcodes))
+        return dict(await asyncio.gather(*(one(barcode) for barcode in unique)))
+
+    async def _lookup(self, barcode: str) -> Tuple[Optional[dict], str]:
+        cached = await self.cache.get(barcode)
+        if cached is not None:
+            return cached["product"], "cache"
+
+        task = self._inflight.get(barcode)
+        if task is None:
+            # The fetch runs as its own task, so it outlives any caller that gives up
+            task = asyncio.create_task(self._fetch_and_cache(barcode))
+            self._inflight[barcode] = task
+            task.add_done_callback(lambda done: self._finished(barcode, done))
+        else:
+            self.coalesced += 1
+        # shield: a cancelled caller stops waiting without cancelling the fetch for the others
+        return await asyncio.shield(task), "open_food_facts"
+
+    def _finished(self, barcode: str, task: asyncio.Task):
+        if self._inflight.get(barcode) is task:
+            del self._inflight[barcode]
+        # Mark the outcome as seen even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch_and_cache(self, barcode: str) -> Optional[dict]:
+        product = await self._fetch(barcode)
+        try:
+            await self.cache.set(barcode, {"product": product}, ttl=None if product else self.miss_ttl)
+        except Exception:
+            # The answer is still good; it just will not be cached
+            logger.exception("Could not cache Open Food Facts product %s", barcode)
+        return product
+
+    async def _fetch(self, barcode: str) -> Optional[dict]:
+        self.upstream_requests += 1
+        url = f"{self.base_url}/api/v0/product/{barcode}.json"
+        try:
+            async with self._get_session().get(url) as response:
+                if response.status == 404:
+                    return None
+                if response.status != 200:
+                    self.errors += 1
+                    raise UpstreamError(f"Open Food Facts answered {response.status}")
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.errors += 1
+            raise UpstreamError(str(e) or type(e).__name__) from e
+        if not isinstance(data, dict) or not isinstance(data.get("product", {}), dict):
+            self.errors += 1
+            raise UpstreamError("Open Food Facts answered an unexpected body")
+        if data.get("status") != 1:
+            return None
+        return parse_product(data.get("product", {}))
+
+    def stats(self) -> dict:
+        return {
+            "upstream_requests": self.upstream_requests,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "inflight": len(self._inflight),
+            "cache": self.cache.stats(),
+        }
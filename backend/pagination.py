@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+# Newest first; meal_id breaks ties between meals logged at the same instant
+MEAL_SORT = [("timestamp", -1), ("meal_id", -1)]
+
+
+def encode_cursor(meal: dict) -> str:
+    """Opaque cursor pointing just past `meal` in MEAL_SORT order"""
+    raw = json.dumps([meal["timestamp"].isoformat(), meal["meal_id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """(timestamp, meal_id) from a cursor; raises ValueError if it was not made by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, meal_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(meal_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def after_cursor(cursor: Optional[str]) -> dict:
+    """Query filter for the meals after the cursor (none for the first page)"""
+    if not cursor:
+        return {}
+    timestamp, meal_id = decode_cursor(cursor)
+    return {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "meal_id": {"$lt": meal_id}},
+    ]}
+
+
+def _json_default(value):
+    # Same datetime format as FastAPI's JSON responses
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+async def ndjson_lines(documents: AsyncIterator[dict], serialize: Callable[[dict], dict],
+                       flush_bytes: int = 32 * 1024) -> AsyncIterator[bytes]:
+    """One JSON line per document, flushed in ~flush_bytes chunks (the first line at once)"""
+    buffer = []
+    size = 0
+    first = True
+    async for doc in documents:
+        line = json.dumps(serialize(doc), default=_json_default, ensure_ascii=False).encode() + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if first or size >= flush_bytes:
+            yield b"".join(buffer)
+            buffer, size, first = [], 0, False
+    if buffer:
+        yield b"".join(buffer)
@@ -0,0 +1,95 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str, rounds: int) -> str:
+    return pwd_context.hash(password, rounds=rounds)
+
+
+def _verify(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """bcrypt on a dedicated process pool, so a login storm never blocks the event loop
+
+    At most `max_pending` operations are handed to the pool at once; further
+    callers wait their turn in-process, which keeps the pool's own queue short.
+    """
+
+    def __init__(self, workers: int = 2, rounds: int = 12, max_pending: Optional[int] = None):
+        self.workers = workers
+        self.rounds = rounds
+        self.max_pending = max_pending or workers * 4
+        # Used only to spot hashes weaker than the configured work factor;
+        # stronger ones are left alone rather than downgraded on login
+        self._policy = pwd_context.copy(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+        self._executor = None
+        self._slots = None
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.total_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._executor
+
+    async def _run(self, func, *args):
+        pool = self._pool()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.max_wait_seconds = max(self.max_wait_seconds, started - queued_at)
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+        finally:
+            self.running -= 1
+            self._slots.release()
+            self.completed += 1
+            self.total_seconds += time.perf_counter() - started
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True when the hash was made with fewer rounds than the configured work factor"""
+        return self._policy.needs_update(hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "max_pending": self.max_pending,
+            "queued": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "avg_ms": round(self.total_seconds * 1000 / self.completed, 1) if self.completed else None,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+        }
@@ -0,0 +1,156 @@
+import io
+from array import array
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """Difference hash: compares neighbouring pixels of a (size+1)x size grayscale thumbnail"""
+    gray = image.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = gray.tobytes()
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dhash_bytes(data: bytes) -> int:
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("L", (64, 64))
+        return dhash(image)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class HashIndex:
+    """Hamming-radius search over 64-bit hashes using multi-index hashing
+
+    The hash is split into max_distance + 1 disjoint chunks. By the pigeonhole
+    principle any hash within max_distance of the query matches it exactly on at
+    least one chunk, so only those bucket entries need a full popcount check.
+    """
+
+    def __init__(self, max_distance: int = 5, bits: int = HASH_BITS, max_size: Optional[int] = None):
+        self.max_distance = max_distance
+        self.bits = bits
+        self.max_size = max_size
+        chunk_count = max_distance + 1
+        bounds = [round(i * bits / chunk_count) for i in range(chunk_count + 1)]
+        self._chunks = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self._tables = [{} for _ in self._chunks]
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._values: List[Any] = []
+        # hash -> entry id, oldest first; ids of removed entries are reused
+        self._ids = {}
+        self._free: List[int] = []
+        self.lookups = 0
+        self.matches = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, value_hash: int, value: Any):
+        """Add a hash; re-adding an existing hash replaces its value and makes it the newest"""
+        existing = self._ids.pop(value_hash, None)
+        if existing is not None:
+            self._ids[value_hash] = existing
+            self._values[existing] = value
+            return
+
+        if self.max_size is not None and len(self._ids) >= self.max_size:
+            self.remove(next(iter(self._ids)))
+            self.evictions += 1
+
+        if self._free:
+            entry_id = self._free.pop()
+            self._values[entry_id] = value
+        else:
+            entry_id = len(self._values)
+            if entry_id == len(self._hashes):
+                self._hashes = np.resize(self._hashes, entry_id * 2)
+            self._values.append(value)
+        self._hashes[entry_id] = value_hash
+        self._ids[value_hash] = entry_id
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            bucket = table.get((value_hash >> shift) & mask)
+            if bucket is None:
+                bucket = table[(value_hash >> shift) & mask] = array("q")
+            bucket.append(entry_id)
+
+    def remove(self, value_hash: int) -> bool:
+        """Drop a hash, e.g. once the record it points to is gone; False if it was not indexed"""
+        entry_id = self._ids.pop(value_hash, None)
+        if entry_id is None:
+            return False
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            key = (value_hash >> shift) & mask
+            bucket = table[key]
+            bucket.remove(entry_id)
+            if not bucket:
+                del table[key]
+        self._values[entry_id] = None
+        self._free.append(entry_id)
+        return True
+
+    def search(self, query: int) -> Optional[Tuple[int, Any]]:
+        """Return (distance, value) of the nearest hash within max_distance"""
+        self.lookups += 1
+        best_id, best_distance = self._ids.get(query), 0
+        if best_id is None:
+            candidates, distances = self._candidates(query)
+            if not len(candidates):
+                return None
+            nearest = int(distances.argmin())
+            if distances[nearest] > self.max_distance:
+                return None
+            best_id, best_distance = int(candidates[nearest]), int(distances[nearest])
+
+        self.matches += 1
+        return best_distance, self._values[best_id]
+
+    def search_all(self, query: int) -> List[Tuple[int, int, Any]]:
+        """(distance, hash, value) of every hash within max_distance, nearest first"""
+        self.lookups += 1
+        candidates, distances = self._candidates(query)
+        # An entry sits in several of the query's buckets; keep each one once
+        candidates, first = np.unique(candidates, return_index=True)
+        distances = distances[first]
+        within = distances <= self.max_distance
+        found = sorted(
+            (int(distance), int(self._hashes[entry_id]), self._values[entry_id])
+            for entry_id, distance in zip(candidates[within].tolist(), distances[within].tolist())
+        )
+        if found:
+            self.matches += 1
+        return found
+
+    def _candidates(self, query: int):
+        """Entry ids sharing at least one chunk with the query, and their distances to it"""
+        buckets = [
+            np.frombuffer(bucket, dtype=np.int64)
+            for table, (shift, mask) in zip(self._tables, self._chunks)
+            if (bucket := table.get((query >> shift) & mask)) is not None
+        ]
+        if not buckets:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+        candidates = np.concatenate(buckets)
+        return candidates, np.bitwise_count(self._hashes[candidates] ^ np.uint64(query))
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._ids),
+            "max_size": self.max_size,
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "matches": self.matches,
+            "evictions": self.evictions,
+        }
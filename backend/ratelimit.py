@@ -0,0 +1,137 @@
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple, Union
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+
+class InMemoryBucketStore:
+    """Token buckets kept in this process; the least recently used keys are dropped past max_keys"""
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> Tuple[bool, float]:
+        now = self.clock()
+        tokens, updated = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class MongoBucketStore:
+    """Token buckets shared by every worker, updated atomically with one pipeline update per check
+
+    Needs a TTL index on expires_at so idle buckets disappear (see indexes.py).
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def take(self, key: str, capacity: float, refill_per_second: float, cost: float = 1) -> Tuple[bool, float]:
+        now = datetime.utcnow()
+        # A bucket idle for this long is full again, so it may expire
+        idle = timedelta(seconds=capacity / refill_per_second)
+        elapsed_seconds = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "tokens": {"$min": [
+                        capacity,
+                        {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed_seconds, refill_per_second]}]}
+                    ]},
+                    "updated_at": now,
+                    "expires_at": now + idle
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["allowed"], doc["tokens"]
+
+
+class TokenBucketLimiter:
+    """Allows `capacity` requests per key in a burst, refilled at `per_seconds` / `capacity` intervals"""
+
+    def __init__(self, store, name: str, capacity: int, per_seconds: float):
+        self.store = store
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = capacity / per_seconds
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    async def check(self, key: str) -> Tuple[bool, int]:
+        """Take one token; returns (allowed, retry_after_seconds)"""
+        try:
+            allowed, tokens = await self.store.take(f"{self.name}:{key}", self.capacity, self.refill_per_second)
+        except PyMongoError:
+            # Fail open: an unavailable store must not lock everybody out
+            self.errors += 1
+            return True, 0
+        if allowed:
+            self.allowed += 1
+            return True, 0
+        self.rejected += 1
+        return False, max(1, math.ceil((1 - tokens) / self.refill_per_second))
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "refill_per_second": round(self.refill_per_second, 4),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(spec: str) -> List[Network]:
+    """Networks from a comma-separated list of addresses or CIDR ranges ("10.0.0.0/8, 127.0.0.1")"""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip()]
+
+
+def _is_trusted(address: str, trusted: Iterable[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_ip(peer: Optional[str], forwarded_for: Optional[str], trusted: Iterable[Network]) -> str:
+    """Address to rate-limit a request by
+
+    X-Forwarded-For is only believed when the direct peer is a trusted proxy,
+    and then read from the right: each proxy appends the address it saw, so
+    the rightmost hop that is not itself a trusted proxy is the client. Any
+    entries to its left were sent by the client and may be forged.
+    """
+    trusted = list(trusted)
+    if not peer:
+        return "unknown"
+    if not forwarded_for or not _is_trusted(peer, trusted):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, trusted):
+            return hop
+    # Every hop is a proxy of ours; the leftmost is as close to the client as we get
+    return hops[0] if hops else peer
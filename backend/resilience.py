@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__("circuit breaker is open")
+        self.retry_after = retry_after
+
+
+class QueueTimeoutError(asyncio.TimeoutError):
+    """No concurrency slot came free in time; the upstream was never called"""
+
+
+class CircuitBreaker:
+    """Opens after N consecutive failures and lets a single probe through once reset_timeout has passed"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through right now"""
+        if self.state == self.OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(self.retry_after())
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError(1.0)
+            self._probe_in_flight = True
+
+    def record_success(self):
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+
+    def abandon(self):
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "retry_after": round(self.retry_after(), 1) if self.state == self.OPEN else 0,
+        }
+
+
+class GuardedCaller:
+    """Concurrency ceiling, per-call deadline and circuit breaker around an upstream dependency
+
+    Waiting for a free slot is bounded by `queue_timeout` (QueueTimeoutError)
+    and the call itself by `timeout`, which starts once the slot is held. Only
+    failures and timeouts of the call count against the breaker: a long local
+    queue says nothing about the upstream's health.
+    """
+
+    def __init__(self, max_concurrency: int = 8, timeout: float = 30.0, breaker: CircuitBreaker = None,
+                 queue_timeout: float = None):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = timeout if queue_timeout is None else queue_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.active = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.queue_timeouts = 0
+        self.rejected = 0
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.queue_timeouts += 1
+            self.breaker.abandon()
+            raise QueueTimeoutError()
+        except asyncio.CancelledError:
+            self.breaker.abandon()
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.calls += 1
+        self.active += 1
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            # The caller went away; that says nothing about the upstream
+            self.breaker.abandon()
+            raise
+        except Exception:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.stats(),
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "queue_timeouts": self.queue_timeouts,
+            "rejected": self.rejected,
+        }
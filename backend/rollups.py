@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Per-user daily nutrition totals (db.daily_rollups), maintained on write
+
+Each document holds the sums for one (user_id, date) pair, so reads cost
+O(days) instead of O(meals). Rollups can always be rebuilt from db.meals:
+
+    python rollups.py [--user USER_ID]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import indexes
+
+NUTRIENTS = ("calories", "carbs", "protein", "fat")
+
+
+def empty_rollup(date: str) -> dict:
+    return {"date": date, **dict.fromkeys(NUTRIENTS, 0), "meal_count": 0}
+
+
+async def add_meals(db, user_id: str, date: str, meals: Iterable[dict]):
+    """Atomically add meals (dicts with nutrient fields) to a user's rollup for one day"""
+    increments = dict.fromkeys(NUTRIENTS, 0)
+    count = 0
+    for meal in meals:
+        for nutrient in NUTRIENTS:
+            increments[nutrient] += meal.get(nutrient) or 0
+        count += 1
+    increments["meal_count"] = count
+
+    await db.daily_rollups.update_one(
+        {"user_id": user_id, "date": date},
+        {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def date_range(days: int, from_date: Optional[str] = None, to_date: Optional[str] = None,
+               today: Optional[datetime] = None) -> Tuple[datetime, datetime, int]:
+    """(start, end, day_count) for the last `days` days, or an inclusive YYYY-MM-DD from/to range
+
+    Raises ValueError (with a user-facing message) for malformed dates or ranges
+    outside 1-366 days.
+    """
+    today = today or datetime.utcnow()
+    try:
+        end = datetime.strptime(to_date, "%Y-%m-%d") if to_date else today
+        start = datetime.strptime(from_date, "%Y-%m-%d") if from_date else end - timedelta(days=days - 1)
+    except ValueError:
+        raise ValueError("Datas devem estar no formato AAAA-MM-DD")
+    day_count = (end.date() - start.date()).days + 1
+    if day_count < 1 or day_count > 366:
+        raise ValueError("O período deve ter entre 1 e 366 dias")
+    return start, end, day_count
+
+
+def daily_series(rollups: Iterable[dict], start: datetime, day_count: int) -> List[dict]:
+    """One chart entry per day from `start`, with zeros for days without meals"""
+    by_date = {day["date"]: day for day in rollups}
+    series = []
+    for i in range(day_count):
+        current = start + timedelta(days=i)
+        date = current.strftime("%Y-%m-%d")
+        day = by_date.get(date) or empty_rollup(date)
+        series.append({
+            "date": date,
+            "day": current.strftime("%a"),
+            **{nutrient: round(day[nutrient], 2) for nutrient in NUTRIENTS},
+            "meal_count": day["meal_count"]
+        })
+    return series
+
+
+async def get_rollups(db, user_id: str, start_date: str, end_date: str) -> List[dict]:
+    """Rollups for the inclusive YYYY-MM-DD range, oldest first (days without meals are absent)"""
+    return await db.daily_rollups.find(
+        {"user_id": user_id, "date": {"$gte": start_date, "$lte": end_date}},
+        {"_id": 0, "user_id": 0, "updated_at": 0}
+    ).sort("date", 1).to_list(None)
+
+
+async def weekly_totals(db, user_id: str, start_date: str, end_date: str) -> List[dict]:
+    """Calories and meal counts per ISO week (Monday start) for the inclusive date range"""
+    pipeline = [
+        {"$match": {"user_id": user_id, "date": {"$gte": start_date, "$lte": end_date}}},
+        {"$project": {
+            "_id": 0,
+            "day": {"$dateFromString": {"dateString": "$date", "format": "%Y-%m-%d"}},
+            "calories": 1,
+            "meal_count": 1
+        }},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$day", "unit": "week", "startOfWeek": "monday"}},
+            "week": {"$first": {"$isoWeek": "$day"}},
+            "calories": {"$sum": "$calories"},
+            "meals": {"$sum": "$meal_count"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    return await db.daily_rollups.aggregate(pipeline).to_list(None)
+
+
+async def rebuild(db, user_id: Optional[str] = None):
+    """Recompute rollups from raw meals; idempotent, and removes rollups of days with no meals left"""
+    started = datetime.utcnow()
+    match = {"user_id": user_id} if user_id else {}
+    group = {"_id": {"user_id": "$user_id", "date": "$date"}, "meal_count": {"$sum": 1}}
+    for nutrient in NUTRIENTS:
+        group[nutrient] = {"$sum": {"$ifNull": [f"${nutrient}", 0]}}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": group},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "date": "$_id.date",
+            "meal_count": 1,
+            **{nutrient: 1 for nutrient in NUTRIENTS},
+            # Rollups not stamped by this run (and not written since) are stale
+            "updated_at": {"$literal": started}
+        }},
+        {"$merge": {
+            "into": "daily_rollups",
+            "on": ["user_id", "date"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+    await db.meals.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+    stale = await db.daily_rollups.delete_many({**match, "updated_at": {"$lt": started}})
+    return stale.deleted_count
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Rebuild db.daily_rollups from db.meals")
+    parser.add_argument("--user", help="only rebuild this user_id")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.getenv("DB_NAME", "nutrijovem_db")]
+
+    await indexes.ensure_indexes(db, ["daily_rollups"])
+    started = time.perf_counter()
+    removed = await rebuild(db, args.user)
+    total = await db.daily_rollups.count_documents({"user_id": args.user} if args.user else {})
+    print(f"{total} rollups reconstruídos em {time.perf_counter() - started:.1f}s ({removed} obsoletos removidos)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
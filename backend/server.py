@@ -1,49 +1,186 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, status
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
-from passlib.context import CryptContext
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
 import jwt
 import os
 import uuid
+import time
 import base64
 import asyncio
-import aiohttp
 from dotenv import load_dotenv
 from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
 import json
-from collections import defaultdict
+import logging
+import hashlib
+import binascii
+from cache import LRUCache, TieredCache
+from passwords import PasswordHasher
+import ratelimit
+from ratelimit import InMemoryBucketStore, MongoBucketStore, TokenBucketLimiter
+from phash import HashIndex
+from food_index import FoodIndex
+from image_pipeline import ImagePipeline, InvalidImageError, sniff_image_type
+from meal_photos import VariantRenderer
+from uploads import UploadLimitMiddleware, read_image_upload
+import indexes
+import meal_log
+import meal_photos
+import meal_plans
+import badges
+import gamification
+from auth import TokenAuth, UserResolver, token_claims
+from events import MealEventProcessor
+from openfoodfacts import OpenFoodFactsClient, UpstreamError
+from barcode_mirror import BarcodeMirror
+import catalogue
+import pagination
+import rollups
+import seed_data
+import water
+from jobs import FairQueue, QueueFullError, WorkerPool
+from resilience import CircuitBreaker, CircuitOpenError, GuardedCaller
 
 load_dotenv()
 
-app = FastAPI()
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
 
-# CORS Configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[os.getenv("CORS_ORIGINS", "*")],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+app = FastAPI()
 
 # MongoDB Connection
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "nutrijovem_db")
 client = AsyncIOMotorClient(MONGO_URL)
 db = client[DB_NAME]
+# Meal photos are kept out of db.meals; documents only hold an image_id
+meal_images = AsyncIOMotorGridFSBucket(db, bucket_name="meal_images")
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs on its own process pool; BCRYPT_ROUNDS is the work factor for new hashes
+password_hasher = PasswordHasher(
+    workers=int(os.getenv("BCRYPT_WORKERS", "2")),
+    rounds=int(os.getenv("BCRYPT_ROUNDS", "12"))
+)
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
-security = HTTPBearer()
+
+# Authenticated users are cached briefly per process (see auth.UserResolver);
+# writes to db.users must call invalidate_user(), which only reaches this
+# worker's cache. With AUTH_STATELESS, read-only endpoints trust the profile
+# claims signed into the token and skip the lookup entirely.
+user_cache = LRUCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+)
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes")
+user_resolver = UserResolver(db.users, user_cache, stateless=AUTH_STATELESS)
+token_auth = TokenAuth(user_resolver, SECRET_KEY, ALGORITHM)
+STARTED_AT = datetime.utcnow()
+
+# Login attempts are throttled per client IP and per email before any lookup or
+# bcrypt work. LOGIN_RATE_LIMIT_STORE=mongo shares the buckets between workers.
+if os.getenv("LOGIN_RATE_LIMIT_STORE", "memory") == "mongo":
+    login_bucket_store = MongoBucketStore(db.rate_limits)
+else:
+    login_bucket_store = InMemoryBucketStore()
+# Proxies (addresses or CIDR ranges) whose X-Forwarded-For is believed; with
+# none configured, login limits use the direct peer address
+TRUSTED_PROXIES = ratelimit.parse_networks(os.getenv("TRUSTED_PROXIES", ""))
+login_ip_limiter = TokenBucketLimiter(
+    login_bucket_store, "login_ip",
+    capacity=int(os.getenv("LOGIN_IP_LIMIT", "20")),
+    per_seconds=float(os.getenv("LOGIN_IP_PERIOD_SECONDS", "60"))
+)
+login_email_limiter = TokenBucketLimiter(
+    login_bucket_store, "login_email",
+    capacity=int(os.getenv("LOGIN_EMAIL_LIMIT", "5")),
+    per_seconds=float(os.getenv("LOGIN_EMAIL_PERIOD_SECONDS", "300"))
+)
 
 # LLM Configuration
 EMERGENT_LLM_KEY = os.getenv("EMERGENT_LLM_KEY", "")
+ANALYSIS_PROVIDER = "openai"
+ANALYSIS_MODEL = "gpt-4o"
+ANALYSIS_SYSTEM_MESSAGE = "You are a nutrition expert. Analyze food images and provide detailed nutritional information."
+ANALYSIS_PROMPT = """Analyze this food image and provide a detailed nutritional breakdown in JSON format.
+            
+            Please identify all foods visible and return ONLY a valid JSON object (no markdown, no extra text) with this exact structure:
+            {
+                "foods": [
+                    {
+                        "name": "food name in Portuguese",
+                        "portion_size": "estimated portion (e.g., '1 prato', '200g')",
+                        "calories": number,
+                        "carbs": number in grams,
+                        "protein": number in grams,
+                        "fat": number in grams
+                    }
+                ],
+                "total_calories": number,
+                "total_carbs": number,
+                "total_protein": number,
+                "total_fat": number,
+                "meal_type_suggestion": "breakfast, lunch, dinner, or snack"
+            }
+            
+            Be accurate with Brazilian food portions and names."""
+# Changing the model or prompt changes the version, so stale analyses are never served
+ANALYSIS_VERSION = hashlib.sha256(
+    f"{ANALYSIS_PROVIDER}:{ANALYSIS_MODEL}:{ANALYSIS_SYSTEM_MESSAGE}:{ANALYSIS_PROMPT}".encode()
+).hexdigest()[:16]
+
+# Every LLM call goes through one limiter with a deadline and a circuit breaker
+llm_guard = GuardedCaller(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+    timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+    # Bound on waiting for a free slot; counted separately from upstream timeouts
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+    )
+)
+
+# Analysis result cache (keyed by image content hash)
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1024"))
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+analysis_cache = TieredCache(db.analysis_cache, maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL)
+
+# Near-duplicate matching on perceptual hashes of previously analyzed images
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.getenv("NEAR_DUPLICATE_MAX_DISTANCE", "5"))
+# Bounded so hashes of images nobody sends again cannot grow it forever; the oldest go first
+NEAR_DUPLICATE_INDEX_SIZE = int(os.getenv("NEAR_DUPLICATE_INDEX_SIZE", "1000000"))
+near_duplicate_index = HashIndex(max_distance=NEAR_DUPLICATE_MAX_DISTANCE, max_size=NEAR_DUPLICATE_INDEX_SIZE)
+
+# Uploads are downscaled and re-encoded (without EXIF) before they reach the LLM
+image_pipeline = ImagePipeline(
+    max_edge=int(os.getenv("IMAGE_MAX_EDGE", "1024")),
+    image_format=os.getenv("IMAGE_FORMAT", "JPEG"),
+    quality=int(os.getenv("IMAGE_QUALITY", "85")),
+    workers=int(os.getenv("IMAGE_WORKERS", "0")) or None
+)
+
+# Binary (multipart) image uploads: the body size is capped before it is read,
+# the file signature and dimensions are checked before the image is decoded
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))
+IMAGE_UPLOAD_PATHS = ("/api/analyze-food/upload", "/api/meals/upload", "/api/analyze-and-log")
+app.add_middleware(UploadLimitMiddleware, max_bytes=IMAGE_MAX_UPLOAD_BYTES, paths=IMAGE_UPLOAD_PATHS)
+
+# CORS Configuration; added last so it is the outermost middleware and every
+# response, including the upload limit's early rejections, carries its headers
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[os.getenv("CORS_ORIGINS", "*")],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 # =========================
 # MODELS
@@ -83,15 +220,22 @@ class GoalCreate(BaseModel):
 class WaterLog(BaseModel):
     glasses: int = 1
 
+class WaterLogEntry(BaseModel):
+    timestamp: datetime
+    glasses: int = 1
+
+class WaterLogBatch(BaseModel):
+    entries: List[WaterLogEntry] = Field(..., min_length=1, max_length=500)
+
 # =========================
 # UTILITIES
 # =========================
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(days=7)):
     to_encode = data.copy()
@@ -100,21 +244,14 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(days=7)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        user = await db.users.find_one({"user_id": user_id})
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
+def invalidate_user(user_id: str):
+    """Drop a cached user after writing to their document (in this process only)"""
+    user_resolver.invalidate(user_id)
+
+# Endpoint dependencies: get_current_user wherever the endpoint writes,
+# get_current_claims only on read-only (GET) endpoints
+get_current_user = token_auth.user
+get_current_claims = token_auth.claims
 
 def calculate_daily_calories(weight: float, height: float, age: int, gender: str, activity_level: str, goal: str) -> float:
     """Calculate daily calorie needs using Mifflin-St Jeor Equation"""
@@ -140,18 +277,42 @@ def calculate_daily_calories(weight: float, height: float, age: int, gender: str
     else:
         return tdee
 
+@app.on_event("startup")
+async def create_indexes():
+    await indexes.ensure_indexes(db)
+
+async def load_near_duplicate_index():
+    """Load perceptual hashes of analyzed images into the in-memory index"""
+    # Oldest first, so the index evicts the hashes that expire soonest
+    cursor = db.image_hashes.find(
+        {"version": ANALYSIS_VERSION, "expires_at": {"$gt": datetime.utcnow()}}, {"phash": 1}
+    ).sort("expires_at", 1)
+    async for doc in cursor:
+        near_duplicate_index.add(int(doc["phash"], 16), doc["_id"])
+
+@app.on_event("startup")
+async def start_near_duplicate_index():
+    # Loading can take a few seconds at 1M hashes; serve requests meanwhile
+    asyncio.create_task(load_near_duplicate_index())
+
+@app.on_event("shutdown")
+async def stop_executors():
+    image_pipeline.shutdown()
+    image_variants.shutdown()
+    password_hasher.shutdown()
+
 # =========================
 # AUTHENTICATION ENDPOINTS
 # =========================
 
 @app.post("/api/auth/register")
 async def register(user: UserCreate):
-    existing_user = await db.users.find_one({"email": user.email})
+    existing_user = await db.users.find_one({"email": user.email}, {"_id": 1})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     user_id = str(uuid.uuid4())
-    hashed_pwd = hash_password(user.password)
+    hashed_pwd = await hash_password(user.password)
     
     daily_calories = None
     if user.weight and user.height and user.age and user.gender:
@@ -173,6 +334,7 @@ async def register(user: UserCreate):
         "goal": user.goal,
         "daily_calories_target": daily_calories,
         "streak_count": 0,
+        "meal_count": 0,
         "last_activity_date": None,
         "badges": [],
         "is_premium": False,
@@ -181,7 +343,7 @@ async def register(user: UserCreate):
     
     await db.users.insert_one(user_data)
     
-    access_token = create_access_token(data={"sub": user_id})
+    access_token = create_access_token(data={"sub": user_id, "claims": token_claims(user_data)})
     
     return {
         "access_token": access_token,
@@ -194,13 +356,39 @@ async def register(user: UserCreate):
         }
     }
 
+def client_ip(request: Request) -> str:
+    return ratelimit.client_ip(
+        request.client.host if request.client else None,
+        request.headers.get("x-forwarded-for"),
+        TRUSTED_PROXIES
+    )
+
+async def check_login_rate(request: Request, email: str):
+    for limiter, key in ((login_ip_limiter, client_ip(request)), (login_email_limiter, email.lower())):
+        allowed, retry_after = await limiter.check(key)
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas tentativas de login, tente novamente mais tarde",
+                headers={"Retry-After": str(retry_after)}
+            )
+
 @app.post("/api/auth/login")
-async def login(user: UserLogin):
-    db_user = await db.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+async def login(user: UserLogin, request: Request):
+    await check_login_rate(request, user.email)
+    db_user = await db.users.find_one({"email": user.email}, gamification.INTERNAL_USER_FIELDS)
+    if not db_user or not await verify_password(user.password, db_user["password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    access_token = create_access_token(data={"sub": db_user["user_id"]})
+    # Upgrade hashes made with an older work factor while we have the plain password
+    if password_hasher.needs_rehash(db_user["password"]):
+        await db.users.update_one(
+            {"user_id": db_user["user_id"]},
+            {"$set": {"password": await hash_password(user.password)}}
+        )
+        invalidate_user(db_user["user_id"])
+    
+    access_token = create_access_token(data={"sub": db_user["user_id"], "claims": token_claims(db_user)})
     
     return {
         "access_token": access_token,
@@ -235,91 +423,306 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 # FOOD ANALYSIS ENDPOINTS
 # =========================
 
+def decode_image_base64(image_base64: str) -> bytes:
+    """Decode a base64 image, accepting an optional data URL prefix"""
+    if image_base64.startswith("data:"):
+        image_base64 = image_base64.split(",", 1)[-1]
+    try:
+        return base64.b64decode(image_base64)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid image data")
+
+def analysis_cache_key(image_bytes: bytes) -> str:
+    return hashlib.sha256(ANALYSIS_VERSION.encode() + image_bytes).hexdigest()
+
+def parse_analysis_response(response: str) -> Optional[dict]:
+    """Parse the LLM JSON answer, returning None when it is not valid JSON"""
+    # Clean response - remove markdown code blocks if present
+    response_text = response.strip()
+    if response_text.startswith("```"):
+        lines = response_text.split("\n")
+        response_text = "\n".join(lines[1:-1]) if len(lines) > 2 else response_text
+        response_text = response_text.replace("```json", "").replace("```", "")
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        return None
+
+async def preprocess_upload(image_bytes: bytes) -> dict:
+    try:
+        return await image_pipeline.process(image_bytes)
+    except InvalidImageError:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+
+async def find_near_duplicate(image_hash: int) -> Optional[tuple]:
+    """Return (distance, analysis) of the nearest previously analyzed, visually similar image
+
+    Matches whose record has expired are evicted from the index, and the next
+    match within the distance threshold is tried instead.
+    """
+    for distance, match_hash, match_key in near_duplicate_index.search_all(image_hash):
+        doc = await db.image_hashes.find_one({"_id": match_key}, {"analysis": 1})
+        if doc:
+            return distance, doc["analysis"]
+        near_duplicate_index.remove(match_hash)
+    return None
+
+async def remember_analysis(cache_key: str, image_hash: int, analysis: dict):
+    await analysis_cache.set(cache_key, analysis)
+    await db.image_hashes.update_one(
+        {"_id": cache_key},
+        {"$set": {
+            "phash": f"{image_hash:016x}",
+            "version": ANALYSIS_VERSION,
+            "analysis": analysis,
+            "expires_at": datetime.utcnow() + timedelta(seconds=ANALYSIS_CACHE_TTL)
+        }},
+        upsert=True
+    )
+    near_duplicate_index.add(image_hash, cache_key)
+
+async def request_food_analysis(image_bytes: bytes) -> str:
+    """Send one image to the LLM and return its raw answer"""
+    # Create LLM chat instance
+    chat = LlmChat(
+        api_key=EMERGENT_LLM_KEY,
+        session_id=f"food-analysis-{uuid.uuid4()}",
+        system_message=ANALYSIS_SYSTEM_MESSAGE
+    ).with_model(ANALYSIS_PROVIDER, ANALYSIS_MODEL)
+
+    # Create user message
+    user_message = UserMessage(
+        text=ANALYSIS_PROMPT,
+        file_contents=[ImageContent(image_base64=base64.b64encode(image_bytes).decode())]
+    )
+
+    return await chat.send_message(user_message)
+
+async def run_food_analysis(image_bytes: bytes) -> dict:
+    """Analyze food image using GPT-4o, serving cached or near-duplicate results when possible"""
+    cache_key = analysis_cache_key(image_bytes)
+
+    cached = await analysis_cache.get(cache_key)
+    if cached is not None:
+        return {"success": True, "analysis": cached, "cached": True}
+
+    processed = await preprocess_upload(image_bytes)
+    image_hash = processed["phash"]
+    near_duplicate = await find_near_duplicate(image_hash)
+    if near_duplicate:
+        distance, analysis = near_duplicate
+        await analysis_cache.set(cache_key, analysis)
+        return {"success": True, "analysis": analysis, "cached": True, "match_distance": distance}
+
+    if not EMERGENT_LLM_KEY:
+        raise HTTPException(status_code=500, detail="LLM key not configured")
+
+    try:
+        response = await llm_guard.call(request_food_analysis, processed["image"])
+    except (CircuitOpenError, asyncio.TimeoutError) as e:
+        # Fail fast with a degraded answer instead of queueing behind a struggling upstream
+        retry_after = e.retry_after if isinstance(e, CircuitOpenError) else llm_guard.breaker.reset_timeout
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "success": False,
+                "degraded": True,
+                "error": "Análise de imagem indisponível no momento. Tente novamente em instantes."
+            },
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Food analysis failed: {str(e)}")
+
+    nutrition_data = parse_analysis_response(response)
+    if nutrition_data is None:
+        return {
+            "success": False,
+            "error": "Failed to parse nutrition data",
+            "raw_response": response[:500]
+        }
+
+    await remember_analysis(cache_key, image_hash, nutrition_data)
+    return {
+        "success": True,
+        "analysis": nutrition_data
+    }
+
 @app.post("/api/analyze-food")
 async def analyze_food(image_base64: str = Form(...), current_user: dict = Depends(get_current_user)):
     """Analyze food image using GPT-4o"""
+    return await run_food_analysis(decode_image_base64(image_base64))
+
+@app.post("/api/analyze-food/upload")
+async def analyze_food_upload(image: UploadFile = File(...), current_user: dict = Depends(get_current_user)):
+    """Analyze a food image sent as a binary multipart file"""
+    image_bytes = await read_image_upload(image, IMAGE_MAX_UPLOAD_BYTES, IMAGE_MAX_PIXELS)
+    return await run_food_analysis(image_bytes)
+
+# Async mode: jobs are queued in-process and their state is kept in
+# db.analysis_jobs, so any worker can answer polls for them
+async def set_job_state(job_id: str, **fields):
+    fields["updated_at"] = datetime.utcnow()
+    await db.analysis_jobs.update_one({"_id": job_id}, {"$set": fields})
+    event = job_events.pop(job_id, None) if fields.get("status") in ("done", "failed") else job_events.get(job_id)
+    if event:
+        event.set()
+
+async def process_analysis_job(user_id: str, job: dict):
+    await set_job_state(job["job_id"], status="running")
     try:
-        if not EMERGENT_LLM_KEY:
-            raise HTTPException(status_code=500, detail="LLM key not configured")
-        
-        # Create LLM chat instance
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"food-analysis-{uuid.uuid4()}",
-            system_message="You are a nutrition expert. Analyze food images and provide detailed nutritional information."
-        ).with_model("openai", "gpt-4o")
-        
-        # Create image content
-        image_content = ImageContent(image_base64=image_base64)
-        
-        # Create user message
-        user_message = UserMessage(
-            text="""Analyze this food image and provide a detailed nutritional breakdown in JSON format.
-            
-            Please identify all foods visible and return ONLY a valid JSON object (no markdown, no extra text) with this exact structure:
-            {
-                "foods": [
-                    {
-                        "name": "food name in Portuguese",
-                        "portion_size": "estimated portion (e.g., '1 prato', '200g')",
-                        "calories": number,
-                        "carbs": number in grams,
-                        "protein": number in grams,
-                        "fat": number in grams
-                    }
-                ],
-                "total_calories": number,
-                "total_carbs": number,
-                "total_protein": number,
-                "total_fat": number,
-                "meal_type_suggestion": "breakfast, lunch, dinner, or snack"
-            }
-            
-            Be accurate with Brazilian food portions and names.""",
-            file_contents=[image_content]
-        )
-        
-        # Get response
-        response = await chat.send_message(user_message)
-        
-        # Parse JSON response
-        try:
-            # Clean response - remove markdown code blocks if present
-            response_text = response.strip()
-            if response_text.startswith("```"):
-                lines = response_text.split("\n")
-                response_text = "\n".join(lines[1:-1]) if len(lines) > 2 else response_text
-                response_text = response_text.replace("```json", "").replace("```", "")
-            
-            nutrition_data = json.loads(response_text)
-            return {
-                "success": True,
-                "analysis": nutrition_data
-            }
-        except json.JSONDecodeError as e:
-            return {
-                "success": False,
-                "error": "Failed to parse nutrition data",
-                "raw_response": response[:500]
-            }
-            
+        result = await run_food_analysis(job["image_bytes"])
+    except HTTPException as e:
+        error = e.detail["error"] if isinstance(e.detail, dict) else e.detail
+        await set_job_state(job["job_id"], status="failed", error=error)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Food analysis failed: {str(e)}")
+        await set_job_state(job["job_id"], status="failed", error=f"Food analysis failed: {str(e)}")
+    else:
+        await set_job_state(job["job_id"], status="done", result=result)
+
+analysis_queue = FairQueue(
+    maxsize=int(os.getenv("ANALYSIS_QUEUE_SIZE", "200")),
+    per_owner_maxsize=int(os.getenv("ANALYSIS_QUEUE_PER_USER", "5"))
+)
+analysis_workers = WorkerPool(
+    analysis_queue, process_analysis_job,
+    concurrency=int(os.getenv("ANALYSIS_JOB_CONCURRENCY", "4"))
+)
+job_events: Dict[str, asyncio.Event] = {}
+
+@app.on_event("startup")
+async def start_analysis_workers():
+    analysis_workers.start()
+
+@app.on_event("shutdown")
+async def stop_analysis_workers():
+    await analysis_workers.stop()
+
+def serialize_job(job: dict) -> dict:
+    return {
+        "job_id": job["_id"],
+        "status": job["status"],
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat()
+    }
+
+async def get_user_job(job_id: str, user_id: str) -> dict:
+    job = await db.analysis_jobs.find_one({"_id": job_id, "user_id": user_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/api/analyze-food/jobs", status_code=202)
+async def submit_analysis_job(image_base64: str = Form(...), current_user: dict = Depends(get_current_user)):
+    """Queue a food image for analysis and return a job id immediately"""
+    image_bytes = decode_image_base64(image_base64)
+    job_id = str(uuid.uuid4())
+    user_id = current_user["user_id"]
+
+    def queue_full(e: QueueFullError):
+        return HTTPException(
+            status_code=429,
+            detail=f"Análise ocupada, tente novamente em instantes ({e})",
+            headers={"Retry-After": str(analysis_workers.retry_after())}
+        )
+
+    # Reject before touching the database when the queue is already full
+    try:
+        analysis_queue.check_capacity(user_id)
+    except QueueFullError as e:
+        raise queue_full(e)
+
+    now = datetime.utcnow()
+    await db.analysis_jobs.insert_one({
+        "_id": job_id,
+        "user_id": user_id,
+        "status": "queued",
+        "created_at": now,
+        "updated_at": now,
+        "expires_at": now + timedelta(hours=1)
+    })
+
+    try:
+        analysis_queue.put_nowait(user_id, {"job_id": job_id, "image_bytes": image_bytes})
+    except QueueFullError as e:
+        # Another request took the last slot while the job was being inserted
+        await db.analysis_jobs.delete_one({"_id": job_id})
+        raise queue_full(e)
+    job_events[job_id] = asyncio.Event()
+
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "poll_url": f"/api/analyze-food/jobs/{job_id}",
+        "stream_url": f"/api/analyze-food/jobs/{job_id}/events"
+    }
+
+@app.get("/api/analyze-food/jobs/{job_id}")
+async def get_analysis_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    return serialize_job(await get_user_job(job_id, current_user["user_id"]))
+
+@app.get("/api/analyze-food/jobs/{job_id}/events")
+async def stream_analysis_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Server-sent events with the job status until it finishes"""
+    job = await get_user_job(job_id, current_user["user_id"])
+
+    async def events():
+        current = job
+        last_status = None
+        deadline = asyncio.get_running_loop().time() + 300
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                yield f"event: status\ndata: {json.dumps(serialize_job(current))}\n\n"
+                if last_status in ("done", "failed"):
+                    return
+            else:
+                yield ": keep-alive\n\n"
+            if asyncio.get_running_loop().time() > deadline:
+                return
+
+            # Wake up as soon as a local worker finishes; jobs running on
+            # another worker process are picked up by polling
+            event = job_events.get(job_id)
+            if event:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(1)
+            current = await db.analysis_jobs.find_one({"_id": job_id}) or current
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def get_catalogue_product(barcode: str) -> Optional[dict]:
+    product = product_cache.get(barcode, CACHE_MISS)
+    if product is CACHE_MISS:
+        product = await db.products.find_one({"barcode": barcode}, CATALOGUE_PROJECTION)
+        # Unknown barcodes are remembered too, but not for as long
+        product_cache.set(barcode, product, ttl=None if product else PRODUCT_CACHE_MISS_TTL_SECONDS)
+    return product
+
+async def get_catalogue_products(barcodes: List[str]) -> Dict[str, Optional[dict]]:
+    """get_catalogue_product for several barcodes, with one query for the uncached ones"""
+    products = {barcode: product_cache.get(barcode, CACHE_MISS) for barcode in barcodes}
+    missing = [barcode for barcode, product in products.items() if product is CACHE_MISS]
+    if missing:
+        projection = {field: 0 for field in CATALOGUE_PROJECTION if field != "barcode"}
+        found = {}
+        async for product in db.products.find({"barcode": {"$in": missing}}, projection):
+            found[product.pop("barcode")] = product
+        for barcode in missing:
+            product = products[barcode] = found.get(barcode)
+            product_cache.set(barcode, product, ttl=None if product else PRODUCT_CACHE_MISS_TTL_SECONDS)
+    return products
 
 @app.post("/api/scan-barcode")
 async def scan_barcode(barcode: str = Form(...), current_user: dict = Depends(get_current_user)):
-    """Mock barcode scanner - returns food data for common Brazilian products"""
-    
-    # Mock database of Brazilian products
-    products_db = {
-        "7891000100103": {"name": "Nescau", "calories": 90, "carbs": 18, "protein": 3, "fat": 1.5, "portion": "200ml"},
-        "7891000244753": {"name": "Leite Ninho", "calories": 150, "carbs": 12, "protein": 8, "fat": 8, "portion": "200ml"},
-        "7891000253595": {"name": "Neston", "calories": 130, "carbs": 23, "protein": 4, "fat": 2, "portion": "30g"},
-        "7896004707532": {"name": "Arroz Tio João", "calories": 130, "carbs": 28, "protein": 2.5, "fat": 0.5, "portion": "100g"},
-        "7891000100004": {"name": "Chocolate Bis", "calories": 110, "carbs": 14, "protein": 1.5, "fat": 5.5, "portion": "unidade"},
-    }
-    
-    product = products_db.get(barcode)
+    """Barcode lookup in the product catalogue (db.products), cached per process"""
+    product = await get_catalogue_product(barcode)
     
     if product:
         return {
@@ -336,36 +739,131 @@ async def scan_barcode(barcode: str = Form(...), current_user: dict = Depends(ge
 # MEALS ENDPOINTS
 # =========================
 
+# Meal documents as returned by the list endpoints; never load legacy inline images
+MEAL_LIST_PROJECTION = {"image_base64": 0}
+
+# Downscaled copies of meal photos, rendered on their own pool (see meal_photos.py)
+MEAL_IMAGE_VARIANTS = {"thumb": 160, "medium": 640}
+image_variants = VariantRenderer(
+    meal_images,
+    MEAL_IMAGE_VARIANTS,
+    image_format="WEBP",
+    quality=80,
+    workers=int(os.getenv("IMAGE_VARIANT_WORKERS", "1"))
+)
+variant_tasks = set()
+
+async def store_meal_image(image_bytes: bytes, user_id: str, image_id: Optional[str] = None,
+                           variant: Optional[str] = None) -> str:
+    try:
+        return await meal_photos.store_image(meal_images, image_bytes, user_id, image_id=image_id, variant=variant)
+    except InvalidImageError:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+
+async def create_image_variant(image_id: str, image_bytes: bytes, user_id: str, variant: str) -> bytes:
+    """Render one variant of a meal photo and store it; returns the rendered bytes"""
+    return await image_variants.create(image_id, image_bytes, user_id, variant)
+
+async def generate_image_variants(image_id: str, image_bytes: bytes, user_id: str):
+    for variant in MEAL_IMAGE_VARIANTS:
+        try:
+            await create_image_variant(image_id, image_bytes, user_id, variant)
+        except Exception:
+            # Missing variants are generated on first request instead
+            logger.exception("Failed to generate %s variant for image %s", variant, image_id)
+
+def schedule_image_variants(image_id: str, image_bytes: bytes, user_id: str):
+    task = asyncio.create_task(generate_image_variants(image_id, image_bytes, user_id))
+    variant_tasks.add(task)
+    task.add_done_callback(variant_tasks.discard)
+
+def serialize_meal(meal: dict) -> dict:
+    meal["_id"] = str(meal["_id"])
+    if meal.get("image_id"):
+        meal["image_url"] = f"/api/meals/{meal['meal_id']}/image"
+        meal["thumbnail_url"] = f"/api/meals/{meal['meal_id']}/image?size=thumb"
+    return meal
+
 @app.post("/api/meals")
 async def create_meal(meal: MealCreate, current_user: dict = Depends(get_current_user)):
-    meal_id = str(uuid.uuid4())
-    meal_data = {
-        "meal_id": meal_id,
-        "user_id": current_user["user_id"],
-        "meal_type": meal.meal_type,
-        "food_name": meal.food_name,
-        "calories": meal.calories,
-        "carbs": meal.carbs,
-        "protein": meal.protein,
-        "fat": meal.fat,
-        "portion_size": meal.portion_size,
-        "image_base64": meal.image_base64,
-        "date": datetime.utcnow().strftime("%Y-%m-%d"),
-        "timestamp": datetime.utcnow()
-    }
-    
-    await db.meals.insert_one(meal_data)
-    
-    # Update streak
-    await update_user_streak(current_user["user_id"])
-    
-    # Check for new badges
-    await check_and_award_badges(current_user["user_id"])
-    
+    image_bytes = decode_image_base64(meal.image_base64) if meal.image_base64 else None
+    return await save_meal(meal, image_bytes, current_user)
+
+@app.post("/api/meals/upload")
+async def create_meal_upload(
+    meal_type: str = Form(...),
+    food_name: str = Form(...),
+    calories: float = Form(...),
+    carbs: float = Form(0),
+    protein: float = Form(0),
+    fat: float = Form(0),
+    portion_size: str = Form(""),
+    image: Optional[UploadFile] = File(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """create_meal with the fields as form data and the photo as a binary file"""
+    meal = MealCreate(meal_type=meal_type, food_name=food_name, calories=calories, carbs=carbs,
+                      protein=protein, fat=fat, portion_size=portion_size)
+    image_bytes = await read_image_upload(image, IMAGE_MAX_UPLOAD_BYTES, IMAGE_MAX_PIXELS) if image else None
+    return await save_meal(meal, image_bytes, current_user)
+
+async def save_meal(meal: MealCreate, image_bytes: Optional[bytes], current_user: dict) -> dict:
+    meal_id, = await save_meals([meal.dict(exclude={"image_base64"})], image_bytes, current_user)
     return {"success": True, "meal_id": meal_id, "message": "Refeição registrada com sucesso!"}
 
+async def save_meals(meals: List[dict], image_bytes: Optional[bytes], current_user: dict) -> List[str]:
+    """Log meals sharing one photo: one image upload, then meal_log.save_meals"""
+    user_id = current_user["user_id"]
+    image_id = None
+    if image_bytes:
+        image_id = await store_meal_image(image_bytes, user_id)
+        schedule_image_variants(image_id, image_bytes, user_id)
+    return await meal_log.save_meals(db, meal_events, user_id, meals, image_id)
+
+@app.post("/api/analyze-and-log")
+async def analyze_and_log(
+    image: UploadFile = File(...),
+    meal_type: Optional[str] = Form(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """Analyze a photo and log one meal per identified food, so the image is sent only once"""
+    image_bytes = await read_image_upload(image, IMAGE_MAX_UPLOAD_BYTES, IMAGE_MAX_PIXELS)
+    result = await run_food_analysis(image_bytes)
+    if not result.get("success"):
+        return {**result, "meal_ids": []}
+
+    meals = meal_log.meals_from_analysis(result["analysis"], meal_type)
+    if not meals:
+        return {**result, "success": False, "error": "Nenhum alimento identificado na imagem", "meal_ids": []}
+
+    meal_ids = await save_meals(meals, image_bytes, current_user)
+    message = f"{len(meal_ids)} refeições registradas com sucesso!"
+    if len(meal_ids) == 1:
+        message = "Refeição registrada com sucesso!"
+    return {**result, "meal_ids": meal_ids, "message": message}
+
+def meal_page_query(query: dict, cursor: Optional[str]) -> dict:
+    try:
+        after = pagination.after_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {**query, **after}
+
+async def find_meal_page(query: dict, cursor: Optional[str], limit: int) -> tuple:
+    """(meals, next_cursor) for one keyset page in pagination.MEAL_SORT order"""
+    meals = await db.meals.find(
+        meal_page_query(query, cursor), MEAL_LIST_PROJECTION
+    ).sort(pagination.MEAL_SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = pagination.encode_cursor(meals[limit - 1]) if len(meals) > limit else None
+    return meals[:limit], next_cursor
+
 @app.get("/api/meals")
-async def get_meals(date: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_meals(
+    date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    current_user: dict = Depends(get_current_claims)
+):
     query = {"user_id": current_user["user_id"]}
     
     if date:
@@ -373,144 +871,240 @@ async def get_meals(date: Optional[str] = None, current_user: dict = Depends(get
     else:
         query["date"] = datetime.utcnow().strftime("%Y-%m-%d")
     
-    meals = await db.meals.find(query).sort("timestamp", -1).to_list(100)
+    # Pass next_cursor back as `cursor` for the following page
+    meals, next_cursor = await find_meal_page(query, cursor, limit)
     
     # Convert ObjectId to string
     for meal in meals:
-        meal["_id"] = str(meal["_id"])
+        serialize_meal(meal)
     
-    # Calculate totals
-    total_calories = sum(meal.get("calories", 0) for meal in meals)
-    total_carbs = sum(meal.get("carbs", 0) for meal in meals)
-    total_protein = sum(meal.get("protein", 0) for meal in meals)
-    total_fat = sum(meal.get("fat", 0) for meal in meals)
+    # Totals come from the day's rollup, so they stay correct past the list limit
+    day = await rollups.get_rollups(db, current_user["user_id"], query["date"], query["date"])
+    totals = day[0] if day else rollups.empty_rollup(query["date"])
     
     return {
         "meals": meals,
-        "totals": {
-            "calories": total_calories,
-            "carbs": total_carbs,
-            "protein": total_protein,
-            "fat": total_fat
-        },
+        "next_cursor": next_cursor,
+        "totals": {nutrient: totals[nutrient] for nutrient in rollups.NUTRIENTS},
         "daily_target": current_user.get("daily_calories_target", 2000)
     }
 
 @app.get("/api/meals/history")
-async def get_meals_history(days: int = 7, current_user: dict = Depends(get_current_user)):
-    """Get meal history for the last N days"""
+async def get_meals_history(
+    request: Request,
+    days: int = 7,
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    current_user: dict = Depends(get_current_claims)
+):
+    """Get meal history for the last N days
+
+    Pages of `limit` meals grouped by date (a day can continue on the next
+    page). With format=ndjson or Accept: application/x-ndjson, every meal
+    in the range is streamed instead, one JSON object per line.
+    """
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
-    
-    meals = await db.meals.find({
+    query = {
         "user_id": current_user["user_id"],
         "timestamp": {"$gte": start_date, "$lte": end_date}
-    }).sort("timestamp", -1).to_list(500)
+    }
+    
+    if format == "ndjson" or (format is None and "application/x-ndjson" in request.headers.get("accept", "")):
+        # Meals are written out as the cursor yields them, so memory stays flat for any range
+        meals = db.meals.find(
+            meal_page_query(query, cursor), MEAL_LIST_PROJECTION
+        ).sort(pagination.MEAL_SORT).batch_size(500)
+        return StreamingResponse(pagination.ndjson_lines(meals, serialize_meal), media_type="application/x-ndjson")
+    
+    meals, next_cursor = await find_meal_page(query, cursor, limit)
+    
+    daily_totals = await rollups.get_rollups(
+        db, current_user["user_id"], start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    )
+    calories_by_date = {day["date"]: day["calories"] for day in daily_totals}
     
     # Group by date
     history = {}
     for meal in meals:
         date = meal["date"]
         if date not in history:
-            history[date] = {"meals": [], "total_calories": 0}
+            history[date] = {"meals": [], "total_calories": calories_by_date.get(date, 0)}
         
-        meal["_id"] = str(meal["_id"])
-        history[date]["meals"].append(meal)
-        history[date]["total_calories"] += meal.get("calories", 0)
+        history[date]["meals"].append(serialize_meal(meal))
     
-    return {"history": history}
+    return {"history": history, "next_cursor": next_cursor}
+
+def parse_range_header(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single 'bytes=start-end' range into inclusive offsets, or None if unsatisfiable"""
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    start, _, end = spec.strip().partition("-")
+    try:
+        if not start:
+            length = int(end)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        first = int(start)
+        last = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if first > last or first >= size:
+        return None
+    return first, last
+
+async def stream_grid_out(grid_out, start: int, length: int, chunk_size: int = 256 * 1024):
+    grid_out.seek(start)
+    remaining = length
+    while remaining > 0:
+        chunk = await grid_out.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+# Image ids are never reused for different bytes, so clients may cache for good
+IMAGE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+@app.get("/api/meals/{meal_id}/image")
+async def get_meal_image(
+    meal_id: str,
+    request: Request,
+    size: str = "original",
+    current_user: dict = Depends(get_current_claims)
+):
+    """Stream a meal photo (original, medium or thumb), honouring If-None-Match and single byte ranges"""
+    if size != "original" and size not in MEAL_IMAGE_VARIANTS:
+        raise HTTPException(status_code=400, detail="size must be original, " + ", ".join(MEAL_IMAGE_VARIANTS))
+
+    meal = await db.meals.find_one(
+        {"meal_id": meal_id, "user_id": current_user["user_id"]},
+        {"image_id": 1}
+    )
+    if not meal or not meal.get("image_id"):
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+
+    image_id = meal["image_id"]
+    file_id = image_id if size == "original" else f"{image_id}:{size}"
+    try:
+        grid_out = await meal_images.open_download_stream(file_id)
+    except NoFile:
+        if size == "original":
+            raise HTTPException(status_code=404, detail="Imagem não encontrada")
+        return await render_missing_variant(image_id, size, current_user["user_id"])
+
+    metadata = grid_out.metadata or {}
+    etag = f'"{metadata.get("sha256", grid_out._id)}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": IMAGE_CACHE_CONTROL
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    file_size = grid_out.length
+    media_type = metadata.get("content_type", "application/octet-stream")
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = parse_range_header(range_header, file_size)
+        if byte_range is None:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{file_size}"})
+        first, last = byte_range
+        headers["Content-Range"] = f"bytes {first}-{last}/{file_size}"
+        headers["Content-Length"] = str(last - first + 1)
+        return StreamingResponse(
+            stream_grid_out(grid_out, first, last - first + 1),
+            status_code=206, media_type=media_type, headers=headers
+        )
+
+    headers["Content-Length"] = str(file_size)
+    return StreamingResponse(stream_grid_out(grid_out, 0, file_size), media_type=media_type, headers=headers)
+
+async def render_missing_variant(image_id: str, variant: str, user_id: str) -> Response:
+    """Lazily build a variant (e.g. for photos stored before variants existed) and serve it"""
+    try:
+        original = await meal_images.open_download_stream(image_id)
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+    try:
+        image_bytes = await create_image_variant(image_id, await original.read(), user_id, variant)
+    except InvalidImageError:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+    return Response(
+        content=image_bytes,
+        media_type=sniff_image_type(image_bytes),
+        headers={
+            "ETag": f'"{hashlib.sha256(image_bytes).hexdigest()}"',
+            "Cache-Control": IMAGE_CACHE_CONTROL
+        }
+    )
 
 # =========================
 # FOOD DATABASE
 # =========================
 
+CATALOGUE_PROJECTION = {"_id": 0, "key": 0, "barcode": 0, "imported_at": 0}
+product_cache = LRUCache(
+    maxsize=int(os.getenv("PRODUCT_CACHE_SIZE", "50000")),
+    ttl=float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "3600"))
+)
+PRODUCT_CACHE_MISS_TTL_SECONDS = 300
+CACHE_MISS = object()
+catalogue_tasks = set()
+
+# db.foods is indexed in memory (see food_index.py) and rebuilt when an import
+# bumps the catalogue version; the shipped seed list serves until it loads
+food_index = FoodIndex(seed_data.BRAZILIAN_FOODS)
+catalogue_versions = {}
+CATALOGUE_REFRESH_SECONDS = float(os.getenv("CATALOGUE_REFRESH_SECONDS", "300"))
+
+async def refresh_catalogues():
+    global food_index
+    foods_version = await catalogue.version(db, "foods")
+    if foods_version != catalogue_versions.get("foods"):
+        foods = await catalogue.load_foods(db)
+        food_index = await asyncio.to_thread(FoodIndex, foods)
+        catalogue_versions["foods"] = foods_version
+        logger.info("Food index loaded with %d foods", len(food_index))
+    products_version = await catalogue.version(db, "products")
+    if products_version != catalogue_versions.get("products"):
+        product_cache.clear()
+        catalogue_versions["products"] = products_version
+    if barcode_mirror.reload_if_changed():
+        logger.info("Open Food Facts mirror loaded with %d products", barcode_mirror.count)
+
+async def keep_catalogues_fresh():
+    seeded = False
+    while True:
+        try:
+            # A fresh database gets the shipped catalogues, once; after that each
+            # cycle only compares the catalogue versions and the mirror's mtime
+            if not seeded:
+                await catalogue.seed(db)
+                seeded = True
+            await refresh_catalogues()
+        except Exception:
+            logger.exception("Could not refresh the food catalogues")
+        await asyncio.sleep(CATALOGUE_REFRESH_SECONDS)
+
+@app.on_event("startup")
+async def start_catalogue_refresh():
+    catalogue_tasks.add(asyncio.create_task(keep_catalogues_fresh()))
+
 @app.get("/api/food-database")
-async def get_food_database(search: Optional[str] = None, category: Optional[str] = None):
+async def get_food_database(
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500)
+):
     """Get Brazilian food database with categories"""
-    
-    # Brazilian foods database - expanded with categories
-    brazilian_foods = [
-        # Carboidratos
-        {"name": "Arroz branco", "calories": 130, "carbs": 28, "protein": 2.5, "fat": 0.3, "portion": "100g", "category": "carboidratos"},
-        {"name": "Arroz integral", "calories": 110, "carbs": 23, "protein": 2.6, "fat": 0.9, "portion": "100g", "category": "carboidratos"},
-        {"name": "Feijão preto", "calories": 77, "carbs": 14, "protein": 4.5, "fat": 0.5, "portion": "100g", "category": "carboidratos"},
-        {"name": "Feijão carioca", "calories": 76, "carbs": 13.6, "protein": 4.8, "fat": 0.5, "portion": "100g", "category": "carboidratos"},
-        {"name": "Pão francês", "calories": 300, "carbs": 58, "protein": 9, "fat": 3.5, "portion": "unidade", "category": "carboidratos"},
-        {"name": "Pão integral", "calories": 247, "carbs": 49, "protein": 13, "fat": 3.4, "portion": "unidade", "category": "carboidratos"},
-        {"name": "Batata doce", "calories": 86, "carbs": 20, "protein": 1.6, "fat": 0.1, "portion": "100g", "category": "carboidratos"},
-        {"name": "Batata inglesa", "calories": 77, "carbs": 17, "protein": 2, "fat": 0.1, "portion": "100g", "category": "carboidratos"},
-        {"name": "Macarrão", "calories": 131, "carbs": 25, "protein": 5, "fat": 1.1, "portion": "100g", "category": "carboidratos"},
-        {"name": "Tapioca", "calories": 152, "carbs": 37, "protein": 0.2, "fat": 0.1, "portion": "unidade", "category": "carboidratos"},
-        
-        # Proteínas
-        {"name": "Frango grelhado", "calories": 165, "carbs": 0, "protein": 31, "fat": 3.6, "portion": "100g", "category": "proteinas"},
-        {"name": "Peito de frango", "calories": 195, "carbs": 0, "protein": 29.8, "fat": 7.8, "portion": "100g", "category": "proteinas"},
-        {"name": "Carne bovina (patinho)", "calories": 163, "carbs": 0, "protein": 30.9, "fat": 3.6, "portion": "100g", "category": "proteinas"},
-        {"name": "Carne bovina (alcatra)", "calories": 250, "carbs": 0, "protein": 26, "fat": 17, "portion": "100g", "category": "proteinas"},
-        {"name": "Carne moída", "calories": 209, "carbs": 0, "protein": 26.1, "fat": 11, "portion": "100g", "category": "proteinas"},
-        {"name": "Peixe (tilápia)", "calories": 96, "carbs": 0, "protein": 20, "fat": 1.7, "portion": "100g", "category": "proteinas"},
-        {"name": "Salmão", "calories": 208, "carbs": 0, "protein": 20, "fat": 13, "portion": "100g", "category": "proteinas"},
-        {"name": "Atum em lata", "calories": 116, "carbs": 0, "protein": 26, "fat": 0.8, "portion": "100g", "category": "proteinas"},
-        {"name": "Ovo cozido", "calories": 155, "carbs": 1.1, "protein": 13, "fat": 11, "portion": "unidade", "category": "proteinas"},
-        {"name": "Ovo frito", "calories": 196, "carbs": 1.2, "protein": 13.6, "fat": 15, "portion": "unidade", "category": "proteinas"},
-        {"name": "Queijo minas", "calories": 264, "carbs": 3.5, "protein": 17, "fat": 21, "portion": "100g", "category": "proteinas"},
-        {"name": "Queijo muçarela", "calories": 280, "carbs": 2.2, "protein": 18.9, "fat": 22.4, "portion": "100g", "category": "proteinas"},
-        {"name": "Presunto", "calories": 145, "carbs": 1.5, "protein": 19.2, "fat": 7, "portion": "100g", "category": "proteinas"},
-        {"name": "Peito de peru", "calories": 103, "carbs": 1, "protein": 20, "fat": 2, "portion": "100g", "category": "proteinas"},
-        
-        # Frutas
-        {"name": "Banana", "calories": 89, "carbs": 23, "protein": 1.1, "fat": 0.3, "portion": "unidade", "category": "frutas"},
-        {"name": "Maçã", "calories": 52, "carbs": 14, "protein": 0.3, "fat": 0.2, "portion": "unidade", "category": "frutas"},
-        {"name": "Laranja", "calories": 47, "carbs": 12, "protein": 0.9, "fat": 0.1, "portion": "unidade", "category": "frutas"},
-        {"name": "Mamão", "calories": 43, "carbs": 11, "protein": 0.5, "fat": 0.1, "portion": "100g", "category": "frutas"},
-        {"name": "Morango", "calories": 32, "carbs": 7.7, "protein": 0.7, "fat": 0.3, "portion": "100g", "category": "frutas"},
-        {"name": "Melancia", "calories": 30, "carbs": 8, "protein": 0.6, "fat": 0.2, "portion": "100g", "category": "frutas"},
-        {"name": "Abacaxi", "calories": 50, "carbs": 13, "protein": 0.5, "fat": 0.1, "portion": "100g", "category": "frutas"},
-        {"name": "Açaí", "calories": 70, "carbs": 6.2, "protein": 1.5, "fat": 5, "portion": "100g", "category": "frutas"},
-        
-        # Laticínios
-        {"name": "Leite integral", "calories": 61, "carbs": 4.7, "protein": 3.2, "fat": 3.3, "portion": "200ml", "category": "laticinios"},
-        {"name": "Leite desnatado", "calories": 35, "carbs": 4.9, "protein": 3.4, "fat": 0.2, "portion": "200ml", "category": "laticinios"},
-        {"name": "Iogurte natural", "calories": 61, "carbs": 4.7, "protein": 3.5, "fat": 3.3, "portion": "100g", "category": "laticinios"},
-        {"name": "Iogurte grego", "calories": 97, "carbs": 3.6, "protein": 9, "fat": 5, "portion": "100g", "category": "laticinios"},
-        {"name": "Requeijão", "calories": 235, "carbs": 3, "protein": 8.5, "fat": 22, "portion": "100g", "category": "laticinios"},
-        
-        # Bebidas
-        {"name": "Refrigerante Coca-Cola", "calories": 42, "carbs": 10.6, "protein": 0, "fat": 0, "portion": "100ml", "category": "bebidas"},
-        {"name": "Refrigerante Guaraná", "calories": 41, "carbs": 10.3, "protein": 0, "fat": 0, "portion": "100ml", "category": "bebidas"},
-        {"name": "Refrigerante Zero", "calories": 0, "carbs": 0, "protein": 0, "fat": 0, "portion": "100ml", "category": "bebidas"},
-        {"name": "Suco de laranja natural", "calories": 45, "carbs": 10.4, "protein": 0.7, "fat": 0.2, "portion": "100ml", "category": "bebidas"},
-        {"name": "Suco de laranja industrializado", "calories": 47, "carbs": 11.5, "protein": 0.2, "fat": 0, "portion": "100ml", "category": "bebidas"},
-        {"name": "Suco de uva integral", "calories": 60, "carbs": 15, "protein": 0.4, "fat": 0, "portion": "100ml", "category": "bebidas"},
-        {"name": "Água de coco", "calories": 19, "carbs": 3.7, "protein": 0.7, "fat": 0.2, "portion": "100ml", "category": "bebidas"},
-        {"name": "Café com açúcar", "calories": 40, "carbs": 10, "protein": 0.2, "fat": 0, "portion": "100ml", "category": "bebidas"},
-        {"name": "Café sem açúcar", "calories": 2, "carbs": 0, "protein": 0.3, "fat": 0, "portion": "100ml", "category": "bebidas"},
-        {"name": "Chá mate", "calories": 1, "carbs": 0.3, "protein": 0, "fat": 0, "portion": "100ml", "category": "bebidas"},
-        
-        # Merendas/Lanches
-        {"name": "Pão de queijo", "calories": 314, "carbs": 45, "protein": 6.4, "fat": 12, "portion": "unidade", "category": "merendas"},
-        {"name": "Coxinha", "calories": 250, "carbs": 30, "protein": 8, "fat": 10, "portion": "unidade", "category": "merendas"},
-        {"name": "Pastel de carne", "calories": 280, "carbs": 35, "protein": 9, "fat": 11, "portion": "unidade", "category": "merendas"},
-        {"name": "Empada", "calories": 220, "carbs": 20, "protein": 6, "fat": 13, "portion": "unidade", "category": "merendas"},
-        {"name": "Sanduíche natural", "calories": 200, "carbs": 28, "protein": 12, "fat": 5, "portion": "unidade", "category": "merendas"},
-        {"name": "Bolo simples", "calories": 297, "carbs": 52, "protein": 5.3, "fat": 7.8, "portion": "fatia", "category": "merendas"},
-        {"name": "Biscoito maria", "calories": 443, "carbs": 76, "protein": 8.6, "fat": 10.6, "portion": "100g", "category": "merendas"},
-        {"name": "Granola", "calories": 471, "carbs": 64, "protein": 12, "fat": 19, "portion": "100g", "category": "merendas"},
-        {"name": "Castanha de caju", "calories": 553, "carbs": 30, "protein": 18, "fat": 44, "portion": "100g", "category": "merendas"},
-        {"name": "Amendoim", "calories": 567, "carbs": 16, "protein": 26, "fat": 49, "portion": "100g", "category": "merendas"},
-        {"name": "Pipoca", "calories": 387, "carbs": 78, "protein": 11, "fat": 4.5, "portion": "100g", "category": "merendas"},
-    ]
-    
-    filtered = brazilian_foods
-    
-    if category:
-        filtered = [food for food in filtered if food["category"] == category]
-    
-    if search:
-        search_lower = search.lower()
-        filtered = [food for food in filtered if search_lower in food["name"].lower()]
-    
-    return {"foods": filtered}
+    return {**food_index.search(search, category, offset, limit), "offset": offset, "limit": limit}
 
 # =========================
 # GOALS & TRACKING
@@ -534,7 +1128,7 @@ async def create_goal(goal: GoalCreate, current_user: dict = Depends(get_current
     return {"success": True, "goal_id": goal_id}
 
 @app.get("/api/goals")
-async def get_goals(current_user: dict = Depends(get_current_user)):
+async def get_goals(current_user: dict = Depends(get_current_claims)):
     goals = await db.goals.find({"user_id": current_user["user_id"]}).to_list(100)
     
     for goal in goals:
@@ -558,34 +1152,41 @@ async def complete_goal(goal_id: str, current_user: dict = Depends(get_current_u
 # WATER TRACKING
 # =========================
 
+async def award_water_badges(current_user: dict, logs: List[dict]):
+    held = current_user.get("badges", [])
+    new_badges = []
+    for log in logs:
+        new_badges += badges.evaluate(["water"], {"water": log}, held + new_badges)
+    if new_badges:
+        await badges.award(db, current_user["user_id"], new_badges)
+        invalidate_user(current_user["user_id"])
+
 @app.post("/api/water-log")
-async def log_water(water: WaterLog, current_user: dict = Depends(get_current_user)):
+async def log_water(water_log: WaterLog, current_user: dict = Depends(get_current_user)):
     today = datetime.utcnow().strftime("%Y-%m-%d")
-    
-    # Find or create today's water log
-    existing_log = await db.water_logs.find_one({
-        "user_id": current_user["user_id"],
-        "date": today
-    })
-    
-    if existing_log:
-        new_count = existing_log["glasses_count"] + water.glasses
-        await db.water_logs.update_one(
-            {"_id": existing_log["_id"]},
-            {"$set": {"glasses_count": new_count}}
-        )
-    else:
-        await db.water_logs.insert_one({
-            "user_id": current_user["user_id"],
-            "date": today,
-            "glasses_count": water.glasses,
-            "timestamp": datetime.utcnow()
-        })
+    log = await water.add_glasses(db, current_user["user_id"], today, water_log.glasses)
+    await award_water_badges(current_user, [log])
     
     return {"success": True, "message": "Água registrada!"}
 
+@app.post("/api/water-log/batch")
+async def log_water_batch(batch: WaterLogBatch, current_user: dict = Depends(get_current_user)):
+    """Increments recorded offline by mobile clients, applied in one bulk write"""
+    now = datetime.utcnow()
+    if any(water.as_utc(entry.timestamp) > now + timedelta(minutes=5) for entry in batch.entries):
+        raise HTTPException(status_code=400, detail="Registro de água com data no futuro")
+    
+    per_day = await water.add_batch(
+        db, current_user["user_id"], [(entry.timestamp, entry.glasses) for entry in batch.entries]
+    )
+    logs = await db.water_logs.find(
+        {"user_id": current_user["user_id"], "date": {"$in": list(per_day)}}, {"_id": 0, "glasses_count": 1}
+    ).to_list(None)
+    await award_water_badges(current_user, logs)
+    return {"success": True, "days": per_day}
+
 @app.get("/api/water-log")
-async def get_water_log(date: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+async def get_water_log(date: Optional[str] = None, current_user: dict = Depends(get_current_claims)):
     if not date:
         date = datetime.utcnow().strftime("%Y-%m-%d")
     
@@ -673,96 +1274,27 @@ async def get_tips():
 # GAMIFICATION
 # =========================
 
-async def update_user_streak(user_id: str):
-    """Update user's streak count"""
-    user = await db.users.find_one({"user_id": user_id})
-    if not user:
-        return
-    
-    today = datetime.utcnow().date()
-    last_activity = user.get("last_activity_date")
-    
-    if last_activity:
-        last_activity_date = datetime.fromisoformat(last_activity).date() if isinstance(last_activity, str) else last_activity.date()
-        days_diff = (today - last_activity_date).days
-        
-        if days_diff == 1:
-            # Consecutive day
-            new_streak = user.get("streak_count", 0) + 1
-        elif days_diff == 0:
-            # Same day, don't change streak
-            new_streak = user.get("streak_count", 0)
-        else:
-            # Streak broken
-            new_streak = 1
-    else:
-        new_streak = 1
-    
-    await db.users.update_one(
-        {"user_id": user_id},
-        {"$set": {"streak_count": new_streak, "last_activity_date": today.isoformat()}}
-    )
+# Meal-logged events are written to the db.meal_events outbox and applied to
+# the user (streak, meal_count, badges) off the request path
+meal_events = MealEventProcessor(
+    db,
+    on_applied=invalidate_user,
+    batch_size=int(os.getenv("MEAL_EVENTS_BATCH_SIZE", "100")),
+    sweep_interval=float(os.getenv("MEAL_EVENTS_SWEEP_SECONDS", "30"))
+)
 
-async def check_and_award_badges(user_id: str):
-    """Check and award badges based on user activity"""
-    user = await db.users.find_one({"user_id": user_id})
-    if not user:
-        return
-    
-    current_badges = user.get("badges", [])
-    new_badges = []
-    
-    # Badge: First meal logged
-    meal_count = await db.meals.count_documents({"user_id": user_id})
-    if meal_count >= 1 and "first_meal" not in current_badges:
-        new_badges.append("first_meal")
-    
-    # Badge: 7 day streak
-    if user.get("streak_count", 0) >= 7 and "week_streak" not in current_badges:
-        new_badges.append("week_streak")
-    
-    # Badge: 30 day streak
-    if user.get("streak_count", 0) >= 30 and "month_streak" not in current_badges:
-        new_badges.append("month_streak")
-    
-    # Badge: 10 meals logged
-    if meal_count >= 10 and "ten_meals" not in current_badges:
-        new_badges.append("ten_meals")
-    
-    # Badge: 50 meals logged
-    if meal_count >= 50 and "fifty_meals" not in current_badges:
-        new_badges.append("fifty_meals")
-    
-    if new_badges:
-        await db.users.update_one(
-            {"user_id": user_id},
-            {"$push": {"badges": {"$each": new_badges}}}
-        )
+@app.on_event("startup")
+async def start_meal_events():
+    meal_events.start()
+
+@app.on_event("shutdown")
+async def stop_meal_events():
+    await meal_events.stop()
 
 @app.get("/api/badges")
 async def get_badges(current_user: dict = Depends(get_current_user)):
-    badges_info = {
-        "first_meal": {"name": "Primeira Refeição", "description": "Registrou sua primeira refeição!", "icon": "🍽️"},
-        "week_streak": {"name": "Semana Completa", "description": "7 dias consecutivos registrando refeições!", "icon": "🔥"},
-        "month_streak": {"name": "Mês Dedicado", "description": "30 dias consecutivos! Incrível!", "icon": "⭐"},
-        "ten_meals": {"name": "10 Refeições", "description": "Registrou 10 refeições!", "icon": "📊"},
-        "fifty_meals": {"name": "50 Refeições", "description": "Registrou 50 refeições! Você é dedicado!", "icon": "🏆"},
-    }
-    
-    user_badges = current_user.get("badges", [])
-    
-    badges_list = []
-    for badge_id, badge_info in badges_info.items():
-        badges_list.append({
-            "id": badge_id,
-            "name": badge_info["name"],
-            "description": badge_info["description"],
-            "icon": badge_info["icon"],
-            "earned": badge_id in user_badges
-        })
-    
     return {
-        "badges": badges_list,
+        "badges": badges.catalogue_for(current_user.get("badges", [])),
         "streak_count": current_user.get("streak_count", 0)
     }
 
@@ -772,7 +1304,31 @@ async def get_badges(current_user: dict = Depends(get_current_user)):
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    return {"status": "healthy", "timestamp": datetime.utcnow(), "llm": llm_guard.stats()}
+
+@app.get("/api/metrics")
+async def get_metrics():
+    uptime = max((datetime.utcnow() - STARTED_AT).total_seconds(), 1)
+    return {
+        "uptime_seconds": round(uptime),
+        "password_hasher": password_hasher.stats(),
+        "rate_limits": {
+            "store": type(login_bucket_store).__name__,
+            "login_ip": login_ip_limiter.stats(),
+            "login_email": login_email_limiter.stats()
+        },
+        "users": user_resolver.stats(uptime),
+        "analysis_cache": analysis_cache.stats(),
+        "near_duplicates": near_duplicate_index.stats(),
+        "image_pipeline": image_pipeline.stats(),
+        "image_variants": image_variants.stats(),
+        "analysis_jobs": analysis_workers.stats(),
+        "meal_events": meal_events.stats(),
+        "food_index": food_index.stats(),
+        "product_cache": product_cache.stats(),
+        "open_food_facts": open_food_facts.stats(),
+        "barcode_mirror": barcode_mirror.stats()
+    }
 
 # =========================
 # MEAL PLANS
@@ -800,7 +1356,7 @@ async def create_meal_plan(plan: MealPlanCreate, current_user: dict = Depends(ge
     return {"success": True, "plan_id": plan_id, "message": "Plano criado com sucesso!"}
 
 @app.get("/api/meal-plans")
-async def get_meal_plans(current_user: dict = Depends(get_current_user)):
+async def get_meal_plans(current_user: dict = Depends(get_current_claims)):
     plans = await db.meal_plans.find({"user_id": current_user["user_id"]}).to_list(100)
     
     for plan in plans:
@@ -809,7 +1365,7 @@ async def get_meal_plans(current_user: dict = Depends(get_current_user)):
     return {"plans": plans}
 
 @app.get("/api/meal-plans/{plan_id}")
-async def get_meal_plan(plan_id: str, current_user: dict = Depends(get_current_user)):
+async def get_meal_plan(plan_id: str, current_user: dict = Depends(get_current_claims)):
     plan = await db.meal_plans.find_one({"plan_id": plan_id, "user_id": current_user["user_id"]})
     
     if not plan:
@@ -824,57 +1380,8 @@ async def generate_meal_plan(current_user: dict = Depends(get_current_user)):
     
     target_calories = current_user.get("daily_calories_target", 2000)
     
-    # Simple meal plan template (7 days)
-    days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    day_labels = {
-        "monday": "Segunda-feira",
-        "tuesday": "Terça-feira", 
-        "wednesday": "Quarta-feira",
-        "thursday": "Quinta-feira",
-        "friday": "Sexta-feira",
-        "saturday": "Sábado",
-        "sunday": "Domingo"
-    }
-    
-    # Get food database
-    foods_response = await get_food_database()
-    all_foods = foods_response["foods"]
-    
-    # Categorize foods
-    breakfast_foods = [f for f in all_foods if f["category"] in ["carboidratos", "frutas", "laticinios"]]
-    lunch_dinner_foods = [f for f in all_foods if f["category"] in ["carboidratos", "proteinas"]]
-    snack_foods = [f for f in all_foods if f["category"] in ["frutas", "merendas", "bebidas"]]
-    
-    import random
-    
-    meal_plan_days = []
-    for day in days:
-        # Breakfast (30% of daily calories)
-        breakfast_target = target_calories * 0.3
-        breakfast = random.sample(breakfast_foods, min(3, len(breakfast_foods)))
-        
-        # Lunch (35% of daily calories)
-        lunch_target = target_calories * 0.35
-        lunch = random.sample(lunch_dinner_foods, min(4, len(lunch_dinner_foods)))
-        
-        # Dinner (25% of daily calories)
-        dinner_target = target_calories * 0.25
-        dinner = random.sample(lunch_dinner_foods, min(3, len(lunch_dinner_foods)))
-        
-        # Snack (10% of daily calories)
-        snack_target = target_calories * 0.1
-        snack = random.sample(snack_foods, min(2, len(snack_foods)))
-        
-        meal_plan_days.append({
-            "day": day,
-            "day_label": day_labels[day],
-            "meals": {
-                "breakfast": breakfast,
-                "lunch": lunch,
-                "dinner": dinner,
-                "snack": snack
-            }
-        })
+    # Sampled from the in-memory catalogue, not the paginated /api/food-database
+    meal_plan_days = meal_plans.week_plan(food_index)
     
     plan_id = str(uuid.uuid4())
     created_at = datetime.utcnow()
@@ -900,79 +1407,60 @@ async def generate_meal_plan(current_user: dict = Depends(get_current_user)):
 # STATISTICS & CHARTS
 # =========================
 
+def resolve_statistics_range(days: int, from_date: Optional[str], to_date: Optional[str]) -> tuple:
+    """Return (start_date, end_date, day_count) for the last `days` days or an explicit from/to range"""
+    try:
+        return rollups.date_range(days, from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/statistics/weekly")
-async def get_weekly_statistics(current_user: dict = Depends(get_current_user)):
-    """Get weekly statistics for charts"""
-    
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=7)
-    
-    meals = await db.meals.find({
-        "user_id": current_user["user_id"],
-        "timestamp": {"$gte": start_date, "$lte": end_date}
-    }).to_list(500)
-    
-    # Group by date
-    daily_data = defaultdict(lambda: {"calories": 0, "carbs": 0, "protein": 0, "fat": 0, "meal_count": 0})
+async def get_weekly_statistics(
+    days: int = Query(7, ge=1, le=366),
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    current_user: dict = Depends(get_current_claims)
+):
+    """Get daily statistics for charts (last 7 days by default)"""
     
-    for meal in meals:
-        date = meal["date"]
-        daily_data[date]["calories"] += meal.get("calories", 0)
-        daily_data[date]["carbs"] += meal.get("carbs", 0)
-        daily_data[date]["protein"] += meal.get("protein", 0)
-        daily_data[date]["fat"] += meal.get("fat", 0)
-        daily_data[date]["meal_count"] += 1
+    start_date, end_date, day_count = resolve_statistics_range(days, from_date, to_date)
     
-    # Format for charts
-    chart_data = []
-    for i in range(7):
-        date = (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
-        day_name = (start_date + timedelta(days=i)).strftime("%a")
-        
-        chart_data.append({
-            "date": date,
-            "day": day_name,
-            "calories": round(daily_data[date]["calories"], 2),
-            "carbs": round(daily_data[date]["carbs"], 2),
-            "protein": round(daily_data[date]["protein"], 2),
-            "fat": round(daily_data[date]["fat"], 2),
-            "meal_count": daily_data[date]["meal_count"]
-        })
+    daily_totals = await rollups.get_rollups(
+        db, current_user["user_id"], start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    )
+    chart_data = rollups.daily_series(daily_totals, start_date, day_count)
     
     return {
         "weekly_data": chart_data,
         "total_calories": sum(d["calories"] for d in chart_data),
-        "avg_calories": sum(d["calories"] for d in chart_data) / 7,
+        "avg_calories": sum(d["calories"] for d in chart_data) / day_count,
         "target_calories": current_user.get("daily_calories_target", 2000)
     }
 
 @app.get("/api/statistics/monthly")
-async def get_monthly_statistics(current_user: dict = Depends(get_current_user)):
-    """Get monthly statistics"""
-    
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=30)
-    
-    meals = await db.meals.find({
-        "user_id": current_user["user_id"],
-        "timestamp": {"$gte": start_date, "$lte": end_date}
-    }).to_list(1000)
+async def get_monthly_statistics(
+    days: int = Query(30, ge=1, le=366),
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    current_user: dict = Depends(get_current_claims)
+):
+    """Get weekly totals (last 30 days by default)"""
     
-    # Group by week
-    weekly_data = defaultdict(lambda: {"calories": 0, "meals": 0})
+    start_date, end_date, day_count = resolve_statistics_range(days, from_date, to_date)
     
-    for meal in meals:
-        week_num = meal["timestamp"].isocalendar()[1]
-        weekly_data[week_num]["calories"] += meal.get("calories", 0)
-        weekly_data[week_num]["meals"] += 1
+    # Grouped by ISO week inside MongoDB; only the per-week sums leave the server
+    weeks = await rollups.weekly_totals(
+        db, current_user["user_id"], start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    )
     
     chart_data = [
         {
-            "week": f"Sem {week}",
-            "calories": round(data["calories"], 2),
-            "meals": data["meals"]
+            "week": f"Sem {week['week']}",
+            "week_start": week["_id"].strftime("%Y-%m-%d"),
+            "calories": round(week["calories"], 2),
+            "meals": week["meals"]
         }
-        for week, data in sorted(weekly_data.items())
+        for week in weeks
     ]
     
     return {
@@ -984,51 +1472,108 @@ async def get_monthly_statistics(current_user: dict = Depends(get_current_user))
 # OPEN FOOD FACTS API
 # =========================
 
+# Lookups share one pooled session; found products and unknown barcodes are
+# cached (in memory and in db.barcode_cache), upstream errors are not
+OPEN_FOOD_FACTS_CACHE_TTL = int(os.getenv("OPEN_FOOD_FACTS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+open_food_facts = OpenFoodFactsClient(
+    TieredCache(
+        db.barcode_cache,
+        maxsize=int(os.getenv("OPEN_FOOD_FACTS_CACHE_SIZE", "4096")),
+        ttl=OPEN_FOOD_FACTS_CACHE_TTL
+    ),
+    base_url=os.getenv("OPEN_FOOD_FACTS_URL", "https://world.openfoodfacts.org"),
+    timeout=float(os.getenv("OPEN_FOOD_FACTS_TIMEOUT_SECONDS", "5")),
+    connections=int(os.getenv("OPEN_FOOD_FACTS_CONNECTIONS", "20")),
+    miss_ttl=int(os.getenv("OPEN_FOOD_FACTS_MISS_TTL_SECONDS", "3600"))
+)
+
+# Local copy of the Open Food Facts dump (barcode_mirror.py); the API above is
+# only asked about barcodes the mirror does not have
+barcode_mirror = BarcodeMirror()
+# Open Food Facts requests in flight per batch lookup
+BARCODE_BATCH_CONCURRENCY = int(os.getenv("BARCODE_BATCH_CONCURRENCY", "8"))
+
+@app.on_event("shutdown")
+async def close_open_food_facts():
+    await open_food_facts.close()
+    barcode_mirror.close()
+
 @app.get("/api/barcode/search/{barcode}")
 async def search_barcode_openfoodfacts(barcode: str, current_user: dict = Depends(get_current_user)):
     """Search product by barcode using Open Food Facts API"""
-    
+    if not barcode.isdigit() or len(barcode) > 32:
+        raise HTTPException(status_code=400, detail="Código de barras inválido")
+
+    product = barcode_mirror.lookup(barcode)
+    if product is not None:
+        return {"success": True, "product": product}
+
     try:
-        async with aiohttp.ClientSession() as session:
-            url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    if data.get("status") == 1:
-                        product = data.get("product", {})
-                        nutriments = product.get("nutriments", {})
-                        
-                        return {
-                            "success": True,
-                            "product": {
-                                "name": product.get("product_name", "Produto desconhecido"),
-                                "brand": product.get("brands", ""),
-                                "calories": nutriments.get("energy-kcal_100g", 0),
-                                "carbs": nutriments.get("carbohydrates_100g", 0),
-                                "protein": nutriments.get("proteins_100g", 0),
-                                "fat": nutriments.get("fat_100g", 0),
-                                "portion": "100g",
-                                "image_url": product.get("image_url", ""),
-                                "source": "Open Food Facts"
-                            }
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "message": "Produto não encontrado no Open Food Facts"
-                        }
-                else:
-                    return {
-                        "success": False,
-                        "message": "Erro ao consultar Open Food Facts"
-                    }
-    except Exception as e:
+        product = await open_food_facts.lookup(barcode)
+    except UpstreamError as e:
+        logger.warning(f"Open Food Facts lookup failed for {barcode}: {e}")
         return {
             "success": False,
-            "message": f"Erro: {str(e)}"
+            "message": "Erro ao consultar Open Food Facts"
         }
 
+    if product is None:
+        return {
+            "success": False,
+            "message": "Produto não encontrado no Open Food Facts"
+        }
+    return {"success": True, "product": product}
+
+class BarcodeBatch(BaseModel):
+    barcodes: List[str] = Field(..., min_length=1, max_length=50)
+
+@app.post("/api/barcode/search")
+async def search_barcodes(batch: BarcodeBatch, current_user: dict = Depends(get_current_user)):
+    """Several barcodes in one call: catalogue, then the offline mirror, then Open Food Facts
+
+    Results keep the request order, each with the source that answered
+    ("catalogue", "mirror", "cache" or "open_food_facts") and its latency.
+    """
+    barcodes = [barcode.strip() for barcode in batch.barcodes]
+    resolved: Dict[str, dict] = {}
+    valid = [barcode for barcode in dict.fromkeys(barcodes) if barcode.isdigit() and len(barcode) <= 32]
+
+    started = time.perf_counter()
+    catalogue_products = await get_catalogue_products(valid)
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    for barcode, product in catalogue_products.items():
+        if product is not None:
+            resolved[barcode] = {"product": product, "source": "catalogue", "latency_ms": latency_ms}
+
+    for barcode in valid:
+        if barcode in resolved:
+            continue
+        started = time.perf_counter()
+        product = barcode_mirror.lookup(barcode)
+        if product is not None:
+            latency_ms = round((time.perf_counter() - started) * 1000, 3)
+            resolved[barcode] = {"product": product, "source": "mirror", "latency_ms": latency_ms}
+
+    misses = [barcode for barcode in valid if barcode not in resolved]
+    resolved.update(await open_food_facts.lookup_many(misses, concurrency=BARCODE_BATCH_CONCURRENCY))
+
+    results = []
+    for barcode in barcodes:
+        result = resolved.get(barcode)
+        if result is None:
+            results.append({"barcode": barcode, "success": False, "message": "Código de barras inválido",
+                            "source": None, "latency_ms": 0.0})
+        elif result.get("error"):
+            results.append({"barcode": barcode, "success": False, "message": "Erro ao consultar Open Food Facts",
+                            "source": None, "latency_ms": result["latency_ms"]})
+        elif result["product"] is None:
+            results.append({"barcode": barcode, "success": False, "message": "Produto não encontrado",
+                            "source": result["source"], "latency_ms": result["latency_ms"]})
+        else:
+            results.append({"barcode": barcode, "success": True, "product": result["product"],
+                            "source": result["source"], "latency_ms": result["latency_ms"]})
+    return {"results": results, "found": sum(result["success"] for result in results)}
+
 # =========================
 # NOTIFICATIONS
 # =========================
@@ -1047,12 +1592,12 @@ async def set_notification_preferences(
         {"user_id": current_user["user_id"]},
         {"$set": {"notification_preferences": prefs.dict()}}
     )
+    invalidate_user(current_user["user_id"])
     return {"success": True, "message": "Preferências salvas!"}
 
 @app.get("/api/notifications/preferences")
 async def get_notification_preferences(current_user: dict = Depends(get_current_user)):
-    user = await db.users.find_one({"user_id": current_user["user_id"]})
-    prefs = user.get("notification_preferences", {
+    prefs = current_user.get("notification_preferences", {
         "water_reminders": True,
         "meal_reminders": True,
         "reminder_times": ["08:00", "12:00", "18:00"]
@@ -0,0 +1,69 @@
+from typing import Iterable
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from image_pipeline import InvalidImageError, image_dimensions, sniff_image_type
+
+# Room for the multipart boundaries and the other form fields
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadLimitMiddleware:
+    """Reject oversized uploads from their Content-Length, before the body is read
+
+    Starlette parses multipart bodies before the endpoint runs (spooling files
+    to disk past 1 MB), so the limit has to be enforced here. Uploads without
+    a Content-Length are refused, since their size is only known at the end.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes + FORM_OVERHEAD_BYTES
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is None:
+            response = JSONResponse({"detail": "Content-Length required"}, status_code=411)
+        elif not length.isdigit():
+            response = JSONResponse({"detail": "Invalid Content-Length"}, status_code=400)
+        elif int(length) > self.max_bytes:
+            response = JSONResponse({"detail": "Image too large"}, status_code=413)
+        else:
+            await self.app(scope, receive, send)
+            return
+        await response(scope, receive, send)
+
+
+async def read_image_upload(upload: UploadFile, max_bytes: int, max_pixels: int) -> bytes:
+    """Validated bytes of an uploaded image
+
+    Size, file signature and header dimensions are checked on the spooled
+    file; only then is the image read into memory, once.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise HTTPException(status_code=413, detail="Image too large")
+    head = await upload.read(16)
+    if sniff_image_type(head) is None:
+        raise HTTPException(status_code=415, detail="Unsupported image type")
+
+    await upload.seek(0)
+    try:
+        # The file may be spooled to disk; keep the blocking reads off the event loop
+        width, height = await run_in_threadpool(image_dimensions, upload.file)
+    except InvalidImageError:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    if width * height > max_pixels:
+        raise HTTPException(status_code=400, detail="Image dimensions too large")
+
+    await upload.seek(0)
+    data = await upload.read()
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413, detail="Image too large")
+    return data
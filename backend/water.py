@@ -0,0 +1,54 @@
+"""
+Water intake per user and day (db.water_logs)
+
+Every write is a single $inc upsert on the unique (user_id, date) index, so
+concurrent taps never lose increments and cost one round trip.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Iterable, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    """Naive UTC datetime; days are UTC dates, like everywhere else in the API"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _increment(user_id: str, date: str, glasses: int, now: datetime) -> Tuple[dict, dict]:
+    # On a concurrent first write of the day, the server retries the losing
+    # upsert as an update because the filter matches the unique index exactly
+    return (
+        {"user_id": user_id, "date": date},
+        {"$inc": {"glasses_count": glasses}, "$setOnInsert": {"timestamp": now}}
+    )
+
+
+async def add_glasses(db, user_id: str, date: str, glasses: int = 1) -> dict:
+    """Add glasses to a day and return its log as updated"""
+    return await db.water_logs.find_one_and_update(
+        *_increment(user_id, date, glasses, datetime.utcnow()),
+        projection={"_id": 0, "date": 1, "glasses_count": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def add_batch(db, user_id: str, entries: Iterable[Tuple[datetime, int]]) -> dict:
+    """Apply (timestamp, glasses) increments logged offline; returns the glasses added per day"""
+    per_day = defaultdict(int)
+    for timestamp, glasses in entries:
+        per_day[as_utc(timestamp).strftime("%Y-%m-%d")] += glasses
+
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(*_increment(user_id, date, glasses, now), upsert=True)
+        for date, glasses in per_day.items() if glasses
+    ]
+    if ops:
+        await db.water_logs.bulk_write(ops, ordered=False)
+    return dict(per_day)
@@ -0,0 +1,23 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# The backend is run from its own directory (uvicorn server:app), so its modules
+# import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+@pytest.fixture
+def server():
+    """The real app module, skipping the test where its dependencies are not installed"""
+    # Motor binds the GridFS bucket to the current event loop at import time,
+    # and the asyncio.run() calls of other tests leave none behind
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        yield pytest.importorskip("server")
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
@@ -0,0 +1,164 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+import gamification
+from auth import TokenAuth, UserResolver, token_claims
+from cache import LRUCache
+
+
+class UsersCollection:
+    def __init__(self, *users):
+        self.docs = {user["user_id"]: dict(user) for user in users}
+        self.finds = []
+
+    async def find_one(self, query, projection=None):
+        self.finds.append(projection)
+        doc = self.docs.get(query["user_id"])
+        if doc is None:
+            return None
+        hidden = {field for field, shown in (projection or {}).items() if not shown}
+        return {key: value for key, value in doc.items() if key not in hidden}
+
+
+ANA = {"user_id": "u1", "email": "ana@x.com", "name": "Ana", "daily_calories_target": 1800,
+       "applied_event_ids": ["e1", "e2"]}
+
+
+def payload(user=ANA):
+    return {"sub": user["user_id"], "claims": token_claims(user)}
+
+
+def test_stateless_reads_trust_only_the_token():
+    users = UsersCollection(ANA)
+    resolver = UserResolver(users, LRUCache(), stateless=True)
+    # The token was signed before the profile changed; reads still see the token's version
+    users.docs["u1"]["name"] = "Ana Maria"
+
+    identity = asyncio.run(resolver.claims(payload()))
+
+    assert identity == {"user_id": "u1", "email": "ana@x.com", "name": "Ana", "daily_calories_target": 1800}
+    assert users.finds == []
+    # Tokens issued before claims existed fall back to a lookup
+    assert asyncio.run(resolver.claims({"sub": "u1"}))["name"] == "Ana Maria"
+
+
+def test_write_endpoints_always_load_the_user():
+    users = UsersCollection(ANA)
+    resolver = UserResolver(users, LRUCache(), stateless=True)
+
+    user = asyncio.run(resolver.user(payload()))
+
+    assert user["name"] == "Ana"
+    assert "applied_event_ids" not in user
+    assert len(users.finds) == 1
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(resolver.user({"sub": "gone", "claims": {}}))
+    assert error.value.status_code == 401
+
+
+def test_invalidate_evicts_the_cached_user():
+    users = UsersCollection(ANA)
+    resolver = UserResolver(users, LRUCache(ttl=300))
+    asyncio.run(resolver.user(payload()))
+
+    users.docs["u1"]["daily_calories_target"] = 2200
+    assert asyncio.run(resolver.user(payload()))["daily_calories_target"] == 1800
+
+    resolver.invalidate("u1")
+    assert asyncio.run(resolver.user(payload()))["daily_calories_target"] == 2200
+
+
+def test_metrics_count_requests_lookups_and_stateless_reads():
+    resolver = UserResolver(UsersCollection(ANA), LRUCache(), stateless=True)
+
+    async def requests():
+        for _ in range(3):
+            await resolver.user(payload())
+        for _ in range(2):
+            await resolver.claims(payload())
+
+    asyncio.run(requests())
+    stats = resolver.stats(uptime=10)
+
+    assert (stats["auth_requests"], stats["db_lookups"], stats["stateless_requests"]) == (3, 1, 2)
+    assert (stats["db_qps"], stats["uncached_qps"]) == (0.1, 0.5)
+    assert (stats["cache"]["hits"], stats["cache"]["misses"]) == (2, 1)
+
+
+SECRET = "test-secret"
+
+
+def token(user=ANA, **extra):
+    return jwt.encode({**payload(user), **extra}, SECRET, algorithm="HS256")
+
+
+def make_app(users, stateless=True):
+    resolver = UserResolver(users, LRUCache(ttl=300), stateless=stateless)
+    auth = TokenAuth(resolver, SECRET)
+    app = FastAPI()
+
+    @app.get("/profile")
+    async def read_profile(identity: dict = Depends(auth.claims)):
+        return identity
+
+    @app.post("/profile")
+    async def update_profile(name: str, user: dict = Depends(auth.user)):
+        users.docs[user["user_id"]]["name"] = name
+        resolver.invalidate(user["user_id"])
+        return {"before": user["name"]}
+
+    return TestClient(app), resolver
+
+
+def test_dependencies_serve_reads_from_the_token_and_writes_from_the_database():
+    users = UsersCollection(ANA)
+    client, resolver = make_app(users)
+    headers = {"Authorization": f"Bearer {token()}"}
+
+    read = client.get("/profile", headers=headers)
+    write = client.post("/profile", params={"name": "Ana Maria"}, headers=headers)
+    again = client.post("/profile", params={"name": "Ana M."}, headers=headers)
+
+    assert read.json()["name"] == "Ana" and users.finds[:1] == [gamification.INTERNAL_USER_FIELDS]
+    # The write loaded the user, and its invalidation made the next write reload it
+    assert write.json() == {"before": "Ana"}
+    assert again.json() == {"before": "Ana Maria"}
+    assert len(users.finds) == 2
+    stats = resolver.stats(uptime=1)
+    assert (stats["stateless_requests"], stats["auth_requests"], stats["db_lookups"]) == (1, 2, 2)
+
+
+def test_dependencies_reject_bad_tokens():
+    client, _ = make_app(UsersCollection(ANA))
+
+    expired = token(exp=datetime.utcnow() - timedelta(minutes=1))
+    forged = jwt.encode(payload(), "another-secret", algorithm="HS256")
+    unknown_user = token({**ANA, "user_id": "gone"})
+
+    assert client.get("/profile", headers={"Authorization": f"Bearer {expired}"}).json() == {
+        "detail": "Token has expired"}
+    assert client.get("/profile", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+    assert client.post("/profile", params={"name": "x"},
+                       headers={"Authorization": f"Bearer {unknown_user}"}).status_code == 401
+    assert client.get("/profile").status_code == 403
+
+
+def test_server_uses_token_claims_only_on_read_routes(server):
+
+    def calls(dependant):
+        for dependency in dependant.dependencies:
+            yield dependency.call
+            yield from calls(dependency)
+
+    claims_routes = [route for route in server.app.routes
+                     if isinstance(route, APIRoute) and server.get_current_claims in calls(route.dependant)]
+
+    assert claims_routes
+    for route in claims_routes:
+        assert route.methods == {"GET"}, f"{route.path} writes with a claims-only identity"
@@ -0,0 +1,37 @@
+import badges
+
+
+def test_catalogue_ids_are_unique_and_metrics_known():
+    ids = [rule.badge_id for rule in badges.CATALOGUE]
+
+    assert len(ids) == len(set(ids))
+    assert all(rule.metric in badges.METRICS for rule in badges.CATALOGUE)
+
+
+def test_only_rules_of_the_given_triggers_are_evaluated():
+    user = {"meal_count": 12, "streak_count": 7, "badges": ["first_meal"]}
+
+    assert badges.evaluate(["meal_count"], {"user": user}, user["badges"]) == ["ten_meals"]
+    assert badges.evaluate(["meal_count", "streak"], {"user": user}, user["badges"]) == ["ten_meals", "week_streak"]
+    # A water event never needs the user's meal fields
+    assert badges.evaluate(["water"], {"water": {"glasses_count": 8}}) == ["hydrated"]
+
+
+def test_range_rules_need_both_bounds():
+    user = {"daily_calories_target": 2000}
+
+    def on_target(calories):
+        return badges.evaluate(["daily_totals"], {"user": user, "day": {"calories": calories}})
+
+    assert on_target(1900) == ["on_target"]
+    assert on_target(1700) == []
+    assert on_target(2300) == []
+    assert badges.evaluate(["daily_totals"], {"user": {}, "day": {"calories": 1900}}) == []
+
+
+def test_catalogue_for_marks_earned_badges():
+    catalogue = {badge["id"]: badge for badge in badges.catalogue_for(["hydrated"])}
+
+    assert catalogue["hydrated"]["earned"]
+    assert not catalogue["first_meal"]["earned"]
+    assert set(catalogue["first_meal"]) == {"id", "name", "description", "icon", "earned"}
@@ -0,0 +1,53 @@
+import barcode_mirror
+from barcode_mirror import BarcodeMirror
+
+
+def product(code, name, kcal, **extra):
+    return {"code": code, "product_name": name, "nutriments": {"energy-kcal_100g": kcal}, **extra}
+
+
+def test_build_and_lookup(tmp_path):
+    rows = [
+        product("7891000100103", "Nescau", 400, brands="Nestlé,Nescau", image_url="http://img/nescau.jpg"),
+        product("0078742371335", "Oreo", 480),
+        product("", "Sem código", 100),
+        product("7891000100103", "Nescau 2.0", 390),
+    ]
+
+    stats = barcode_mirror.build(rows, str(tmp_path))
+    mirror = BarcodeMirror(str(tmp_path))
+
+    assert (stats["read"], stats["invalid"], stats["products"]) == (4, 1, 2)
+    # The last row for a barcode wins
+    assert mirror.lookup("7891000100103")["name"] == "Nescau 2.0"
+    assert mirror.lookup("0078742371335") == {
+        "name": "Oreo", "brand": "", "calories": 480.0, "carbs": 0.0, "protein": 0.0, "fat": 0.0,
+        "portion": "100g", "image_url": "", "source": "Open Food Facts"
+    }
+    # Leading zeros are GTIN padding
+    assert mirror.lookup("78742371335")["name"] == "Oreo"
+    assert mirror.lookup("1234567890123") is None
+    assert mirror.lookup("abc") is None
+    assert mirror.stats()["hits"] == 3
+    mirror.close()
+
+
+def test_delta_update_overrides_and_adds(tmp_path):
+    barcode_mirror.build([product("1", "Arroz", 130), product("2", "Feijão", 77)], str(tmp_path))
+    mirror = BarcodeMirror(str(tmp_path))
+    assert mirror.lookup("2")["name"] == "Feijão"
+
+    stats = barcode_mirror.build([product("2", "Feijão preto", 77), product("3", "Açaí", 58)], str(tmp_path),
+                                 delta=True)
+
+    assert stats["products"] == 3
+    assert mirror.reload_if_changed()
+    assert [mirror.lookup(code)["name"] for code in ("1", "2", "3")] == ["Arroz", "Feijão preto", "Açaí"]
+    mirror.close()
+
+
+def test_missing_mirror_finds_nothing(tmp_path):
+    mirror = BarcodeMirror(str(tmp_path / "absent"))
+
+    assert not mirror.available
+    assert mirror.lookup("7891000100103") is None
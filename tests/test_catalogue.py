@@ -0,0 +1,149 @@
+import asyncio
+import gzip
+import json
+import os
+import uuid
+
+import pytest
+
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+import catalogue
+import indexes
+
+
+class BulkResult:
+    def __init__(self, upserted, matched):
+        self.upserted_count = upserted
+        self.matched_count = matched
+
+
+class RecordingCollection:
+    """Records bulk writes and applies them to a dict, with the unique key index and name collation of db.foods"""
+
+    def __init__(self):
+        self.batches = []
+        self.meta = []
+        self.stored = {}
+
+    async def bulk_write(self, ops, ordered=True):
+        assert not ordered
+        self.batches.append(ops)
+        upserted, matched, errors = 0, 0, []
+        for i, op in enumerate(ops):
+            (field, key), *name = op._filter.items()
+            stored = self.stored.get(key)
+            if stored is None:
+                upserted += 1
+            elif not name or stored["name"].casefold() == name[0][1].casefold():
+                matched += 1
+            else:
+                errors.append({"index": i, "code": 11000})
+                continue
+            self.stored[key] = op._doc["$set"]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nUpserted": upserted, "nMatched": matched})
+        return BulkResult(upserted, matched)
+
+    async def update_one(self, query, update, upsert=False):
+        self.meta.append(query["_id"])
+
+
+class RecordingDb(dict):
+    def __init__(self):
+        super().__init__(foods=RecordingCollection(), products=RecordingCollection())
+        self.catalogue_meta = RecordingCollection()
+
+
+def test_reads_semicolon_csv_with_taco_columns(tmp_path):
+    path = tmp_path / "taco.csv"
+    path.write_text(
+        "Descrição;Categoria;Energia (kcal);Proteína (g);Lipídeos (g);Carboidrato (g)\n"
+        "Arroz, integral, cozido;Cereais;124;2,6;1,0;25,8\n"
+        "Alface, crespa, crua;Verduras;11;1,3;Tr;1,7\n",
+        encoding="utf-8"
+    )
+
+    docs = [catalogue.to_document(row, "foods") for row in catalogue.read_rows(str(path))]
+
+    assert docs[0] == {
+        "name": "Arroz, integral, cozido", "portion": "100g", "calories": 124.0, "carbs": 25.8,
+        "protein": 2.6, "fat": 1.0, "key": "arroz integral cozido", "category": "cereais"
+    }
+    # "Tr" (traces) counts as zero
+    assert docs[1]["fat"] == 0.0
+
+
+def test_reads_gzipped_open_food_facts_jsonl(tmp_path):
+    path = tmp_path / "products.jsonl.gz"
+    lines = [
+        {"code": "7891000100103", "product_name": "Nescau", "brands": "Nestlé,Nescau",
+         "nutriments": {"energy-kcal_100g": 400, "proteins_100g": 5}},
+        {"code": "", "product_name": "Sem código"},
+    ]
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write("\n".join(json.dumps(line) for line in lines))
+
+    docs = [catalogue.to_document(row, "products") for row in catalogue.read_rows(str(path))]
+
+    assert docs[0]["barcode"] == "7891000100103"
+    assert docs[0]["brand"] == "Nestlé"
+    assert (docs[0]["calories"], docs[0]["protein"], docs[0]["fat"]) == (400.0, 5.0, 0.0)
+    assert docs[1] is None
+
+
+def test_import_chunks_deduplicates_and_bumps_version():
+    db = RecordingDb()
+    rows = [{"name": "Banana"}, {"name": "BANANA"}, {"name": ""}, {"name": "Maçã"}, {"name": "maçã", "kcal": 52}]
+
+    stats = asyncio.run(catalogue.import_rows(db, "foods", rows, chunk_size=2))
+
+    assert [len(batch) for batch in db["foods"].batches] == [1, 1, 1]
+    # "maçã" repeats "Maçã" in a later chunk, so it is left to the upsert instead
+    assert (stats["read"], stats["invalid"], stats["duplicates"], stats["collisions"]) == (5, 1, 1, 0)
+    assert (stats["inserted"], stats["updated"]) == (2, 1)
+    assert [op._filter["key"] for batch in db["foods"].batches for op in batch] == ["banana", "maca", "maca"]
+    assert db["foods"].stored["maca"]["calories"] == 52.0
+    assert stats["rows_per_second"] > 0
+    assert db.catalogue_meta.meta == ["foods"]
+
+
+def test_foods_differing_only_in_accents_collide_instead_of_merging():
+    db = RecordingDb()
+    rows = [{"name": "Maçã", "kcal": 52}, {"name": "Maca", "kcal": 350}, {"name": "Pão"}, {"name": "Pao"}]
+
+    stats = asyncio.run(catalogue.import_rows(db, "foods", rows, chunk_size=3))
+
+    # "Maca" collides within its chunk, "Pao" with the food stored by the first chunk
+    assert (stats["collisions"], stats["inserted"], stats["updated"]) == (2, 2, 0)
+    assert (db["foods"].stored["maca"]["name"], db["foods"].stored["maca"]["calories"]) == ("Maçã", 52.0)
+    assert db["foods"].stored["pao"]["name"] == "Pão"
+
+
+def test_collisions_against_a_real_unique_index():
+    """Needs a MongoDB server (MONGO_URL); uses and drops a throwaway database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+        db = client[f"test_catalogue_{uuid.uuid4().hex[:8]}"]
+        try:
+            await indexes.ensure_indexes(db, ["foods"])
+            first = await catalogue.import_rows(db, "foods", [{"name": "Maçã", "kcal": 52}])
+            # One row per chunk, so both are resolved by the upsert against the stored food
+            rows = [{"name": "MAÇÃ", "kcal": 55}, {"name": "Maca", "kcal": 350}]
+            second = await catalogue.import_rows(db, "foods", rows, chunk_size=1)
+            return first, second, await db.foods.find({}, {"_id": 0, "name": 1, "calories": 1}).to_list(None)
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    try:
+        first, second, foods = asyncio.run(run())
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not available")
+
+    assert first["inserted"] == 1
+    # "MAÇÃ" is the stored food in capitals and updates it; "Maca" is another food under the same key
+    assert (second["inserted"], second["updated"], second["collisions"]) == (0, 1, 1)
+    assert foods == [{"name": "MAÇÃ", "calories": 55.0}]
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import gamification
+from events import MealEventProcessor
+
+
+def test_events_are_applied_once_even_when_redelivered():
+    """Needs a MongoDB server (MONGO_URL); uses and drops a throwaway database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+        db = client[f"test_events_{uuid.uuid4().hex[:8]}"]
+        applied = []
+        processor = MealEventProcessor(db, on_applied=applied.append)
+        try:
+            await db.users.insert_one({"user_id": "u1", "streak_count": 0, "meal_count": 0, "badges": []})
+            await processor.emit("u1", "2024-05-01")
+            await processor.emit("u1", "2024-05-02", meals=2)
+            first = await processor.process_user("u1")
+
+            # Simulate a crash between applying the events and marking them processed
+            await db.meal_events.update_many({}, {"$set": {"processed": False}})
+            second = await processor.process_user("u1")
+            public = await db.users.find_one({"user_id": "u1"}, gamification.INTERNAL_USER_FIELDS)
+            return first, second, applied, await db.users.find_one({"user_id": "u1"}), public
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    try:
+        first, second, applied, user, public = asyncio.run(run())
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not available")
+
+    assert (first, second) == (2, 2)
+    assert applied == ["u1", "u1"]
+    assert user["meal_count"] == 3
+    assert user["streak_count"] == 2
+    assert user["last_activity_date"] == "2024-05-02"
+    assert user["badges"] == ["first_meal"]
+    assert len(user["applied_event_ids"]) == 2
+    # Regular user reads (auth, user cache) do not carry the dedupe list
+    assert "applied_event_ids" not in public and public["meal_count"] == 3
+
+
+def test_notify_queues_each_user_once():
+    processor = MealEventProcessor(db=None)
+
+    processor.notify("u1")
+    processor.notify("u1")
+    processor.notify("u2")
+
+    assert processor.stats()["queued_users"] == 2
@@ -0,0 +1,62 @@
+from food_index import FoodIndex, normalize
+from seed_data import BRAZILIAN_FOODS
+
+
+def names(result):
+    return [food["name"] for food in result["foods"]]
+
+
+def test_normalize_folds_accents_case_and_punctuation():
+    assert normalize("Feijão (PRETO)") == "feijao preto"
+    assert normalize("  Pão-de-queijo ") == "pao de queijo"
+
+
+def test_accent_insensitive_search():
+    index = FoodIndex(BRAZILIAN_FOODS)
+
+    assert names(index.search("feijao")) == ["Feijão preto", "Feijão carioca"]
+    assert names(index.search("ACAI")) == ["Açaí"]
+    assert names(index.search("muçarela")) == names(index.search("mucarela"))
+
+
+def test_ranking_prefers_exact_then_prefix_then_word_then_substring():
+    index = FoodIndex([
+        {"name": "Torta de queijo"},
+        {"name": "Pão de queijo"},
+        {"name": "Queijo minas"},
+        {"name": "Queijo"},
+        {"name": "Requeijão"},
+    ])
+
+    assert names(index.search("queijo")) == ["Queijo", "Queijo minas", "Pão de queijo", "Torta de queijo"]
+    assert names(index.search("queij")) == [
+        "Queijo", "Queijo minas", "Pão de queijo", "Torta de queijo", "Requeijão"
+    ]
+
+
+def test_every_word_must_match():
+    index = FoodIndex(BRAZILIAN_FOODS)
+
+    assert names(index.search("suco laranja")) == ["Suco de laranja natural", "Suco de laranja industrializado"]
+    assert names(index.search("ref zero")) == ["Refrigerante Zero"]
+
+
+def test_typos_fall_back_to_trigram_similarity():
+    index = FoodIndex(BRAZILIAN_FOODS)
+
+    assert names(index.search("fejao"))[:2] == ["Feijão preto", "Feijão carioca"]
+    assert names(index.search("banan"))[0] == "Banana"
+    assert index.search("xyzw")["total"] == 0
+
+
+def test_category_filter_and_pagination():
+    index = FoodIndex(BRAZILIAN_FOODS)
+    fruits = [food["name"] for food in BRAZILIAN_FOODS if food["category"] == "frutas"]
+
+    first = index.search(category="frutas", limit=3)
+    second = index.search(category="frutas", offset=3, limit=3)
+
+    assert first["total"] == len(fruits)
+    assert names(first) + names(second) == fruits[:6]
+    assert names(index.search("suco", category="frutas")) == []
+    assert index.category_names() == sorted({food["category"] for food in BRAZILIAN_FOODS})
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import uuid
+from datetime import date, datetime
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import gamification
+
+
+def test_record_meals_updates_counter_streak_and_badges():
+    """Needs a MongoDB server (MONGO_URL); uses and drops a throwaway database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+        db = client[f"test_gamification_{uuid.uuid4().hex[:8]}"]
+        try:
+            await db.users.insert_one({
+                "user_id": "u1", "streak_count": 6, "badges": ["first_meal"],
+                # Legacy documents stored a datetime here
+                "last_activity_date": datetime(2024, 5, 1)
+            })
+            results = [
+                await gamification.record_meals(db, "u1", today=date(2024, 5, 2)),
+                await gamification.record_meals(db, "u1", meals=9, today=date(2024, 5, 2)),
+                await gamification.record_meals(db, "u1", today=date(2024, 5, 5)),
+            ]
+            return results, await db.users.find_one({"user_id": "u1"})
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    try:
+        (first, second, third), user = asyncio.run(run())
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not available")
+
+    assert (first["meal_count"], first["streak_count"], first["new_badges"]) == (1, 7, ["week_streak"])
+    assert (second["meal_count"], second["streak_count"], second["new_badges"]) == (10, 7, ["ten_meals"])
+    assert (third["meal_count"], third["streak_count"], third["new_badges"]) == (11, 1, [])
+    assert user["last_activity_date"] == "2024-05-05"
+    assert sorted(user["badges"]) == ["first_meal", "ten_meals", "week_streak"]
@@ -0,0 +1,68 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from image_pipeline import ImagePipeline, InvalidImageError, preprocess_image, sniff_image_type
+
+
+def make_photo(size=(4000, 3000), orientation=None):
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def test_preprocess_downscales_and_strips_exif():
+    result = preprocess_image(make_photo(), max_edge=1024)
+
+    output = Image.open(io.BytesIO(result["image"]))
+    assert max(output.size) == 1024
+    assert not output.getexif()
+    # The header size, not the reduced size JPEG draft mode decodes at
+    assert result["original_size"] == (4000, 3000)
+    assert result["bytes_out"] < result["bytes_in"]
+    assert set(result["timings"]) == {"decode", "resize", "encode"}
+
+
+def test_preprocess_applies_exif_orientation():
+    # Orientation 6 means the camera was rotated 90 degrees
+    result = preprocess_image(make_photo(size=(1600, 1200), orientation=6), max_edge=800)
+
+    assert result["size"] == (600, 800)
+    assert result["original_size"] == (1200, 1600)
+
+
+def test_preprocess_can_encode_webp():
+    result = preprocess_image(make_photo(size=(800, 600)), max_edge=400, image_format="WEBP")
+
+    assert Image.open(io.BytesIO(result["image"])).format == "WEBP"
+
+
+def test_pipeline_rejects_invalid_images_and_tracks_metrics():
+    pipeline = ImagePipeline(max_edge=512, workers=1)
+
+    async def run():
+        await pipeline.process(make_photo(size=(1024, 768)))
+        with pytest.raises(InvalidImageError):
+            await pipeline.process(b"not an image")
+
+    asyncio.run(run())
+    stats = pipeline.stats()
+    pipeline.shutdown()
+
+    assert stats["processed"] == 1
+    assert stats["failed"] == 1
+    assert stats["bytes_out"] < stats["bytes_in"]
+
+
+def test_sniff_image_type():
+    assert sniff_image_type(make_photo(size=(32, 32))) == "image/jpeg"
+    webp = preprocess_image(make_photo(size=(32, 32)), image_format="WEBP")["image"]
+    assert sniff_image_type(webp) == "image/webp"
+    assert sniff_image_type(b"<svg xmlns=...>") is None
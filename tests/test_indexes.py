@@ -0,0 +1,172 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+from pymongo.errors import OperationFailure, ServerSelectionTimeoutError
+
+import indexes
+
+
+class FakeCollection:
+    """Just enough of a collection for ensure_indexes, with index_information() in pymongo's format"""
+
+    name = "users"
+
+    def __init__(self, existing, failing=()):
+        self.existing = existing
+        self.failing = set(failing)
+        self.calls = []
+
+    async def index_information(self):
+        return {name: dict(info) for name, info in self.existing.items()}
+
+    async def drop_index(self, name):
+        self.calls.append(("drop", name))
+        del self.existing[name]
+
+    async def create_indexes(self, models):
+        for model in models:
+            document = dict(model.document)
+            name = document.pop("name")
+            self.calls.append(("create", name))
+            if name in self.failing:
+                raise OperationFailure("E11000 duplicate key error", code=11000)
+            self.existing[name] = {**document, "key": list(document["key"].items())}
+
+
+def ensure(existing, collection_name="users", rebuild=False, failing=()):
+    collection = FakeCollection(existing, failing)
+    outcome = asyncio.run(indexes.ensure_indexes({collection_name: collection}, [collection_name], rebuild=rebuild))
+    return outcome, collection.calls
+
+
+def test_existing_declared_indexes_are_left_alone():
+    outcome, calls = ensure({
+        "_id_": {"key": [("_id", 1)]},
+        "email_unique": {"key": [("email", 1)], "unique": True},
+        "user_id_unique": {"key": [("user_id", 1)], "unique": True},
+    })
+
+    assert calls == []
+    assert outcome == {"created": [], "rebuilt": [], "conflicting": [], "retired": [], "failed": []}
+
+
+def test_conflicts_are_only_reported_without_rebuild():
+    existing = {
+        "_id_": {"key": [("_id", 1)]},
+        "email_1": {"key": [("email", 1)], "unique": True},
+    }
+
+    outcome, calls = ensure(existing)
+
+    # As at server startup: nothing is dropped, the missing index is still created
+    assert calls == [("create", "user_id_unique")]
+    assert outcome == {"created": ["users.user_id_unique"], "rebuilt": [], "conflicting": ["users.email_unique"],
+                       "retired": [], "failed": []}
+    assert "email_1" in existing
+
+
+def test_auto_named_index_with_the_declared_key_is_rebuilt_under_its_name():
+    outcome, calls = ensure({
+        "_id_": {"key": [("_id", 1)]},
+        "email_1": {"key": [("email", 1)], "unique": True},
+    }, rebuild=True)
+
+    assert calls == [("drop", "email_1"), ("create", "email_unique"), ("create", "user_id_unique")]
+    assert outcome == {"created": ["users.user_id_unique"], "rebuilt": ["users.email_unique"], "conflicting": [],
+                       "retired": [], "failed": []}
+
+
+def test_declared_name_with_other_options_is_rebuilt():
+    outcome, calls = ensure({
+        "_id_": {"key": [("_id", 1)]},
+        # Same name, but created before the index was made unique
+        "email_unique": {"key": [("email", 1)]},
+        "user_id_unique": {"key": [("user_id", 1)], "unique": True},
+    }, rebuild=True)
+
+    assert calls == [("drop", "email_unique"), ("create", "email_unique")]
+    assert outcome["rebuilt"] == ["users.email_unique"]
+
+
+def test_failed_rebuild_restores_the_old_index():
+    existing = {
+        "_id_": {"key": [("_id", 1)]},
+        # Not unique, and the collection holds duplicate emails
+        "email_1": {"key": [("email", 1)]},
+        "user_id_unique": {"key": [("user_id", 1)], "unique": True},
+    }
+
+    outcome, calls = ensure(existing, rebuild=True, failing={"email_unique"})
+
+    assert calls == [("drop", "email_1"), ("create", "email_unique"), ("create", "email_1")]
+    assert outcome == {"created": [], "rebuilt": [], "conflicting": [], "retired": [], "failed": ["users.email_unique"]}
+    assert existing["email_1"] == {"key": [("email", 1)]}
+
+
+def test_retired_indexes_are_dropped_once_replaced():
+    existing = {
+        "_id_": {"key": [("_id", 1)]},
+        "meal_id_unique": {"key": [("meal_id", 1)], "unique": True},
+        "user_timestamp": {"key": [("user_id", 1), ("timestamp", -1)]},
+        "user_date_timestamp": {"key": [("user_id", 1), ("date", 1), ("timestamp", -1)]},
+        "user_date_timestamp_meal": {"key": [("user_id", 1), ("date", 1), ("timestamp", -1), ("meal_id", -1)]},
+    }
+
+    outcome, calls = ensure(existing, "meals", failing={"user_timestamp_meal"})
+
+    # user_timestamp stays until its replacement could be built
+    assert calls == [("create", "user_timestamp_meal"), ("drop", "user_date_timestamp")]
+    assert outcome["retired"] == ["meals.user_date_timestamp"]
+    assert "user_timestamp" in existing
+
+    outcome, calls = ensure(existing, "meals")
+
+    assert calls == [("create", "user_timestamp_meal"), ("drop", "user_timestamp")]
+    assert outcome["retired"] == ["meals.user_timestamp"]
+
+
+def test_partial_filters_compare_equal_across_son_and_dict():
+    from bson import SON
+
+    outcome, calls = ensure({
+        "_id_": {"key": [("_id", 1)]},
+        "pending_user_created": {"key": [("user_id", 1), ("created_at", 1)],
+                                 "partialFilterExpression": SON([("processed", False)])},
+        "pending_created": {"key": [("created_at", 1)], "partialFilterExpression": SON([("processed", False)])},
+        "expires_at_ttl": {"key": [("expires_at", 1)], "expireAfterSeconds": 0},
+    }, "meal_events")
+
+    assert calls == []
+
+
+def test_report_lists_conflicting_indexes():
+    """Needs a MongoDB server (MONGO_URL); uses and drops a throwaway database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+        db = client[f"test_indexes_{uuid.uuid4().hex[:8]}"]
+        try:
+            # As created by an older deployment, before index names were declared
+            await db.users.create_index("email", unique=True)
+            before = (await indexes.report(db))["users"]
+            outcome = await indexes.ensure_indexes(db, ["users"], rebuild=True)
+            after = (await indexes.report(db))["users"]
+            return before, outcome, after
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    try:
+        before, outcome, after = asyncio.run(run())
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not available")
+
+    assert before["missing"] == ["email_unique", "user_id_unique"]
+    assert before["conflicting"] == {"email_unique": ["email_1"]}
+    assert before["undeclared"] == ["email_1"]
+    assert outcome == {"created": ["users.user_id_unique"], "rebuilt": ["users.email_unique"], "conflicting": [],
+                       "retired": [], "failed": []}
+    assert (after["missing"], after["conflicting"], after["undeclared"]) == ([], {}, [])
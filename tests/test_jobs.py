@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from jobs import FairQueue, QueueFullError, WorkerPool
+
+
+def test_queue_round_robins_between_owners():
+    async def run():
+        queue = FairQueue(maxsize=10, per_owner_maxsize=5)
+        for i in range(4):
+            queue.put_nowait("heavy", f"h{i}")
+        queue.put_nowait("light", "l0")
+        queue.put_nowait("other", "o0")
+        return [(await queue.get())[1] for _ in range(6)]
+
+    assert asyncio.run(run()) == ["h0", "l0", "o0", "h1", "h2", "h3"]
+
+
+def test_queue_rejects_when_full():
+    queue = FairQueue(maxsize=3, per_owner_maxsize=2)
+    queue.put_nowait("a", 1)
+    queue.put_nowait("a", 2)
+    with pytest.raises(QueueFullError):
+        queue.put_nowait("a", 3)
+
+    queue.put_nowait("b", 1)
+    with pytest.raises(QueueFullError):
+        queue.put_nowait("c", 1)
+
+
+def test_worker_pool_limits_concurrency():
+    async def run():
+        queue = FairQueue(maxsize=20, per_owner_maxsize=20)
+        running = []
+        peak = []
+
+        async def handler(owner, item):
+            running.append(item)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(item)
+            if item == 3:
+                raise RuntimeError("boom")
+
+        pool = WorkerPool(queue, handler, concurrency=2)
+        pool.start()
+        for i in range(8):
+            queue.put_nowait(i % 3, i)
+        while queue.qsize() or pool.active:
+            await asyncio.sleep(0.005)
+        await pool.stop()
+        return pool, max(peak)
+
+    pool, peak = asyncio.run(run())
+    assert peak == 2
+    assert pool.completed == 7
+    assert pool.failed == 1
+    assert pool.retry_after() >= 1
@@ -0,0 +1,93 @@
+import asyncio
+from types import SimpleNamespace
+
+import meal_log
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.calls = []
+
+    async def insert_many(self, docs):
+        self.calls.append(("insert_many", docs))
+
+    async def update_one(self, query, update, upsert=False):
+        self.calls.append(("update_one", query, update, upsert))
+
+
+class RecordingEvents:
+    def __init__(self):
+        self.emitted = []
+
+    async def emit(self, user_id, day, meals=1):
+        self.emitted.append((user_id, day, meals))
+
+
+def fake_db():
+    return SimpleNamespace(meals=RecordingCollection(), daily_rollups=RecordingCollection())
+
+
+def test_junk_nutrients_and_foods_are_sanitized():
+    analysis = {
+        "meal_type_suggestion": "lunch",
+        "foods": [
+            {"name": "Arroz", "calories": "130", "carbs": -5, "protein": None, "fat": "muito", "portion_size": 100},
+            "feijão",
+            None,
+            {"calories": 50},
+        ],
+    }
+
+    meals = meal_log.meals_from_analysis(analysis)
+
+    assert meals == [
+        {"meal_type": "lunch", "food_name": "Arroz", "calories": 130.0, "carbs": 0.0, "protein": 0.0,
+         "fat": 0.0, "portion_size": "100"},
+        {"meal_type": "lunch", "food_name": "Alimento", "calories": 50.0, "carbs": 0.0, "protein": 0.0,
+         "fat": 0.0, "portion_size": ""},
+    ]
+
+
+def test_meal_type_falls_back_to_snack():
+    foods = [{"name": "Maçã", "calories": 52}]
+
+    assert meal_log.meals_from_analysis({"meal_type_suggestion": "brunch", "foods": foods})[0]["meal_type"] == "snack"
+    assert meal_log.meals_from_analysis({"foods": foods})[0]["meal_type"] == "snack"
+    # An explicit meal type from the form wins over the suggestion
+    assert meal_log.meals_from_analysis({"meal_type_suggestion": "lunch", "foods": foods}, "dinner")[0]["meal_type"] == "dinner"
+
+
+def test_save_meals_writes_once_per_batch():
+    db = fake_db()
+    events = RecordingEvents()
+    meals = meal_log.meals_from_analysis({"foods": [
+        {"name": "Arroz", "calories": 130, "carbs": 28},
+        {"name": "Feijão", "calories": 76, "protein": 5},
+        {"name": "Salada", "calories": 15},
+    ]}, "lunch")
+
+    meal_ids = asyncio.run(meal_log.save_meals(db, events, "u1", meals, image_id="img1"))
+
+    (name, docs), = db.meals.calls
+    assert name == "insert_many"
+    assert [doc["meal_id"] for doc in docs] == meal_ids and len(set(meal_ids)) == 3
+    assert all(doc["user_id"] == "u1" and doc["image_id"] == "img1" for doc in docs)
+
+    (name, query, update, upsert), = db.daily_rollups.calls
+    date = docs[0]["date"]
+    assert (name, query, upsert) == ("update_one", {"user_id": "u1", "date": date}, True)
+    assert update["$inc"] == {"calories": 221.0, "carbs": 28.0, "protein": 5.0, "fat": 0.0, "meal_count": 3}
+
+    assert events.emitted == [("u1", date, len(docs))]
+
+
+def test_empty_analysis_logs_nothing():
+    db = fake_db()
+    events = RecordingEvents()
+
+    meals = meal_log.meals_from_analysis({"foods": []})
+    meal_ids = asyncio.run(meal_log.save_meals(db, events, "u1", meals))
+
+    assert meals == [] and meal_ids == []
+    assert meal_log.meals_from_analysis({"foods": None}) == []
+    assert db.meals.calls == [] and db.daily_rollups.calls == [] and events.emitted == []
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from gridfs.errors import FileExists
+from PIL import Image
+
+from image_pipeline import InvalidImageError
+from meal_photos import VariantRenderer, store_image
+
+SIZES = {"thumb": 160, "medium": 640}
+
+
+class RecordingBucket:
+    """GridFS bucket stand-in; like GridFS, a second upload under the same id raises FileExists"""
+
+    def __init__(self):
+        self.files = {}
+
+    async def upload_from_stream_with_id(self, file_id, filename, source, metadata=None):
+        if file_id in self.files:
+            raise FileExists(f"file with _id {file_id!r} already exists")
+        self.files[file_id] = {"filename": filename, "data": source, "metadata": metadata}
+
+
+def jpeg(size):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color="orange").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_variants_are_rendered_and_stored_with_their_metadata():
+    bucket = RecordingBucket()
+    renderer = VariantRenderer(bucket, SIZES)
+
+    async def run():
+        return {variant: await renderer.create("img1", jpeg((1200, 900)), "u1", variant) for variant in SIZES}
+
+    try:
+        rendered = asyncio.run(run())
+    finally:
+        renderer.shutdown()
+
+    for variant, edge in SIZES.items():
+        stored = bucket.files[f"img1:{variant}"]
+        assert stored["data"] == rendered[variant]
+        assert stored["filename"] == f"img1:{variant}.webp"
+        assert stored["metadata"] == {
+            "user_id": "u1",
+            "content_type": "image/webp",
+            "sha256": hashlib.sha256(rendered[variant]).hexdigest(),
+            "variant": variant,
+        }
+        with Image.open(io.BytesIO(rendered[variant])) as image:
+            assert image.size == (edge, edge * 3 // 4)
+    assert renderer.stats() == {"rendered": 2, "failed": 0}
+
+
+def test_concurrently_generated_variant_is_not_an_error():
+    bucket = RecordingBucket()
+    renderer = VariantRenderer(bucket, SIZES)
+
+    async def run():
+        first = await renderer.create("img1", jpeg((800, 600)), "u1", "thumb")
+        second = await renderer.create("img1", jpeg((800, 600)), "u1", "thumb")
+        return first, second
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        renderer.shutdown()
+
+    assert first == second
+    assert list(bucket.files) == ["img1:thumb"]
+
+
+def test_originals_keep_their_type_and_invalid_images_are_refused():
+    bucket = RecordingBucket()
+    image = jpeg((100, 100))
+
+    image_id = asyncio.run(store_image(bucket, image, "u1"))
+
+    assert bucket.files[image_id]["metadata"] == {
+        "user_id": "u1", "content_type": "image/jpeg", "sha256": hashlib.sha256(image).hexdigest()
+    }
+    with pytest.raises(InvalidImageError):
+        asyncio.run(store_image(bucket, b"%PDF-1.7", "u1"))
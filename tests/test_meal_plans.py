@@ -0,0 +1,27 @@
+import random
+
+import meal_plans
+from food_index import FoodIndex
+from seed_data import BRAZILIAN_FOODS
+
+
+def test_week_plan_covers_every_day_and_meal():
+    plan = meal_plans.week_plan(FoodIndex(BRAZILIAN_FOODS), random.Random(1))
+
+    assert [day["day"] for day in plan] == [day for day, _ in meal_plans.WEEK_DAYS]
+    for day in plan:
+        for meal, (categories, count) in meal_plans.MEAL_SLOTS.items():
+            foods = day["meals"][meal]
+            assert len(foods) == count
+            assert all(food["category"] in categories for food in foods)
+
+
+def test_week_plan_samples_beyond_the_first_page_of_the_catalogue():
+    # A loaded catalogue has far more than one /api/food-database page before any protein
+    filler = [{"name": f"Verdura {i}", "category": "verduras"} for i in range(600)]
+    proteins = [{"name": f"Peixe {i}", "category": "proteinas"} for i in range(5)]
+
+    plan = meal_plans.week_plan(FoodIndex(filler + proteins), random.Random(1))
+
+    assert all(len(day["meals"]["lunch"]) == 4 for day in plan)
+    assert all(day["meals"]["breakfast"] == [] for day in plan)
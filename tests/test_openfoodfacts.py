@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+
+from cache import TieredCache
+from openfoodfacts import OpenFoodFactsClient, UpstreamError
+
+PRODUCTS = {
+    "7891000100103": {"product_name": "Nescau", "brands": "Nestlé", "nutriments": {"energy-kcal_100g": 400}},
+}
+
+
+class MemoryCollection:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs[query["_id"]] = {"_id": query["_id"], **update["$set"]}
+
+
+class Stub:
+    def __init__(self):
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+
+
+async def with_stub(test, delay=0.0, status=200):
+    """Run test(client, stub, collection) against a local Open Food Facts stub"""
+    stub = Stub()
+
+    async def product(request):
+        barcode = request.match_info["barcode"]
+        stub.requests.append(barcode)
+        stub.in_flight += 1
+        stub.peak = max(stub.peak, stub.in_flight)
+        await asyncio.sleep(delay)
+        stub.in_flight -= 1
+        if barcode == "500":
+            return web.Response(status=500)
+        if barcode == "111":
+            return web.json_response(["not", "an", "object"])
+        if status != 200:
+            return web.Response(status=status)
+        if barcode in PRODUCTS:
+            return web.json_response({"status": 1, "product": PRODUCTS[barcode]})
+        return web.json_response({"status": 0, "status_verbose": "product not found"})
+
+    app = web.Application()
+    app.router.add_get("/api/v0/product/{barcode}.json", product)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    collection = MemoryCollection()
+    client = OpenFoodFactsClient(TieredCache(collection, maxsize=64), base_url=f"http://127.0.0.1:{port}",
+                                 timeout=2, miss_ttl=60)
+    try:
+        await test(client, stub, collection)
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def test_concurrent_lookups_share_one_upstream_request():
+    async def test(client, stub, collection):
+        results = await asyncio.gather(*(client.lookup("7891000100103") for _ in range(20)))
+
+        assert stub.requests == ["7891000100103"]
+        assert all(result["name"] == "Nescau" for result in results)
+        assert client.stats()["coalesced"] == 19
+        # Later lookups are served from the cache
+        assert (await client.lookup("7891000100103"))["calories"] == 400
+        assert len(stub.requests) == 1
+
+    asyncio.run(with_stub(test, delay=0.05))
+
+
+def test_unknown_barcodes_are_cached_with_the_shorter_ttl():
+    async def test(client, stub, collection):
+        assert await client.lookup("0000000000000") is None
+        assert await client.lookup("0000000000000") is None
+
+        assert stub.requests == ["0000000000000"]
+        doc = collection.docs["0000000000000"]
+        assert doc["value"] == {"product": None}
+        remaining = client.cache.memory._data["0000000000000"][1] - time.monotonic()
+        assert remaining <= 60
+
+    asyncio.run(with_stub(test))
+
+
+def test_upstream_errors_are_not_cached():
+    async def test(client, stub, collection):
+        for _ in range(2):
+            with pytest.raises(UpstreamError):
+                await client.lookup("7891000100103")
+
+        assert len(stub.requests) == 2
+        assert collection.docs == {}
+        assert client.stats()["errors"] == 2
+
+    asyncio.run(with_stub(test, status=503))
+
+
+def test_lookup_many_bounds_concurrency_and_reports_sources():
+    async def test(client, stub, collection):
+        await client.lookup("0000000000000")
+        barcodes = ["7891000100103", "7891000100103", "0000000000000", "500"] + [str(i) for i in range(10, 20)]
+
+        results = await client.lookup_many(barcodes, concurrency=3)
+
+        assert list(results) == list(dict.fromkeys(barcodes))
+        assert results["7891000100103"]["product"]["name"] == "Nescau"
+        assert results["7891000100103"]["source"] == "open_food_facts"
+        assert results["0000000000000"] == {**results["0000000000000"], "product": None, "source": "cache"}
+        assert results["500"]["source"] is None and "error" in results["500"]
+        assert all(result["latency_ms"] >= 0 for result in results.values())
+        # One request per distinct uncached barcode, never more than three at once
+        assert sorted(stub.requests[1:]) == sorted(set(barcodes) - {"0000000000000"})
+        assert stub.peak <= 3
+
+    asyncio.run(with_stub(test, delay=0.02))
+
+
+def test_waiters_survive_the_first_caller_being_cancelled():
+    async def test(client, stub, collection):
+        first = asyncio.create_task(client.lookup("7891000100103"))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(client.lookup("7891000100103")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        results = await asyncio.gather(*waiters)
+
+        assert [result["name"] for result in results] == ["Nescau"] * 3
+        assert stub.requests == ["7891000100103"]
+        # The fetch still finished and was cached for the next caller
+        assert collection.docs["7891000100103"]["value"]["product"]["name"] == "Nescau"
+
+    asyncio.run(with_stub(test, delay=0.05))
+
+
+def test_odd_bodies_and_cache_failures_stay_per_barcode():
+    class BrokenCache(TieredCache):
+        async def set(self, key, value, ttl=None):
+            raise RuntimeError("cache down")
+
+    async def test(client, stub, collection):
+        client.cache = BrokenCache(collection)
+
+        results = await client.lookup_many(["111", "7891000100103"])
+
+        assert results["111"]["source"] is None and "unexpected" in results["111"]["error"]
+        # Not cached, but still answered
+        assert results["7891000100103"]["product"]["name"] == "Nescau"
+
+    asyncio.run(with_stub(test))
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import pagination
+
+
+def meal(meal_id, second):
+    return {"meal_id": meal_id, "timestamp": datetime(2026, 3, 1, 12, 0, second, 123000)}
+
+
+def matches(query, doc):
+    """Evaluate the after_cursor filter the way MongoDB would"""
+    def clause(condition):
+        for field, expected in condition.items():
+            if isinstance(expected, dict):
+                if not doc[field] < expected["$lt"]:
+                    return False
+            elif doc[field] != expected:
+                return False
+        return True
+    return any(clause(condition) for condition in query["$or"])
+
+
+def test_cursor_round_trip_and_keyset_order():
+    meals = [meal("b", 5), meal("a", 5), meal("c", 4), meal("d", 3)]
+    by_sort_order = sorted(meals, key=lambda m: (m["timestamp"], m["meal_id"]), reverse=True)
+
+    cursor = pagination.encode_cursor(by_sort_order[0])
+    query = pagination.after_cursor(cursor)
+
+    assert pagination.decode_cursor(cursor) == (meals[0]["timestamp"], "b")
+    # Same timestamp, lower meal_id still follows; nothing before the cursor does
+    assert [m["meal_id"] for m in by_sort_order if matches(query, m)] == ["a", "c", "d"]
+    assert pagination.after_cursor(None) == {}
+
+
+def test_rejects_forged_cursors():
+    for cursor in ("not-base64!", "eyJhIjoxfQ", pagination.encode_cursor(meal("a", 1))[:-3]):
+        with pytest.raises(ValueError):
+            pagination.decode_cursor(cursor)
+
+
+def test_ndjson_flushes_first_line_then_in_chunks():
+    async def documents():
+        for i in range(10):
+            yield {"meal_id": str(i), "timestamp": datetime(2026, 3, 1), "food_name": "Pão de queijo"}
+
+    async def collect():
+        return [chunk async for chunk in pagination.ndjson_lines(documents(), dict, flush_bytes=300)]
+
+    chunks = asyncio.run(collect())
+    lines = b"".join(chunks).decode().splitlines()
+
+    assert chunks[0].count(b"\n") == 1
+    assert len(chunks) < 10
+    assert len(lines) == 10
+    assert lines[0] == '{"meal_id": "0", "timestamp": "2026-03-01T00:00:00", "food_name": "Pão de queijo"}'
@@ -0,0 +1,29 @@
+import asyncio
+
+from passwords import PasswordHasher, pwd_context
+
+
+def test_hash_and_verify_on_process_pool():
+    hasher = PasswordHasher(workers=1, rounds=4)
+
+    async def run():
+        hashed = await hasher.hash("senha123456")
+        return hashed, await hasher.verify("senha123456", hashed), await hasher.verify("errada", hashed)
+
+    try:
+        hashed, valid, invalid = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+
+    assert valid and not invalid
+    assert hasher.stats()["completed"] == 3
+    assert not hasher.needs_rehash(hashed)
+
+
+def test_needs_rehash_only_below_the_work_factor():
+    hasher = PasswordHasher(rounds=5)
+
+    assert hasher.needs_rehash(pwd_context.hash("senha123456", rounds=4))
+    assert not hasher.needs_rehash(pwd_context.hash("senha123456", rounds=5))
+    # Hashes stronger than the configured work factor are never downgraded
+    assert not hasher.needs_rehash(pwd_context.hash("senha123456", rounds=6))
@@ -0,0 +1,94 @@
+import io
+import random
+
+from PIL import Image, ImageDraw
+
+from phash import HashIndex, dhash_bytes, hamming
+
+
+def make_plate(quality=90, scale=1):
+    img = Image.new("RGB", (400, 300), color="white")
+    draw = ImageDraw.Draw(img)
+    draw.ellipse([40, 30, 360, 270], fill="lightgray", outline="gray")
+    draw.rectangle([90, 80, 190, 150], fill="white", outline="gray")
+    draw.rectangle([200, 80, 300, 150], fill="brown")
+    draw.rectangle([120, 170, 280, 230], fill="darkred")
+    if scale != 1:
+        img = img.resize((400 * scale, 300 * scale))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def test_dhash_survives_recompression_and_resize():
+    original = dhash_bytes(make_plate())
+    recompressed = dhash_bytes(make_plate(quality=40))
+    resized = dhash_bytes(make_plate(scale=2))
+
+    assert hamming(original, recompressed) <= 5
+    assert hamming(original, resized) <= 5
+
+
+def test_index_finds_nearest_within_threshold():
+    index = HashIndex(max_distance=4)
+    base = random.getrandbits(64)
+    index.add(base, "plate")
+    index.add(base ^ 0b111111, "other")
+
+    assert index.search(base) == (0, "plate")
+    assert index.search(base ^ (1 << 63) ^ (1 << 20)) == (2, "plate")
+    assert index.search(base ^ 0b1111111111110000000000000) is None
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(7)
+    index = HashIndex(max_distance=5)
+    hashes = [rng.getrandbits(64) for _ in range(5000)]
+    for i, value in enumerate(hashes):
+        index.add(value, i)
+
+    for value in hashes[:200]:
+        for _ in range(rng.randrange(8)):
+            value ^= 1 << rng.randrange(64)
+        expected = min(hamming(value, h) for h in hashes)
+        result = index.search(value)
+        if expected <= 5:
+            assert result is not None and result[0] == expected
+        else:
+            assert result is None
+
+
+def test_remove_and_search_all_fall_back_to_the_next_match():
+    index = HashIndex(max_distance=4)
+    base = random.getrandbits(64)
+    index.add(base ^ 0b1, "nearest")
+    index.add(base ^ 0b111, "next")
+    index.add(base ^ 0b1111111111, "too far")
+
+    assert index.search_all(base) == [(1, base ^ 0b1, "nearest"), (3, base ^ 0b111, "next")]
+
+    assert index.remove(base ^ 0b1)
+    assert not index.remove(base ^ 0b1)
+    assert index.search(base) == (3, "next")
+    assert index.search_all(base) == [(3, base ^ 0b111, "next")]
+    assert len(index) == 2
+
+    # Freed entries are reused without resurrecting the removed value
+    index.add(base ^ 0b11, "readded")
+    assert index.search(base) == (2, "readded")
+    assert index.search(base ^ 0b1) == (1, "readded")
+
+
+def test_size_bound_evicts_the_oldest_hashes():
+    index = HashIndex(max_distance=2, max_size=3)
+    hashes = [random.getrandbits(64) for _ in range(4)]
+    for i, value in enumerate(hashes[:3]):
+        index.add(value, i)
+    # Re-adding refreshes a hash, so the second one becomes the oldest
+    index.add(hashes[0], "refreshed")
+    index.add(hashes[3], 3)
+
+    assert len(index) == 3
+    assert index.search(hashes[1]) is None
+    assert index.search(hashes[0]) == (0, "refreshed")
+    assert index.stats()["evictions"] == 1
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from ratelimit import InMemoryBucketStore, MongoBucketStore, TokenBucketLimiter, client_ip, parse_networks
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(InMemoryBucketStore(clock=clock), "login", capacity=3, per_seconds=30)
+
+    decisions = [asyncio.run(limiter.check("1.2.3.4")) for _ in range(4)]
+
+    assert decisions[:3] == [(True, 0)] * 3
+    assert decisions[3] == (False, 10)
+
+    clock.now = 10
+    assert asyncio.run(limiter.check("1.2.3.4")) == (True, 0)
+    assert asyncio.run(limiter.check("1.2.3.4"))[0] is False
+    assert limiter.stats()["rejected"] == 2
+
+
+def test_keys_are_independent():
+    limiter = TokenBucketLimiter(InMemoryBucketStore(clock=FakeClock()), "login", capacity=1, per_seconds=60)
+
+    assert asyncio.run(limiter.check("a@x.com"))[0]
+    assert not asyncio.run(limiter.check("a@x.com"))[0]
+    assert asyncio.run(limiter.check("b@x.com"))[0]
+
+
+def test_store_drops_least_recently_used_keys():
+    store = InMemoryBucketStore(max_keys=2, clock=FakeClock())
+    limiter = TokenBucketLimiter(store, "login", capacity=1, per_seconds=60)
+    for key in ("a", "b", "c"):
+        asyncio.run(limiter.check(key))
+
+    assert len(store._buckets) == 2
+    # "a" was evicted, so it starts with a full bucket again
+    assert asyncio.run(limiter.check("a"))[0]
+
+
+def test_limiter_fails_open_when_store_is_down():
+    class DownStore:
+        async def take(self, *args):
+            raise ServerSelectionTimeoutError("no servers")
+
+    limiter = TokenBucketLimiter(DownStore(), "login", capacity=1, per_seconds=60)
+
+    assert asyncio.run(limiter.check("1.2.3.4")) == (True, 0)
+    assert limiter.stats()["errors"] == 1
+
+
+def test_forwarded_for_is_only_believed_from_trusted_proxies():
+    proxies = parse_networks("10.0.0.0/8, 127.0.0.1")
+
+    # A client talking to us directly cannot pick its address
+    assert client_ip("203.0.113.9", "1.1.1.1", proxies) == "203.0.113.9"
+    # Behind the proxy, the hop it appended is the client; spoofed entries to its left are ignored
+    assert client_ip("10.0.0.2", "1.1.1.1, 203.0.113.9", proxies) == "203.0.113.9"
+    assert client_ip("10.0.0.2", "6.6.6.6, 203.0.113.9, 10.0.0.7", proxies) == "203.0.113.9"
+    assert client_ip("10.0.0.2", None, proxies) == "10.0.0.2"
+    assert client_ip("10.0.0.2", "1.1.1.1", []) == "10.0.0.2"
+
+
+def test_mongo_store_shares_buckets_atomically():
+    """Needs a MongoDB server (MONGO_URL); uses and drops a throwaway database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+        db = client[f"test_ratelimit_{uuid.uuid4().hex[:8]}"]
+        try:
+            # Two workers, one collection
+            workers = [TokenBucketLimiter(MongoBucketStore(db.rate_limits), "login", capacity=3, per_seconds=60)
+                       for _ in range(2)]
+            decisions = await asyncio.gather(*(workers[i % 2].check("1.2.3.4") for i in range(10)))
+            other_key = await workers[0].check("5.6.7.8")
+            bucket = await db.rate_limits.find_one({"_id": "login:1.2.3.4"})
+            return decisions, other_key, bucket, workers
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    try:
+        decisions, other_key, bucket, workers = asyncio.run(run())
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not available")
+
+    assert sum(allowed for allowed, _ in decisions) == 3
+    assert all(retry_after >= 1 for allowed, retry_after in decisions if not allowed)
+    assert other_key == (True, 0)
+    assert bucket["tokens"] < 1
+    assert bucket["expires_at"] > bucket["updated_at"]
+    assert sum(worker.stats()["errors"] for worker in workers) == 0
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, GuardedCaller, QueueTimeoutError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeLLM:
+    """Stand-in for the upstream LLM with configurable latency and failures"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.in_flight = 0
+        self.peak = 0
+
+    async def send_message(self, prompt):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("upstream error")
+            return f'{{"answer": "{prompt}"}}'
+        finally:
+            self.in_flight -= 1
+
+
+def test_limiter_caps_concurrency():
+    llm = FakeLLM(delay=0.01)
+    guard = GuardedCaller(max_concurrency=3, timeout=1)
+
+    async def run():
+        return await asyncio.gather(*(guard.call(llm.send_message, i) for i in range(10)))
+
+    assert len(asyncio.run(run())) == 10
+    assert llm.peak == 3
+    assert guard.stats()["breaker"]["state"] == "closed"
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast():
+    llm = FakeLLM(fail=True)
+    clock = FakeClock()
+    guard = GuardedCaller(timeout=1, breaker=CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock))
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await guard.call(llm.send_message, "x")
+        with pytest.raises(CircuitOpenError) as exc_info:
+            await guard.call(llm.send_message, "x")
+        return exc_info.value
+
+    error = asyncio.run(run())
+    assert error.retry_after == 30
+    assert guard.stats()["rejected"] == 1
+    assert guard.stats()["breaker"]["state"] == "open"
+
+
+def test_timeouts_count_as_failures():
+    llm = FakeLLM(delay=1)
+    guard = GuardedCaller(timeout=0.01, breaker=CircuitBreaker(failure_threshold=2))
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await guard.call(llm.send_message, "x")
+
+    asyncio.run(run())
+    assert guard.timeouts == 2
+    assert guard.breaker.state == "open"
+
+
+def test_queueing_behind_a_fast_upstream_does_not_open_the_breaker():
+    llm = FakeLLM(delay=0.03)
+    guard = GuardedCaller(max_concurrency=1, timeout=0.05, queue_timeout=1,
+                          breaker=CircuitBreaker(failure_threshold=2))
+
+    async def run():
+        # Eight calls take ~0.24s in total, but each one only ~0.03s once it holds the slot
+        return await asyncio.gather(*(guard.call(llm.send_message, i) for i in range(8)))
+
+    assert len(asyncio.run(run())) == 8
+    assert guard.timeouts == 0
+    assert guard.breaker.state == "closed"
+
+
+def test_queue_timeouts_fail_fast_without_counting_against_the_upstream():
+    llm = FakeLLM(delay=0.05)
+    guard = GuardedCaller(max_concurrency=1, timeout=1, queue_timeout=0.01,
+                          breaker=CircuitBreaker(failure_threshold=1))
+
+    async def run():
+        return await asyncio.gather(*(guard.call(llm.send_message, i) for i in range(4)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert isinstance(results[0], str)
+    assert all(isinstance(result, QueueTimeoutError) for result in results[1:])
+    assert guard.stats()["queue_timeouts"] == 3
+    assert guard.breaker.consecutive_failures == 0
+    assert guard.breaker.state == "closed"
+
+
+def test_half_open_probe_closes_or_reopens_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+
+    clock.now = 10
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
@@ -0,0 +1,153 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import indexes
+import rollups
+
+TODAY = datetime(2024, 5, 15, 18, 30)
+
+
+def test_default_range_covers_exactly_the_last_days():
+    start, end, day_count = rollups.date_range(7, today=TODAY)
+
+    assert (start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), day_count) == ("2024-05-09", "2024-05-15", 7)
+    assert rollups.date_range(1, today=TODAY)[0].date() == TODAY.date()
+
+
+def test_explicit_and_half_open_ranges():
+    start, end, day_count = rollups.date_range(7, "2024-04-01", "2024-04-30", today=TODAY)
+    assert (start, end, day_count) == (datetime(2024, 4, 1), datetime(2024, 4, 30), 30)
+
+    start, _, day_count = rollups.date_range(7, to_date="2024-04-30", today=TODAY)
+    assert (start, day_count) == (datetime(2024, 4, 24), 7)
+
+    _, end, day_count = rollups.date_range(7, from_date="2024-05-13", today=TODAY)
+    assert (end, day_count) == (TODAY, 3)
+
+
+@pytest.mark.parametrize("from_date,to_date", [
+    ("2024-05-10", "2024-05-01"),
+    ("2023-01-01", "2024-05-01"),
+    ("01/05/2024", None),
+])
+def test_invalid_ranges_are_rejected(from_date, to_date):
+    with pytest.raises(ValueError):
+        rollups.date_range(7, from_date, to_date, today=TODAY)
+
+
+def test_daily_series_fills_days_without_meals():
+    start, _, day_count = rollups.date_range(3, today=TODAY)
+    series = rollups.daily_series(
+        [{"date": "2024-05-14", "calories": 512.345, "carbs": 60, "protein": 20.5, "fat": 10, "meal_count": 2}],
+        start, day_count
+    )
+
+    assert [day["date"] for day in series] == ["2024-05-13", "2024-05-14", "2024-05-15"]
+    assert series[0] == {"date": "2024-05-13", "day": "Mon", "calories": 0, "carbs": 0, "protein": 0, "fat": 0,
+                         "meal_count": 0}
+    assert series[1]["calories"] == 512.35 and series[1]["meal_count"] == 2
+
+
+def test_weekly_totals_group_rollups_by_iso_week():
+    """Needs a MongoDB server (MONGO_URL); uses and drops a throwaway database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+        db = client[f"test_rollups_{uuid.uuid4().hex[:8]}"]
+        try:
+            for date, calories in [("2024-05-05", 100), ("2024-05-06", 200), ("2024-05-12", 300),
+                                   ("2024-05-13", 400), ("2024-05-20", 999)]:
+                await rollups.add_meals(db, "u1", date, [{"calories": calories}])
+            await rollups.add_meals(db, "u2", "2024-05-06", [{"calories": 5000}])
+            return await rollups.weekly_totals(db, "u1", "2024-05-05", "2024-05-19")
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    try:
+        weeks = asyncio.run(run())
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not available")
+
+    assert [(week["_id"].strftime("%Y-%m-%d"), week["week"], week["calories"], week["meals"]) for week in weeks] == [
+        ("2024-04-29", 18, 100, 1),
+        ("2024-05-06", 19, 500, 2),
+        ("2024-05-13", 20, 400, 1),
+    ]
+
+
+class RecordingRollups:
+    def __init__(self):
+        self.calls = []
+
+    async def update_one(self, query, update, upsert=False):
+        self.calls.append(("update_one", query, update["$inc"], upsert))
+
+
+def test_add_is_a_single_atomic_update():
+    from types import SimpleNamespace
+
+    db = SimpleNamespace(daily_rollups=RecordingRollups())
+    meals = [{"calories": 300, "carbs": 40, "protein": None}, {"calories": 150.5, "fat": 7}]
+
+    asyncio.run(rollups.add_meals(db, "u1", "2024-05-01", meals))
+
+    assert db.daily_rollups.calls == [
+        ("update_one", {"user_id": "u1", "date": "2024-05-01"},
+         {"calories": 450.5, "carbs": 40, "protein": 0, "fat": 7, "meal_count": 2}, True),
+    ]
+
+
+def test_incremental_rollups_match_a_rebuild_from_meals():
+    """Needs a MongoDB server (MONGO_URL); uses and drops a throwaway database"""
+    import random
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    rng = random.Random(8)
+
+    def meal(user_id, date):
+        return {"meal_id": uuid.uuid4().hex, "user_id": user_id, "date": date,
+                "calories": round(rng.uniform(50, 900), 1), "carbs": rng.choice([None, rng.randint(0, 120)]),
+                "protein": round(rng.uniform(0, 60), 2), "fat": rng.randint(0, 40)}
+
+    async def snapshot(db):
+        return {(user_id, day["date"]): day
+                for user_id in ("u1", "u2")
+                for day in await rollups.get_rollups(db, user_id, "2024-05-01", "2024-05-31")}
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+        db = client[f"test_rollups_{uuid.uuid4().hex[:8]}"]
+        try:
+            # $merge in rebuild() needs the unique (user_id, date) index
+            await indexes.ensure_indexes(db, ["daily_rollups"])
+            for _ in range(60):
+                batch = [meal(rng.choice(["u1", "u2"]), f"2024-05-0{rng.randint(1, 5)}")]
+                batch += [{**batch[0], "meal_id": uuid.uuid4().hex} for _ in range(rng.randint(0, 2))]
+                await db.meals.insert_many(batch)
+                await rollups.add_meals(db, batch[0]["user_id"], batch[0]["date"], batch)
+
+            incremental = await snapshot(db)
+            await rollups.rebuild(db)
+            return incremental, await snapshot(db)
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    try:
+        incremental, rebuilt = asyncio.run(run())
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not available")
+
+    assert incremental.keys() == rebuilt.keys()
+    for key, day in rebuilt.items():
+        assert incremental[key]["meal_count"] == day["meal_count"]
+        for nutrient in rollups.NUTRIENTS:
+            assert incremental[key][nutrient] == pytest.approx(day[nutrient])
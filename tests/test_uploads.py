@@ -0,0 +1,85 @@
+import io
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from uploads import UploadLimitMiddleware, read_image_upload
+
+MAX_BYTES = 200 * 1024
+
+
+def make_app(max_pixels=1_000_000, cors=False):
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_BYTES, paths=["/upload"])
+    if cors:
+        app.add_middleware(CORSMiddleware, allow_origins=["*"])
+
+    @app.post("/upload")
+    async def upload(image: UploadFile = File(...)):
+        data = await read_image_upload(image, MAX_BYTES, max_pixels)
+        return {"bytes": len(data), "head": data[:3].hex()}
+
+    return TestClient(app)
+
+
+def png(size):
+    buffer = io.BytesIO()
+    Image.new("RGB", size).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_valid_image_is_passed_on_as_bytes():
+    image = png((640, 480))
+
+    response = make_app().post("/upload", files={"image": ("photo.png", image, "image/png")})
+
+    assert response.status_code == 200
+    assert response.json() == {"bytes": len(image), "head": image[:3].hex()}
+
+
+def test_rejects_by_signature_and_dimensions():
+    client = make_app(max_pixels=100 * 100)
+
+    wrong_type = client.post("/upload", files={"image": ("photo.png", b"%PDF-1.7 not an image", "image/png")})
+    too_many_pixels = client.post("/upload", files={"image": ("photo.png", png((200, 200)), "image/png")})
+    truncated = client.post("/upload", files={"image": ("photo.png", png((50, 50))[:20], "image/png")})
+
+    assert wrong_type.status_code == 415
+    assert too_many_pixels.status_code == 400
+    assert truncated.status_code == 400
+
+
+def test_oversized_body_is_refused_before_it_is_read():
+    client = make_app()
+    body = b"\xff\xd8\xff" + b"\0" * (MAX_BYTES + 100 * 1024)
+
+    response = client.post("/upload", files={"image": ("photo.jpg", body, "image/jpeg")})
+
+    assert response.status_code == 413
+
+
+def test_early_rejections_carry_cors_headers():
+    client = make_app(cors=True)
+    body = b"\xff\xd8\xff" + b"\0" * (MAX_BYTES + 100 * 1024)
+
+    response = client.post("/upload", files={"image": ("photo.jpg", body, "image/jpeg")},
+                           headers={"Origin": "https://app.example"})
+
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == "*"
+
+
+def test_server_rejections_carry_cors_headers(server):
+    body = b"\xff\xd8\xff" + b"\0" * (server.IMAGE_MAX_UPLOAD_BYTES + 100 * 1024)
+
+    # No lifespan: the upload limit answers before any endpoint or database is reached
+    response = TestClient(server.app).post(
+        "/api/analyze-food/upload", files={"image": ("photo.jpg", body, "image/jpeg")},
+        headers={"Origin": "https://app.example"}
+    )
+
+    assert response.status_code == 413
+    assert "access-control-allow-origin" in response.headers
+    assert server.app.user_middleware[0].cls is CORSMiddleware
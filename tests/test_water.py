@@ -0,0 +1,67 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+import water
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.ops = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.ops.extend(ops)
+
+
+class RecordingDb:
+    def __init__(self):
+        self.water_logs = RecordingCollection()
+
+
+def test_batch_is_grouped_into_one_increment_per_day():
+    db = RecordingDb()
+    late_evening = datetime(2024, 5, 1, 22, 30, tzinfo=timezone(timedelta(hours=-3)))
+    entries = [
+        (datetime(2024, 5, 1, 8, 0), 1),
+        (datetime(2024, 5, 1, 12, 0), 2),
+        # 22:30 in Brasília is already the next day in UTC
+        (late_evening, 1),
+    ]
+
+    per_day = asyncio.run(water.add_batch(db, "u1", entries))
+
+    assert per_day == {"2024-05-01": 3, "2024-05-02": 1}
+    assert [(op._filter["date"], op._doc["$inc"]["glasses_count"]) for op in db.water_logs.ops] == [
+        ("2024-05-01", 3), ("2024-05-02", 1)
+    ]
+    assert all(op._upsert for op in db.water_logs.ops)
+
+
+def test_parallel_writers_lose_no_increments():
+    """Needs a MongoDB server (MONGO_URL); uses and drops a throwaway database"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    import indexes
+
+    async def run():
+        client = AsyncIOMotorClient(os.getenv("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=500)
+        db = client[f"test_water_{uuid.uuid4().hex[:8]}"]
+        try:
+            await indexes.ensure_indexes(db, ["water_logs"])
+            await asyncio.gather(*(water.add_glasses(db, "u1", "2024-05-01") for _ in range(100)))
+            return await db.water_logs.find({"user_id": "u1"}).to_list(None)
+        finally:
+            await client.drop_database(db.name)
+            client.close()
+
+    try:
+        logs = asyncio.run(run())
+    except ServerSelectionTimeoutError:
+        pytest.skip("MongoDB is not available")
+
+    assert len(logs) == 1
+    assert logs[0]["glasses_count"] == 100